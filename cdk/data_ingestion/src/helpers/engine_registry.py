@@ -0,0 +1,79 @@
+"""
+Process-wide SQLAlchemy engine registry for PGVector
+Every vectorstore built in this process shares one pooled engine per connection string
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Small pool tuned for Lambda: one request at a time per container, connections recycled
+# before RDS Proxy idles them out
+ENGINE_POOL_SETTINGS: Dict[str, Any] = {
+    "pool_size": int(os.environ.get("VECTOR_DB_POOL_SIZE", "2")),
+    "max_overflow": int(os.environ.get("VECTOR_DB_MAX_OVERFLOW", "2")),
+    "pool_timeout": int(os.environ.get("VECTOR_DB_POOL_TIMEOUT", "10")),
+    "pool_recycle": int(os.environ.get("VECTOR_DB_POOL_RECYCLE", "300")),
+    "pool_pre_ping": os.environ.get("VECTOR_DB_POOL_PRE_PING", "true").lower() == "true",
+}
+
+EngineFactory = Callable[..., Engine]
+
+_engines: Dict[str, Engine] = {}
+_engine_factory: EngineFactory = create_engine
+_lock = threading.Lock()
+
+
+def set_engine_factory(factory: EngineFactory) -> None:
+    """
+    Replace the function used to build engines (called as factory(url, **pool_settings))
+    Existing engines are disposed so the next request builds one with the new factory
+    """
+    global _engine_factory
+    with _lock:
+        _engine_factory = factory
+    dispose_engines()
+
+
+def get_engine(connection_string: str, **overrides) -> Engine:
+    """
+    Get the shared pooled engine for a connection string, creating it on first use.
+
+    Args:
+    connection_string (str): SQLAlchemy database URL.
+    overrides: Pool settings that replace ENGINE_POOL_SETTINGS when the engine is first created.
+
+    Returns:
+    Engine: The process-wide engine for this URL.
+    """
+    engine = _engines.get(connection_string)
+    if engine is not None:
+        return engine
+
+    with _lock:
+        engine = _engines.get(connection_string)
+        if engine is None:
+            settings = {**ENGINE_POOL_SETTINGS, **overrides}
+            logger.info(f"🔗 VECTOR_DB_ENGINE: Creating pooled engine (size={settings['pool_size']}, overflow={settings['max_overflow']}, pre_ping={settings['pool_pre_ping']})")
+            engine = _engine_factory(connection_string, **settings)
+            _engines[connection_string] = engine
+    return engine
+
+
+def dispose_engines() -> None:
+    """Close every pooled connection and forget all engines"""
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        try:
+            engine.dispose()
+        except Exception as e:
+            logger.warning(f"⚠️ VECTOR_DB_ENGINE_DISPOSE_WARNING: {e}")
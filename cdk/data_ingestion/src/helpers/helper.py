@@ -7,6 +7,7 @@ from langchain_aws import BedrockEmbeddings
 from langchain_postgres import PGVector
 from langchain.indexes import SQLRecordManager
 
+from helpers.engine_registry import get_engine
 from processing.documents import process_documents
 s3 = boto3.client('s3')
 
@@ -47,7 +48,7 @@ def get_vectorstore(
         vectorstore = PGVector(
             embeddings=embeddings,
             collection_name=collection_name,
-            connection=connection_string,
+            connection=get_engine(connection_string),
             use_jsonb=True
         )
 
@@ -89,7 +90,7 @@ def store_group_data(
         # define record manager
         namespace = f"pgvector/{vectorstore_config_dict['collection_name']}"
         record_manager = SQLRecordManager(
-            namespace, db_url=connection_string
+            namespace, engine=get_engine(connection_string)
         )
         record_manager.create_schema()
 
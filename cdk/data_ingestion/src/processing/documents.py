@@ -1,7 +1,11 @@
-import os, tempfile, logging, uuid
+import os, tempfile, logging, uuid, threading
+import multiprocessing
+from multiprocessing.connection import wait
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import List
+from typing import Iterator, List, Tuple
 import boto3, pymupdf
+from botocore.config import Config as BotoConfig
 
 from langchain_postgres import PGVector
 from langchain_core.documents import Document
@@ -13,8 +17,16 @@ from langchain.indexes import SQLRecordManager, index
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Worker processes for page extraction; documents shorter than PAGE_EXTRACT_MIN_PAGES are read in-process
+PAGE_EXTRACT_WORKERS = int(os.environ.get("PAGE_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGE_EXTRACT_MIN_PAGES = int(os.environ.get("PAGE_EXTRACT_MIN_PAGES", "16"))
+# Pages a worker sends back per message
+PAGE_EXTRACT_BATCH = 8
+# Page uploads in flight at once
+S3_UPLOAD_CONCURRENCY = int(os.environ.get("S3_UPLOAD_CONCURRENCY", "16"))
+
 # Initialize the S3 client
-s3 = boto3.client('s3')
+s3 = boto3.client('s3', config=BotoConfig(max_pool_connections=max(10, S3_UPLOAD_CONCURRENCY)))
 
 EMBEDDING_BUCKET_NAME = os.environ["EMBEDDING_BUCKET_NAME"]
 
@@ -123,6 +135,124 @@ def update_ingestion_status(patient_id: str, file_path: str, status: str, connec
         logger.error(f"Error updating ingestion status for patient for the file: {e}")
         raise
 
+def _page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into one contiguous range per worker"""
+    size, extra = divmod(page_count, workers)
+    ranges, start = [], 0
+    for worker in range(workers):
+        end = start + size + (1 if worker < extra else 0)
+        if end > start:
+            ranges.append((start, end))
+        start = end
+    return ranges
+
+def _extract_page_range(path: str, file_type: str, start: int, end: int, conn) -> None:
+    """Worker process: send (page_num, utf-8 text) batches for pages [start, end), then None"""
+    try:
+        doc = pymupdf.open(path, filetype=file_type)
+        batch = []
+        for page_index in range(start, end):
+            batch.append((page_index + 1, doc[page_index].get_text().encode("utf8")))
+            if len(batch) >= PAGE_EXTRACT_BATCH:
+                conn.send(batch)
+                batch = []
+        if batch:
+            conn.send(batch)
+        doc.close()
+        conn.send(None)
+    except Exception as e:
+        conn.send(e)
+    finally:
+        conn.close()
+
+def iter_page_texts(path: str, file_type: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (page_num, text) for every page of a document, in no particular order.
+    Long documents are split into page ranges extracted by separate processes; this uses
+    Process and Pipe directly because Lambda has no /dev/shm for multiprocessing.Pool.
+    """
+    doc = pymupdf.open(path, filetype=file_type)
+    page_count = len(doc)
+    workers = min(PAGE_EXTRACT_WORKERS, page_count)
+    if workers <= 1 or page_count < PAGE_EXTRACT_MIN_PAGES:
+        try:
+            for page_num, page in enumerate(doc, start=1):
+                yield page_num, page.get_text().encode("utf8")
+        finally:
+            doc.close()
+        return
+    doc.close()
+
+    context = multiprocessing.get_context("fork")
+    processes, connections = [], []
+    for start, end in _page_ranges(page_count, workers):
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=_extract_page_range, args=(path, file_type, start, end, child_conn), daemon=True)
+        process.start()
+        child_conn.close()
+        processes.append(process)
+        connections.append(parent_conn)
+
+    try:
+        pending = list(connections)
+        while pending:
+            for conn in wait(pending):
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    raise RuntimeError("Page extraction worker exited without finishing its pages")
+                if message is None:
+                    pending.remove(conn)
+                elif isinstance(message, Exception):
+                    raise message
+                else:
+                    yield from message
+    finally:
+        for conn in connections:
+            conn.close()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+class BoundedUploader:
+    """Uploads objects from a thread pool with at most max_in_flight requests outstanding"""
+
+    def __init__(self, bucket: str, max_in_flight: int = S3_UPLOAD_CONCURRENCY):
+        self.bucket = bucket
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="s3-upload")
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._futures = []
+
+    def put(self, key: str, body: bytes) -> None:
+        """Queue an upload, blocking while max_in_flight uploads are outstanding"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(s3.put_object, Bucket=self.bucket, Key=key, Body=body)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def wait(self) -> None:
+        """Wait for every queued upload and raise the first failure"""
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.wait()
+        else:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        return False
+
 def store_doc_texts(
     bucket: str, 
     group: str, 
@@ -132,6 +262,7 @@ def store_doc_texts(
 ) -> List[str]:
     """
     Store the text of each page of a document in an S3 bucket.
+    Pages are extracted in parallel and uploaded concurrently as they come in.
     
     Args:
     bucket (str): The name of the S3 bucket containing the document.
@@ -141,27 +272,25 @@ def store_doc_texts(
     output_bucket (str): The name of the S3 bucket for storing the extracted text.
     
     Returns:
-    List[str]: A list of keys for the stored text files in the output bucket.
+    List[str]: A list of keys for the stored text files in the output bucket, in page order.
     """
+    file_name, file_type = filename.rsplit('.', 1)
     with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-        s3.download_file(bucket, f"{group}/{patient}/documents/{filename}", tmp_file.name)
-        file_name, file_type = filename.rsplit('.', 1)
-        doc = pymupdf.open(tmp_file.name, filetype=file_type)
-        
-        with BytesIO() as output_buffer:
-            for page_num, page in enumerate(doc, start=1):
-                text = page.get_text().encode("utf8")
-                output_buffer.write(text)
-                output_buffer.write(bytes((12,)))
-                
-                page_output_key = f'{group}/{patient}/documents/{filename}_page_{page_num}.txt'
-                
-                with BytesIO(text) as page_output_buffer:
-                    s3.upload_fileobj(page_output_buffer, output_bucket, page_output_key)
+        tmp_file_path = tmp_file.name
 
-        os.remove(tmp_file.name)
+    try:
+        s3.download_file(bucket, f"{group}/{patient}/documents/{filename}", tmp_file_path)
+
+        page_count = 0
+        with BoundedUploader(output_bucket) as uploader:
+            for page_num, text in iter_page_texts(tmp_file_path, file_type):
+                uploader.put(f'{group}/{patient}/documents/{filename}_page_{page_num}.txt', text)
+                page_count += 1
+        logger.info(f"Extracted and uploaded {page_count} pages of {filename}")
+    finally:
+        os.remove(tmp_file_path)
 
-    return [f'{group}/{patient}/documents/{filename}_page_{page_num}.txt' for page_num in range(1, len(doc) + 1)]
+    return [f'{group}/{patient}/documents/{filename}_page_{page_num}.txt' for page_num in range(1, page_count + 1)]
 
 def add_document(
     bucket: str, 
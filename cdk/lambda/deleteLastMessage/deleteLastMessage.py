@@ -176,6 +176,15 @@ def lambda_handler(event, context):
         history.pop()
         history.pop()
 
+        # Keep the message counters stored next to the history in step with it
+        message_types = [item.get('M', {}).get('type', {}).get('S') for item in history]
+        update_expression = "SET History = :history, MessageCount = :count, HumanMessageCount = :human, AIMessageCount = :ai"
+
+        # A rolling summary (CHAT_HISTORY_STRATEGY=summary) that covered a deleted message is dropped and rebuilt
+        summary_through = int(response['Item'].get('SummaryThrough', {}).get('N', '0'))
+        if summary_through > len(history):
+            update_expression += " REMOVE ConversationSummary, SummaryThrough"
+
         # Update the conversation history in DynamoDB
         dynamodb_client.update_item(
             TableName=table_name,
@@ -184,9 +193,12 @@ def lambda_handler(event, context):
                     'S': session_id
                 }
             },
-            UpdateExpression="SET History = :history",
+            UpdateExpression=update_expression,
             ExpressionAttributeValues={
-                ":history": {"L": history}
+                ":history": {"L": history},
+                ":count": {"N": str(len(history))},
+                ":human": {"N": str(message_types.count('human'))},
+                ":ai": {"N": str(message_types.count('ai'))}
             }
         )
 
@@ -1118,6 +1118,9 @@ export class ApiServiceStack extends cdk.Stack {
           BEDROCK_GUARDRAIL_ID: "", // Optional: Leave empty to disable guardrails, add your guardrail ID to enable
           APPSYNC_GRAPHQL_URL: this.appSyncApi.graphqlUrl,
           APPSYNC_API_ID: this.appSyncApi.apiId,
+          DYNAMODB_TABLE_CHECK: "describe", // Set to "skip" if the conversation table is provisioned ahead of time
+          CHAT_HISTORY_STRATEGY: "last_n", // History in the prompt: "full", "last_n", "token_budget" or "summary"
+          CHAT_HISTORY_TURNS: "10",
         },
       }
     );
@@ -1177,7 +1180,6 @@ export class ApiServiceStack extends cdk.Stack {
       new iam.PolicyStatement({
         effect: iam.Effect.ALLOW,
         actions: [
-          "dynamodb:ListTables",
           "dynamodb:CreateTable",
           "dynamodb:DescribeTable",
           "dynamodb:PutItem",
@@ -0,0 +1,208 @@
+"""
+Audio input stage for Nova Sonic voice sessions
+Microphone PCM goes into a bounded ring buffer and a sender task coalesces it into
+fixed-duration frames, so Bedrock gets a steady stream of right-sized audioInput
+events regardless of how the browser chunks its audio
+"""
+
+import os
+import time
+import base64
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Frame duration sent to Bedrock, clamped to 20-100 ms
+AUDIO_FRAME_MS = min(100, max(20, int(os.environ.get("VOICE_AUDIO_FRAME_MS", "40"))))
+# Audio held while Bedrock is slow before the overflow policy applies
+AUDIO_BUFFER_MS = int(os.environ.get("VOICE_AUDIO_BUFFER_MS", "2000"))
+# "drop_oldest" keeps latency bounded by discarding the oldest audio; "block" makes the producer wait
+AUDIO_OVERFLOW = os.environ.get("VOICE_AUDIO_OVERFLOW", "drop_oldest").lower()
+
+
+class PcmRingBuffer:
+    """Fixed-capacity byte ring; write() overwrites the oldest bytes when full"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = bytearray(capacity)
+        self._head = 0  # oldest byte
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def write(self, data: bytes) -> int:
+        """Append data and return how many of the oldest bytes were overwritten"""
+        if len(data) >= self.capacity:
+            dropped = self._size + len(data) - self.capacity
+            self._data[:] = data[-self.capacity:]
+            self._head = 0
+            self._size = self.capacity
+            return dropped
+
+        dropped = max(0, len(data) - self.free())
+        if dropped:
+            self._head = (self._head + dropped) % self.capacity
+            self._size -= dropped
+
+        tail = (self._head + self._size) % self.capacity
+        first = min(len(data), self.capacity - tail)
+        self._data[tail:tail + first] = data[:first]
+        if first < len(data):
+            self._data[:len(data) - first] = data[first:]
+        self._size += len(data)
+        return dropped
+
+    def read(self, size: int) -> bytes:
+        size = min(size, self._size)
+        first = min(size, self.capacity - self._head)
+        chunk = bytes(self._data[self._head:self._head + first])
+        if first < size:
+            chunk += bytes(self._data[:size - first])
+        self._head = (self._head + size) % self.capacity
+        self._size -= size
+        return chunk
+
+    def clear(self) -> None:
+        self._head = 0
+        self._size = 0
+
+
+class AudioInputStage:
+    """
+    Buffers one audio content block and sends it as coalesced frames
+    put() never sends itself; the sender task and flush() do, in order, one frame at a time
+    """
+
+    def __init__(self, send_frame: Callable[[str], Awaitable[None]], sample_rate: int = 16000, sample_bytes: int = 2,
+                 frame_ms: int = AUDIO_FRAME_MS, buffer_ms: int = AUDIO_BUFFER_MS, overflow: str = AUDIO_OVERFLOW):
+        self._send_frame = send_frame
+        self.sample_bytes = sample_bytes
+        self.bytes_per_ms = sample_rate * sample_bytes // 1000
+        self.frame_ms = frame_ms
+        self.frame_bytes = self.bytes_per_ms * frame_ms
+        self.overflow = overflow
+        self._ring = PcmRingBuffer(max(self.frame_bytes, self.bytes_per_ms * buffer_ms))
+        self._data = asyncio.Event()
+        self._full = asyncio.Event()
+        self._space = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._task = None
+        self.stats = {
+            "chunks_in": 0,
+            "bytes_in": 0,
+            "frames_sent": 0,
+            "bytes_sent": 0,
+            "bytes_dropped": 0,
+            "max_depth_ms": 0,
+            "blocked_ms": 0.0,
+            "send_ms_total": 0.0,
+            "send_ms_max": 0.0,
+        }
+
+    def depth_ms(self) -> int:
+        return len(self._ring) // self.bytes_per_ms
+
+    def snapshot(self) -> dict:
+        """Counters plus the current enqueue depth and mean send latency"""
+        frames = self.stats["frames_sent"]
+        return {
+            **self.stats,
+            "depth_ms": self.depth_ms(),
+            "send_ms_avg": round(self.stats["send_ms_total"] / frames, 2) if frames else 0.0,
+        }
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def put_base64(self, blob: str) -> None:
+        await self.put(base64.b64decode(blob))
+
+    async def put(self, pcm: bytes) -> None:
+        self.stats["chunks_in"] += 1
+        self.stats["bytes_in"] += len(pcm)
+
+        if self.overflow == "block":
+            # Backpressure: wait for the sender instead of dropping audio
+            view = memoryview(pcm)
+            while view:
+                if not self._ring.free():
+                    self._space.clear()
+                    blocked_at = time.perf_counter()
+                    await self._space.wait()
+                    self.stats["blocked_ms"] += (time.perf_counter() - blocked_at) * 1000
+                    continue
+                part = view[:self._ring.free()]
+                self._ring.write(part)
+                view = view[len(part):]
+                self._wake()
+            return
+
+        dropped = self._ring.write(pcm)
+        if dropped:
+            self.stats["bytes_dropped"] += dropped
+            logger.warning(f"🎙️ AUDIO_INPUT_OVERFLOW: dropped {dropped // self.bytes_per_ms} ms of the oldest audio")
+        self._wake()
+
+    def _wake(self) -> None:
+        self.stats["max_depth_ms"] = max(self.stats["max_depth_ms"], self.depth_ms())
+        self._data.set()
+        if len(self._ring) >= self.frame_bytes:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._data.wait()
+            self._data.clear()
+            if len(self._ring) < self.frame_bytes:
+                # Hold a short chunk for up to one frame so it can be coalesced with the next one
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.frame_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            await self._send_available(partial=len(self._ring) < self.frame_bytes)
+            if len(self._ring):
+                self._data.set()
+
+    async def _send_available(self, partial: bool) -> None:
+        async with self._send_lock:
+            while len(self._ring) >= self.frame_bytes or (partial and len(self._ring)):
+                size = min(len(self._ring), self.frame_bytes)
+                size -= size % self.sample_bytes
+                if not size:
+                    return
+                frame = self._ring.read(size)
+                self._space.set()
+                if len(self._ring) < self.frame_bytes:
+                    self._full.clear()
+
+                started = time.perf_counter()
+                await self._send_frame(base64.b64encode(frame).decode("ascii"))
+                elapsed = (time.perf_counter() - started) * 1000
+                self.stats["frames_sent"] += 1
+                self.stats["bytes_sent"] += size
+                self.stats["send_ms_total"] += elapsed
+                self.stats["send_ms_max"] = max(self.stats["send_ms_max"], elapsed)
+
+    async def flush(self) -> None:
+        """Send everything buffered, including a final partial frame"""
+        await self._send_available(partial=True)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._ring.clear()
+        self._space.set()
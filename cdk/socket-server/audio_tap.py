@@ -0,0 +1,81 @@
+"""
+Opt-in tap on Nova Sonic output audio
+Consumers that need raw PCM subscribe and read from their own fixed-size ring buffer
+(oldest audio dropped when they fall behind); with no subscribers nothing is decoded or kept
+"""
+
+import os
+import base64
+import asyncio
+import logging
+from typing import List
+
+from audio_input import PcmRingBuffer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Audio each subscriber may hold before the oldest is dropped
+AUDIO_TAP_BUFFER_MS = int(os.environ.get("VOICE_AUDIO_TAP_BUFFER_MS", "5000"))
+
+
+class AudioSubscription:
+    """One consumer's bounded view of the output audio"""
+
+    def __init__(self, capacity_bytes: int):
+        self._ring = PcmRingBuffer(capacity_bytes)
+        self._ready = asyncio.Event()
+        self.bytes_dropped = 0
+
+    def _push(self, pcm: bytes) -> None:
+        self.bytes_dropped += self._ring.write(pcm)
+        self._ready.set()
+
+    def pending_bytes(self) -> int:
+        return len(self._ring)
+
+    def read_nowait(self, max_bytes: int = None) -> bytes:
+        """Whatever is buffered (up to max_bytes), possibly empty"""
+        data = self._ring.read(max_bytes or len(self._ring))
+        if not len(self._ring):
+            self._ready.clear()
+        return data
+
+    async def read(self, max_bytes: int = None) -> bytes:
+        """Wait for audio and return what is buffered (up to max_bytes)"""
+        while not len(self._ring):
+            self._ready.clear()
+            await self._ready.wait()
+        return self.read_nowait(max_bytes)
+
+
+class AudioOutputTap:
+    """Fans decoded output PCM out to subscribers"""
+
+    def __init__(self, sample_rate: int = 24000, sample_bytes: int = 2, buffer_ms: int = AUDIO_TAP_BUFFER_MS):
+        self.bytes_per_second = sample_rate * sample_bytes
+        self.capacity_bytes = self.bytes_per_second * buffer_ms // 1000
+        self._subscribers: List[AudioSubscription] = []
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, buffer_ms: int = None) -> AudioSubscription:
+        capacity = self.capacity_bytes if buffer_ms is None else self.bytes_per_second * buffer_ms // 1000
+        subscription = AudioSubscription(max(1, capacity))
+        self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: AudioSubscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+            if subscription.bytes_dropped:
+                logger.info(f"🔊 AUDIO_TAP: subscriber dropped {subscription.bytes_dropped} bytes")
+
+    def publish_base64(self, b64_audio: str) -> None:
+        if not self._subscribers:
+            return
+        pcm = base64.b64decode(b64_audio)
+        for subscription in self._subscribers:
+            subscription._push(pcm)
@@ -0,0 +1,106 @@
+"""
+Framed transport between server.js and nova_sonic.py
+In "framed" mode stdin carries length-prefixed frames instead of JSON lines, and audio
+output goes to its own pipe (fd 3) as frames, so audio never goes through JSON encoding
+Audio stays base64 end to end: frames carry the base64 text exactly as received
+"""
+
+import os
+import struct
+import logging
+import threading
+from typing import Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# "json" keeps the original JSON-lines protocol; "framed" must match NOVA_AUDIO_TRANSPORT in server.js
+AUDIO_TRANSPORT = os.environ.get("NOVA_AUDIO_TRANSPORT", "json").lower()
+AUDIO_OUTPUT_FD = int(os.environ.get("NOVA_AUDIO_OUTPUT_FD", "3"))
+
+# Frame: 1 byte kind + 4 byte big-endian payload length + payload
+FRAME_HEADER = struct.Struct(">cI")
+FRAME_JSON = b"J"   # UTF-8 JSON control message (same messages as the JSON-lines protocol)
+FRAME_AUDIO = b"A"  # base64 audio, ASCII
+FRAME_SESSION_AUDIO = b"S"  # shared worker: "<route_id> <base64 audio>", ASCII
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+
+
+def is_framed() -> bool:
+    return AUDIO_TRANSPORT == "framed"
+
+
+def encode_frame(kind: bytes, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(kind, len(payload)) + payload
+
+
+def _read_exact(stream, size: int) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+
+def read_frame(stream) -> Optional[Tuple[bytes, bytes]]:
+    """Blocking read of one frame from a binary stream; None at EOF"""
+    header = _read_exact(stream, FRAME_HEADER.size)
+    if header is None:
+        return None
+    kind, length = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds limit of {MAX_FRAME_BYTES}")
+    payload = _read_exact(stream, length) if length else b""
+    if payload is None:
+        return None
+    return kind, payload
+
+
+def encode_session_audio(route_id: str, b64_audio: str) -> bytes:
+    return f"{route_id} {b64_audio}".encode("ascii")
+
+
+def split_session_audio(payload: bytes) -> Tuple[str, str]:
+    """Split a FRAME_SESSION_AUDIO payload into (route_id, base64 audio)"""
+    route_id, _, b64_audio = payload.decode("ascii").partition(" ")
+    return route_id, b64_audio
+
+
+class AudioOutputChannel:
+    """Writes base64 audio output frames to the pipe server.js reads audio from"""
+
+    def __init__(self, fd: int = AUDIO_OUTPUT_FD):
+        self._stream = os.fdopen(fd, "wb", buffering=0)
+        self._lock = threading.Lock()
+        self.frames_written = 0
+
+    def write(self, b64_audio: str, route_id: str = None) -> None:
+        """Write one audio frame; route_id tags it for routing when many sessions share the pipe"""
+        if route_id:
+            frame = encode_frame(FRAME_SESSION_AUDIO, encode_session_audio(route_id, b64_audio))
+        else:
+            frame = encode_frame(FRAME_AUDIO, b64_audio.encode("ascii"))
+        view = memoryview(frame)
+        with self._lock:
+            while view:
+                written = self._stream.write(view)
+                view = view[written:]
+            self.frames_written += 1
+
+
+_audio_output_channel = None
+
+
+def get_audio_output_channel() -> Optional[AudioOutputChannel]:
+    """Process-wide audio output channel in framed mode, None in JSON mode"""
+    global _audio_output_channel
+    if not is_framed():
+        return None
+    if _audio_output_channel is None:
+        _audio_output_channel = AudioOutputChannel()
+        logger.info(f"🔊 AUDIO_TRANSPORT: framed (audio output on fd {AUDIO_OUTPUT_FD})")
+    return _audio_output_channel
@@ -0,0 +1,65 @@
+"""
+Memory over time for Nova Sonic output audio
+Feeds an hour of 24 kHz output audio events (100 ms each) through the previous unbounded
+asyncio.Queue and through AudioOutputTap with no subscriber and with a subscriber that
+never reads, sampling traced memory every simulated 10 minutes
+
+    python benchmarks/bench_audio_tap_memory.py [minutes]
+"""
+
+import os
+import sys
+import base64
+import asyncio
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from audio_tap import AudioOutputTap
+
+EVENTS_PER_MINUTE = 600  # 100 ms of audio per audioOutput event
+SAMPLE_EVERY_MINUTES = 10
+
+
+async def unbounded_queue(b64_audio, minutes):
+    """What _handle_event did before: decode every event into a queue nobody reads"""
+    queue = asyncio.Queue()
+    for minute in range(1, minutes + 1):
+        for _ in range(EVENTS_PER_MINUTE):
+            await queue.put(base64.b64decode(b64_audio))
+        yield minute
+
+
+async def tap(b64_audio, minutes, subscribe):
+    audio_tap = AudioOutputTap()
+    subscription = audio_tap.subscribe() if subscribe else None
+    for minute in range(1, minutes + 1):
+        for _ in range(EVENTS_PER_MINUTE):
+            audio_tap.publish_base64(b64_audio)
+        yield minute
+    if subscription:
+        audio_tap.unsubscribe(subscription)
+
+
+async def measure(label, samples):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    readings = []
+    async for minute in samples:
+        if minute % SAMPLE_EVERY_MINUTES == 0:
+            readings.append(f"{minute}m={(tracemalloc.get_traced_memory()[0] - baseline) / 1e6:.1f}MB")
+    peak = (tracemalloc.get_traced_memory()[1] - baseline) / 1e6
+    tracemalloc.stop()
+    print(f"{label:<32} {'  '.join(readings)}  peak={peak:.1f}MB")
+
+
+async def main(minutes):
+    b64_audio = base64.b64encode(os.urandom(4800)).decode("ascii")
+    print(f"{minutes} minutes of output audio, {minutes * EVENTS_PER_MINUTE} events")
+    await measure("unbounded asyncio.Queue", unbounded_queue(b64_audio, minutes))
+    await measure("tap, no subscriber", tap(b64_audio, minutes, subscribe=False))
+    await measure("tap, subscriber never reads", tap(b64_audio, minutes, subscribe=True))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 60))
@@ -0,0 +1,87 @@
+"""
+Benchmark for the Nova Sonic output decoder
+Replays recorded output streams (captured with NOVA_RECORD_RESPONSES=<file>) through the
+previous str-buffer decoder and through JsonEventDecoder; without recordings a synthetic
+stream with Nova Sonic's event mix is used
+
+    python benchmarks/bench_response_decoder.py [recording ...]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from response_decoder import JsonEventDecoder, read_recorded_chunks
+
+
+def legacy_decode(chunks):
+    """The decoder _process_responses used before JsonEventDecoder"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    events = 0
+    for chunk in chunks:
+        buffer += chunk.decode("utf-8")
+        idx = 0
+        while True:
+            try:
+                obj, offset = decoder.raw_decode(buffer[idx:])
+            except json.JSONDecodeError:
+                break
+            idx += offset
+            events += 1
+        buffer = buffer[idx:]
+    return events
+
+
+def incremental_decode(chunks):
+    decoder = JsonEventDecoder()
+    events = 0
+    for chunk in chunks:
+        events += len(decoder.feed(chunk))
+    return events
+
+
+def synthetic_stream(seconds=60, split_every=0, audio_ms=100):
+    """Events shaped like a Nova Sonic reply: 24 kHz 16-bit audio in audio_ms pieces plus transcript text"""
+    rng = random.Random(7)
+    events = []
+    for i in range(seconds * 1000 // audio_ms):
+        audio = base64.b64encode(rng.randbytes(48 * audio_ms)).decode("ascii")
+        events.append({"event": {"audioOutput": {"promptName": "p", "contentName": "c", "content": audio}}})
+        if i % 20 == 0:
+            events.append({"event": {"textOutput": {"promptName": "p", "contentName": "t", "role": "ASSISTANT", "content": "I see, that sounds hard."}}})
+    chunks = [json.dumps(event).encode("utf-8") for event in events]
+    if split_every:
+        # Events split across chunk boundaries, as happens under load
+        data = b"".join(chunks)
+        chunks = [data[i:i + split_every] for i in range(0, len(data), split_every)]
+    return chunks
+
+
+def run(name, chunks, repeat=5):
+    size = sum(len(chunk) for chunk in chunks)
+    print(f"{name}: {len(chunks)} chunks, {size / 1e6:.1f} MB")
+    for label, decode in (("legacy str buffer", legacy_decode), ("JsonEventDecoder", incremental_decode)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            events = decode(chunks)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"  {label:<18} {events:>6} events  {best * 1000:8.1f} ms  {size / best / 1e6:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            run(path, list(read_recorded_chunks(path)))
+    else:
+        run("synthetic, one event per chunk", synthetic_stream())
+        run("synthetic, 1 KB chunks", synthetic_stream(split_every=1024))
+        run("synthetic, 64 KB chunks", synthetic_stream(split_every=64 * 1024))
+        run("synthetic, 1 s audio events in 4 KB chunks", synthetic_stream(split_every=4 * 1024, audio_ms=1000))
@@ -0,0 +1,140 @@
+"""
+Empathy prompt registry
+Loads the active admin empathy prompt once, validates and compiles it into a
+ready-to-format template, and refreshes it on a TTL with a cheap version check
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from string import Formatter
+from typing import Callable, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EMPATHY_PROMPT_TTL_SECONDS = float(os.environ.get("EMPATHY_PROMPT_TTL_SECONDS", "300"))
+
+REQUIRED_FIELDS = ("patient_context", "user_text")
+
+LATEST_PROMPT_QUERY = 'SELECT prompt_content, created_at FROM empathy_prompt_history ORDER BY created_at DESC LIMIT 1'
+PROMPT_VERSION_QUERY = 'SELECT MAX(created_at) FROM empathy_prompt_history'
+
+# QueryFn runs one SQL statement and returns the first row (or None)
+QueryFn = Callable[[str], Optional[tuple]]
+
+
+class CompiledEmpathyPrompt:
+    """
+    Pre-parsed empathy prompt template
+    Literal text and placeholders are split once so formatting is a single join
+    """
+
+    def __init__(self, template: str, source: str, version=None):
+        self.template = template
+        self.source = source
+        self.version = version
+        self._parts: List[Tuple[str, Optional[str]]] = []
+
+        fields = set()
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            if field_name is not None:
+                if field_name not in REQUIRED_FIELDS or format_spec or conversion:
+                    raise ValueError(f"Unsupported placeholder in empathy prompt: {{{field_name}}}")
+                fields.add(field_name)
+            self._parts.append((literal, field_name))
+
+        missing = [name for name in REQUIRED_FIELDS if name not in fields]
+        if missing:
+            raise ValueError(f"Empathy prompt missing required placeholders: {missing}")
+
+    def format(self, patient_context: str, user_text: str) -> str:
+        values = {"patient_context": patient_context, "user_text": user_text}
+        return "".join(literal + (values[field] if field else "") for literal, field in self._parts)
+
+
+def fix_json_braces(prompt_content: str) -> str:
+    """Escape a literal JSON output example in an admin prompt so it survives formatting"""
+    if '"empathy_score":' not in prompt_content or '{{' in prompt_content:
+        return prompt_content
+
+    json_pattern = r'(\{[^{}]*?"empathy_score"[^{}]*?\})'
+    matches = re.findall(json_pattern, prompt_content, re.DOTALL)
+    if matches:
+        for match in matches:
+            prompt_content = prompt_content.replace(match, match.replace('{', '{{').replace('}', '}}'))
+        return prompt_content
+
+    return re.sub(r'\{(\s*"empathy_score"[^}]*?)\}', r'{{\1}}', prompt_content, flags=re.DOTALL)
+
+
+class EmpathyPromptRegistry:
+    """
+    Process-wide holder of the active empathy prompt
+    The DB is only touched when the TTL has expired, and then only for MAX(created_at)
+    unless an admin has saved a newer prompt
+    """
+
+    def __init__(self, query_fn: QueryFn, default_prompt: Callable[[], str], ttl_seconds: float = EMPATHY_PROMPT_TTL_SECONDS):
+        self._query_fn = query_fn
+        self._default_prompt = default_prompt
+        self.ttl_seconds = ttl_seconds
+        self._compiled: Optional[CompiledEmpathyPrompt] = None
+        self._default_compiled: Optional[CompiledEmpathyPrompt] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def default(self) -> CompiledEmpathyPrompt:
+        if self._default_compiled is None:
+            self._default_compiled = CompiledEmpathyPrompt(self._default_prompt(), source="default")
+        return self._default_compiled
+
+    def _compile_admin_prompt(self, prompt_content: str, created_at) -> CompiledEmpathyPrompt:
+        try:
+            compiled = CompiledEmpathyPrompt(fix_json_braces(prompt_content), source="admin", version=created_at)
+            logger.info(f"🎯 ADMIN EMPATHY PROMPT LOADED - Created: {created_at}, {len(prompt_content)} characters")
+            return compiled
+        except ValueError as e:
+            logger.error(f"❌ ADMIN EMPATHY PROMPT INVALID, USING DEFAULT: {e}")
+            default = self.default()
+            return CompiledEmpathyPrompt(default.template, source="default", version=created_at)
+
+    def _refresh(self) -> None:
+        try:
+            if self._compiled is not None:
+                row = self._query_fn(PROMPT_VERSION_QUERY)
+                latest_version = row[0] if row else None
+                if latest_version == self._compiled.version:
+                    return
+
+            row = self._query_fn(LATEST_PROMPT_QUERY)
+            if row and row[0]:
+                self._compiled = self._compile_admin_prompt(row[0], row[1])
+            else:
+                logger.info("🔧 No admin empathy prompt found, using default")
+                default = self.default()
+                self._compiled = CompiledEmpathyPrompt(default.template, source="default", version=None)
+        except Exception as e:
+            logger.error(f"Error refreshing empathy prompt: {e}")
+            if self._compiled is None:
+                self._compiled = self.default()
+
+    def get(self) -> CompiledEmpathyPrompt:
+        """Get the compiled active prompt, refreshing it if the TTL has expired"""
+        now = time.monotonic()
+        if self._compiled is not None and now - self._checked_at < self.ttl_seconds:
+            return self._compiled
+
+        with self._lock:
+            if self._compiled is None or time.monotonic() - self._checked_at >= self.ttl_seconds:
+                self._refresh()
+                self._checked_at = time.monotonic()
+            return self._compiled
+
+    def invalidate(self) -> None:
+        """Force a full reload on the next get()"""
+        with self._lock:
+            self._compiled = None
+            self._checked_at = 0.0
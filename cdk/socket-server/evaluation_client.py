@@ -0,0 +1,76 @@
+"""
+Bedrock access for voice-side evaluations (empathy judge, diagnosis check)
+Clients are cached per region and every blocking call runs on a dedicated executor
+with a per-call timeout, so an evaluation never holds up the audio event loop
+"""
+
+import os
+import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import boto3
+from botocore.config import Config as BotoConfig
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EVALUATION_TIMEOUT_SECONDS = float(os.environ.get("VOICE_EVAL_TIMEOUT_SECONDS", "30"))
+EVALUATION_MAX_WORKERS = int(os.environ.get("VOICE_EVAL_MAX_WORKERS", "8"))
+FALLBACK_REGION = "us-east-1"
+
+_executor = ThreadPoolExecutor(max_workers=EVALUATION_MAX_WORKERS, thread_name_prefix="voice-eval")
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_bedrock_runtime_client(region: str = FALLBACK_REGION):
+    """Cached boto3 bedrock-runtime client for the region, sized for the evaluation executor"""
+    client = _clients.get(region)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(region)
+            if client is None:
+                config = BotoConfig(
+                    connect_timeout=5,
+                    read_timeout=EVALUATION_TIMEOUT_SECONDS,
+                    retries={"max_attempts": 2, "mode": "standard"},
+                    max_pool_connections=EVALUATION_MAX_WORKERS,
+                )
+                client = _clients[region] = boto3.client("bedrock-runtime", region_name=region, config=config)
+    return client
+
+
+async def run_blocking(fn: Callable, *args, timeout: float = EVALUATION_TIMEOUT_SECONDS):
+    """Run a blocking call on the evaluation executor; raises asyncio.TimeoutError after timeout"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(_executor, fn, *args), timeout)
+
+
+def _invoke_model(region: str, model_id: str, body: dict) -> dict:
+    response = get_bedrock_runtime_client(region).invoke_model(
+        modelId=model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(body)
+    )
+    return json.loads(response["body"].read())
+
+
+async def invoke_model(model_id: str, body: dict, region: str = None, timeout: float = EVALUATION_TIMEOUT_SECONDS) -> dict:
+    """
+    invoke_model off the event loop, retried once in us-east-1 if the call fails in region.
+
+    Returns:
+    dict: The parsed response body.
+    """
+    region = region or FALLBACK_REGION
+    try:
+        return await run_blocking(_invoke_model, region, model_id, body, timeout=timeout)
+    except Exception as e:
+        reason = "timed out" if isinstance(e, asyncio.TimeoutError) else e
+        logger.warning(f"VOICE: {model_id} failed in {region}, trying {FALLBACK_REGION}: {reason}")
+        return await run_blocking(_invoke_model, FALLBACK_REGION, model_id, body, timeout=timeout)
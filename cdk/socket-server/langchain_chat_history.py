@@ -1,31 +1,105 @@
 import json
 import os
-from langchain_community.chat_message_histories import DynamoDBChatMessageHistory
 from langchain_core.messages import AIMessage, HumanMessage
-import psycopg2
 import logging
-import boto3
+import threading
 import uuid
 from datetime import datetime
+import chat_history
+from voice_db_manager import get_pg_connection, return_pg_connection
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-connection = None
-db_secret = None
-
-secrets_manager_client = boto3.client("secretsmanager")
-
 RDS_PROXY_ENDPOINT = os.environ.get("RDS_PROXY_ENDPOINT")  # Replace with your actual RDS proxy endpoint
 DB_SECRET_NAME = os.environ.get("SM_DB_CREDENTIALS")  # Replace with your actual secret name
 print(f"Using RDS Proxy Endpoint: {RDS_PROXY_ENDPOINT}")
 logger.info(f"Using RDS Proxy Endpoint: {RDS_PROXY_ENDPOINT}")
 
-def format_chat_history(session_id: str, table_name: str = "DynamoDB-Conversation-Table") -> str:
-    history = DynamoDBChatMessageHistory(table_name=table_name, session_id=session_id)
-    recent_messages = history.messages[-10:]
+DEFAULT_TABLE_NAME = "DynamoDB-Conversation-Table"
+
+INSERT_MESSAGE_SQL = """
+    INSERT INTO messages (message_id, session_id, student_sent, message_content, time_sent)
+    VALUES (%s, %s, %s, %s, %s);
+"""
+
+
+# Messages of earlier conversation given to Nova Sonic at session start
+VOICE_HISTORY_WINDOW = int(os.environ.get("VOICE_HISTORY_WINDOW", "10"))
+
+
+def _to_langchain_message(role: str, content: str):
+    if role == "user":
+        return HumanMessage(content=content)
+    if role == "ai":
+        return AIMessage(content=content)
+    raise ValueError(f"Invalid role '{role}'. Must be 'user' or 'ai'.")
+
+
+class ChatHistoryStore:
+    """
+    Conversation history in the counted DynamoDB layout of chat_history (the module shared with
+    the text generation Lambda), taking (role, content) messages, with PostgreSQL mirroring
+    through the shared voice connection pool
+    """
+
+    def __init__(self, table_name: str = DEFAULT_TABLE_NAME):
+        self.table_name = table_name
+
+    # The voice server never takes the per-turn counters, so its reads do not remember them
+
+    def get_message_counts(self, session_id: str) -> dict:
+        return chat_history.get_message_counts(self.table_name, session_id, remember=False)
+
+    def get_recent_messages(self, session_id: str, window: int) -> list:
+        return chat_history.get_recent_messages(self.table_name, session_id, window, remember=False)
+
+    def append(self, session_id: str, messages: list) -> None:
+        """Append (role, content) messages and bump the counters with one UpdateItem and no read"""
+        chat_history.append_messages(
+            self.table_name, session_id, [_to_langchain_message(role, content) for role, content in messages]
+        )
+
+    def insert_postgres(self, session_id: str, messages: list) -> None:
+        """Mirror (role, content) messages to the messages table with one executemany"""
+        if not messages:
+            return
+        now = datetime.utcnow()
+        conn = get_pg_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.executemany(INSERT_MESSAGE_SQL, [
+                    (str(uuid.uuid4()), session_id, role == "user", content, now)
+                    for role, content in messages
+                ])
+            conn.commit()
+            logger.info(f"💾 Saved {len(messages)} messages to PostgreSQL (session_id={session_id})")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            return_pg_connection(conn)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store(table_name: str = DEFAULT_TABLE_NAME) -> ChatHistoryStore:
+    """Process-wide store for the table"""
+    store = _stores.get(table_name)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(table_name)
+            if store is None:
+                store = _stores[table_name] = ChatHistoryStore(table_name)
+    return store
+
+
+def format_chat_history(session_id: str, table_name: str = DEFAULT_TABLE_NAME) -> str:
+    recent_messages = get_history_store(table_name).get_recent_messages(session_id, VOICE_HISTORY_WINDOW)
 
     lines = []
     for m in recent_messages:
@@ -35,82 +109,29 @@ def format_chat_history(session_id: str, table_name: str = "DynamoDB-Conversatio
         lines.append(f"{role}: {safe_content}")
     return "\n".join(lines)
 
-def add_message(session_id: str, role: str, content: str, table_name: str = "DynamoDB-Conversation-Table"):
-    history = DynamoDBChatMessageHistory(table_name=table_name, session_id=session_id)
-    if role == "user":
-        history.add_message(HumanMessage(content=content))
-    elif role == "ai":
-        history.add_message(AIMessage(content=content))
-    else:
-        raise ValueError(f"Invalid role '{role}'. Must be 'user' or 'ai'.")
+def add_message(session_id: str, role: str, content: str, table_name: str = DEFAULT_TABLE_NAME):
+    store = get_history_store(table_name)
+    store.append(session_id, [(role, content)])
 
     # Mirror to PostgreSQL
     try:
-        insert_message_to_postgres(session_id, role, content)
+        store.insert_postgres(session_id, [(role, content)])
     
     except Exception as e:
         logger.error(f"❌ Failed to insert message into PostgreSQL: {e}")
 
 
-def get_secret(secret_name, expect_json=True):
-    global db_secret
-    if db_secret is None:
-        try:
-            response = secrets_manager_client.get_secret_value(SecretId=secret_name)["SecretString"]
-            db_secret = json.loads(response) if expect_json else response
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to decode JSON for secret: {e}")
-            raise ValueError(f"Secret {secret_name} is not properly formatted as JSON.")
-        except Exception as e:
-            logger.error(f"Error fetching secret: {e}")
-            raise
-    return db_secret
+def append_messages(session_id: str, messages: list, table_name: str = DEFAULT_TABLE_NAME):
+    """
+    Append several (role, content) messages to the DynamoDB history with one UpdateItem.
+    Unlike add_message this does not mirror to PostgreSQL; the caller owns the messages rows.
+    """
+    get_history_store(table_name).append(session_id, messages)
 
-def connect_to_db():
-    global connection
-    if connection is None or connection.closed:
-        try:
-            secret = get_secret(DB_SECRET_NAME)
-            connection_params = {
-                'dbname': secret["dbname"],
-                'user': secret["username"],
-                'password': secret["password"],
-                'host': RDS_PROXY_ENDPOINT,
-                'port': secret["port"]
-            }
-            connection_string = " ".join([f"{key}={value}" for key, value in connection_params.items()])
-            connection = psycopg2.connect(connection_string)
-            logger.info("Connected to the database!")
-        except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
-            if connection:
-                connection.rollback()
-                connection.close()
-            raise
-    return connection
 
 def insert_message_to_postgres(session_id: str, role: str, content: str):
     try:
-        conn = connect_to_db()
-        cursor = conn.cursor()
-
-        insert_query = """
-            INSERT INTO messages (message_id, session_id, student_sent, message_content, time_sent)
-            VALUES (%s, %s, %s, %s, %s);
-        """
-        cursor.execute(insert_query, (
-            str(uuid.uuid4()),
-            session_id,
-            True if role == "user" else False,
-            content,
-            datetime.utcnow()
-        ))
-        conn.commit()
-        cursor.close()
-        logger.info(f"💾 Saved message to PostgreSQL (session_id={session_id}, role={role})")
-
+        get_history_store().insert_postgres(session_id, [(role, content)])
     except Exception as e:
         logger.error(f"❌ Failed to insert message: {e}")
         print(f"❌ Failed to insert message: {e}")
-        conn.rollback()
-
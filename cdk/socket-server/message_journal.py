@@ -0,0 +1,189 @@
+"""
+Write-behind message journal for Nova Sonic voice sessions
+Finalized turns are queued on the event loop and written to PostgreSQL and the
+DynamoDB history in batches from a background thread, so audio output never
+waits on database I/O
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+from psycopg2.extras import execute_values
+
+import langchain_chat_history
+from voice_db_manager import get_pg_connection, return_pg_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+JOURNAL_FLUSH_INTERVAL_SECONDS = float(os.environ.get("VOICE_JOURNAL_FLUSH_MS", "250")) / 1000
+JOURNAL_MAX_BATCH = int(os.environ.get("VOICE_JOURNAL_MAX_BATCH", "50"))
+JOURNAL_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("VOICE_JOURNAL_DRAIN_SECONDS", "5"))
+
+UPSERT_MESSAGES_SQL = """
+    INSERT INTO messages (message_id, session_id, student_sent, message_content, empathy_evaluation, time_sent)
+    VALUES %s
+    ON CONFLICT (message_id) DO UPDATE
+    SET message_content = EXCLUDED.message_content,
+        empathy_evaluation = COALESCE(EXCLUDED.empathy_evaluation, messages.empathy_evaluation)
+"""
+
+UPDATE_EMPATHY_SQL = """
+    UPDATE messages AS m
+    SET empathy_evaluation = v.empathy_evaluation::jsonb
+    FROM (VALUES %s) AS v(message_id, empathy_evaluation)
+    WHERE m.message_id = v.message_id::uuid
+"""
+
+_MESSAGE = "message"
+_EMPATHY = "empathy"
+_STOP = "stop"
+
+
+class MessageJournal:
+    """
+    Per-session journal; roles are "user" and "ai"
+    record_message and attach_empathy never block; the writer thread owns all database I/O
+    """
+
+    def __init__(self, session_id: str, table_name: str = "DynamoDB-Conversation-Table",
+                 flush_interval: float = JOURNAL_FLUSH_INTERVAL_SECONDS, max_batch: int = JOURNAL_MAX_BATCH):
+        self.session_id = session_id
+        self.table_name = table_name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"messages": 0, "empathy_updates": 0, "batches": 0, "write_errors": 0}
+        self._thread = threading.Thread(target=self._run, name=f"message-journal-{session_id}", daemon=True)
+        self._thread.start()
+
+    def record_message(self, role: str, content: str, empathy_evaluation: dict = None) -> str:
+        """Queue one complete message and return the message_id it will be saved under"""
+        message_id = str(uuid.uuid4())
+        self._queue.put((_MESSAGE, {
+            "message_id": message_id,
+            "role": role,
+            "content": content,
+            "empathy_evaluation": empathy_evaluation,
+            "time_sent": datetime.utcnow(),
+        }))
+        return message_id
+
+    def attach_empathy(self, message_id: str, empathy_evaluation: dict) -> None:
+        """Set the empathy evaluation of a journaled message once the judge has scored it"""
+        if not message_id or not empathy_evaluation:
+            return
+        self._queue.put((_EMPATHY, {"message_id": message_id, "empathy_evaluation": empathy_evaluation}))
+
+    def close(self, timeout: float = JOURNAL_DRAIN_TIMEOUT_SECONDS) -> bool:
+        """Wait up to timeout for everything queued to be written, then stop the writer"""
+        with self._lock:
+            if self._closed:
+                return not self._thread.is_alive()
+            self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+        drained = not self._thread.is_alive()
+        if drained:
+            logger.info(f"💾 VOICE_JOURNAL_DRAINED: {self.stats}")
+        else:
+            logger.warning(f"⚠️ VOICE_JOURNAL_DRAIN_TIMEOUT: {self._queue.qsize()} items not written after {timeout}s")
+        return drained
+
+    def _run(self) -> None:
+        while True:
+            kind, payload = self._queue.get()
+            batch = []
+            stop = kind == _STOP
+            if not stop:
+                batch.append((kind, payload))
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    kind, payload = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if kind == _STOP:
+                    stop = True
+                else:
+                    batch.append((kind, payload))
+
+            if batch:
+                self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch) -> None:
+        messages: Dict[str, dict] = {}
+        empathy_updates: Dict[str, dict] = {}
+        for kind, payload in batch:
+            if kind == _MESSAGE:
+                messages[payload["message_id"]] = payload
+            elif payload["message_id"] in messages:
+                # Scored before it was written: one row, no separate UPDATE
+                messages[payload["message_id"]]["empathy_evaluation"] = payload["empathy_evaluation"]
+            else:
+                empathy_updates[payload["message_id"]] = payload["empathy_evaluation"]
+
+        self.stats["batches"] += 1
+        self._write_postgres(list(messages.values()), empathy_updates)
+        self._write_history(list(messages.values()))
+
+    def _write_postgres(self, messages: List[dict], empathy_updates: Dict[str, dict]) -> None:
+        if not messages and not empathy_updates:
+            return
+        conn = None
+        try:
+            conn = get_pg_connection()
+            with conn.cursor() as cursor:
+                if messages:
+                    execute_values(cursor, UPSERT_MESSAGES_SQL, [
+                        (
+                            message["message_id"],
+                            self.session_id,
+                            message["role"] == "user",
+                            message["content"],
+                            json.dumps(message["empathy_evaluation"]) if message["empathy_evaluation"] else None,
+                            message["time_sent"],
+                        )
+                        for message in messages
+                    ], template="(%s::uuid, %s::uuid, %s, %s, %s::jsonb, %s)")
+                if empathy_updates:
+                    execute_values(cursor, UPDATE_EMPATHY_SQL, [
+                        (message_id, json.dumps(evaluation)) for message_id, evaluation in empathy_updates.items()
+                    ])
+            conn.commit()
+            self.stats["messages"] += len(messages)
+            self.stats["empathy_updates"] += len(empathy_updates)
+            logger.info(f"💾 VOICE_JOURNAL_FLUSH: {len(messages)} messages, {len(empathy_updates)} empathy updates (session {self.session_id})")
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            logger.error(f"❌ VOICE_JOURNAL_PG_ERROR: {e}")
+        finally:
+            if conn:
+                return_pg_connection(conn)
+
+    def _write_history(self, messages: List[dict]) -> None:
+        if not messages:
+            return
+        try:
+            langchain_chat_history.append_messages(
+                self.session_id,
+                [(message["role"], message["content"]) for message in messages],
+                table_name=self.table_name
+            )
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            logger.error(f"❌ VOICE_JOURNAL_HISTORY_ERROR: {e}")
@@ -3,6 +3,7 @@ import sys
 import asyncio
 import base64
 import json
+import time
 import uuid
 import random
 import boto3
@@ -19,12 +20,87 @@ import requests
 from langchain_community.embeddings import BedrockEmbeddings
 from langchain_community.vectorstores import PGVector
 from voice_db_manager import voice_db_manager, get_pg_connection, return_pg_connection
+from empathy_prompt_registry import EmpathyPromptRegistry
+from message_journal import MessageJournal, JOURNAL_DRAIN_TIMEOUT_SECONDS
+from audio_input import AudioInputStage
+from evaluation_client import get_bedrock_runtime_client, invoke_model, run_blocking
+from audio_tap import AudioOutputTap
+from response_decoder import JsonEventDecoder, RESPONSE_RECORD_PATH, write_recorded_chunk
+from audio_transport import is_framed, read_frame, get_audio_output_channel, split_session_audio, FRAME_JSON, FRAME_AUDIO, FRAME_SESSION_AUDIO
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+def _query_empathy_prompt(sql):
+    conn = get_pg_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()
+    finally:
+        return_pg_connection(conn)
+
+# Loaded and validated once per process; re-checked against MAX(created_at) after EMPATHY_PROMPT_TTL_SECONDS
+empathy_prompt_registry = EmpathyPromptRegistry(_query_empathy_prompt, lambda: NovaSonic._get_default_empathy_prompt(None))
+
+# "process": one voice session per Python process (server.js spawns one per socket)
+# "shared": one long-lived worker hosts many sessions, every command and message carries its session_id
+NOVA_WORKER_MODE = os.getenv("NOVA_WORKER_MODE", "process").lower()
+
+def is_shared_worker():
+    return NOVA_WORKER_MODE == "shared"
+
+# Pre-started by server.js (NOVA_WARM_POOL_SIZE): warm up, then wait for start_session
+NOVA_WARM_START = os.getenv("NOVA_WARM_START", "false").lower() == "true"
+
+def emit_stdout(message):
+    """Send one JSON message to server.js"""
+    print(json.dumps(message), flush=True)
+
+
+class BotoCredentialsResolver:
+    """
+    Credentials for the Bedrock stream from the boto3 chain (the ECS task role)
+    A shared worker serves many users, so it cannot use per-user credentials from its environment
+    """
+
+    def __init__(self):
+        self._session = boto3.Session()
+
+    async def get_identity(self, *, identity_properties=None, **kwargs):
+        from smithy_aws_core.identity import AWSCredentialsIdentity
+        credentials = self._session.get_credentials().get_frozen_credentials()
+        return AWSCredentialsIdentity(
+            access_key_id=credentials.access_key,
+            secret_access_key=credentials.secret_key,
+            session_token=credentials.token,
+        )
+
+
+# Clients are shared by every session in the process
+_sonic_clients = {}
+
+def get_sonic_client(region):
+    """Cached bidirectional streaming client for the region"""
+    client = _sonic_clients.get(region)
+    if client is None:
+        if is_shared_worker():
+            credentials_resolver = BotoCredentialsResolver()
+        else:
+            # Use AWS recommended approach with updated import for EnvironmentCredentialsResolver
+            from smithy_aws_core.identity.environment import EnvironmentCredentialsResolver
+            credentials_resolver = EnvironmentCredentialsResolver()
+
+        config = Config(
+            endpoint_uri=f"https://bedrock-runtime.{region}.amazonaws.com",
+            region=region,
+            aws_credentials_identity_resolver=credentials_resolver,
+        )
+        client = _sonic_clients[region] = BedrockRuntimeClient(config=config)
+    return client
+
 # Audio config
 INPUT_SAMPLE_RATE = 16000
 OUTPUT_SAMPLE_RATE = 24000
@@ -32,14 +108,100 @@ CHANNELS = 1
 CHUNK_SIZE = 1024
 
 
+class AssembledTurn:
+    """One finalized conversation turn (role is "user" or "ai")"""
+
+    def __init__(self, role, text, stop_reason=None):
+        self.role = role
+        self.text = text
+        self.stop_reason = stop_reason
+        self.message_id = None
+
+
+class TurnAssembler:
+    """
+    Buffers textOutput between contentStart and contentEnd for each text content block,
+    then joins consecutive blocks from the same role into one finalized turn.
+    Speculative assistant blocks are only previews of the final block and are not kept.
+    """
+
+    TURN_END_REASONS = ("END_TURN", "INTERRUPTED")
+
+    def __init__(self):
+        self._blocks = {}
+        self._turn_role = None
+        self._turn_parts = []
+
+    @staticmethod
+    def _normalize_role(role):
+        return "ai" if role and role.upper() == "ASSISTANT" else "user"
+
+    def content_start(self, content_start):
+        if content_start.get("type") != "TEXT":
+            return
+        speculative = False
+        if "additionalModelFields" in content_start:
+            try:
+                fields = json.loads(content_start["additionalModelFields"])
+                speculative = fields.get("generationStage") == "SPECULATIVE"
+            except (ValueError, TypeError):
+                pass
+        self._blocks[content_start.get("contentId")] = {
+            "role": self._normalize_role(content_start.get("role")),
+            "speculative": speculative,
+            "parts": [],
+        }
+
+    def text_output(self, text_output, text):
+        content_id = text_output.get("contentId")
+        block = self._blocks.get(content_id)
+        if block is None:
+            block = self._blocks[content_id] = {
+                "role": self._normalize_role(text_output.get("role")),
+                "speculative": False,
+                "parts": [],
+            }
+        block["parts"].append(text)
+
+    def content_end(self, content_end):
+        """Close a content block; returns the turns it finalized (usually none or one)"""
+        block = self._blocks.pop(content_end.get("contentId"), None)
+        if block is None:
+            return []
+
+        turns = []
+        text = " ".join(part.strip() for part in block["parts"] if part.strip())
+        if text and not block["speculative"]:
+            if self._turn_role is not None and self._turn_role != block["role"]:
+                turns.extend(self.flush())
+            self._turn_role = block["role"]
+            self._turn_parts.append(text)
+
+        stop_reason = content_end.get("stopReason")
+        if stop_reason in self.TURN_END_REASONS and self._turn_role == block["role"]:
+            turns.extend(self.flush(stop_reason))
+        return turns
+
+    def flush(self, stop_reason=None):
+        """Finalize whatever turn is still open"""
+        if self._turn_role is None:
+            return []
+        turn = AssembledTurn(self._turn_role, " ".join(self._turn_parts), stop_reason)
+        self._turn_role = None
+        self._turn_parts = []
+        return [turn]
+
+
 class NovaSonic:
 
     def refresh_env_credentials(self):
         # Credentials already set by server.js via STS
         pass
 
-    def __init__(self, model_id='amazon.nova-2-sonic-v1:0', region=None, socket_client=None, voice_id=None, session_id=None):
-        self.user_id = os.getenv("USER_ID")
+    def __init__(self, model_id='amazon.nova-2-sonic-v1:0', region=None, socket_client=None, voice_id=None, session_id=None, config=None, emit=None):
+        # config carries the per-session settings in a shared worker; a per-socket process reads them from its environment
+        config = config or {}
+        self.user_id = config.get("user_id") or os.getenv("USER_ID")
         self.model_id = model_id
         self.region = 'us-east-1'
         self.deployment_region = region or os.getenv('AWS_REGION', 'us-east-1')
@@ -50,16 +212,21 @@ class NovaSonic:
         self.prompt_name = str(uuid.uuid4())
         self.content_name = str(uuid.uuid4())
         self.audio_content_name = str(uuid.uuid4())
-        self.audio_queue = asyncio.Queue()
+        # Raw output PCM for consumers that subscribe; bounded, and nothing is kept without subscribers
+        self.audio_tap = AudioOutputTap(sample_rate=OUTPUT_SAMPLE_RATE)
+        # Coalesces microphone chunks into fixed-size frames while an audio block is open
+        self.audio_input = None
         self.role = None
         self.display_assistant_text = False
         self.voice_id = voice_id
         self.session_id = session_id or os.getenv("SESSION_ID", "default")
-        self.patient_name = os.getenv("PATIENT_NAME", "")
-        self.patient_prompt = os.getenv("PATIENT_PROMPT", "")
-        self.llm_completion = os.getenv("LLM_COMPLETION", "false").lower() == "true"
-        self.extra_system_prompt = os.getenv("EXTRA_SYSTEM_PROMPT", "")
-        self.patient_id = os.getenv("PATIENT_ID", "")
+        self.patient_name = config.get("patient_name", os.getenv("PATIENT_NAME", ""))
+        self.patient_prompt = config.get("patient_prompt", os.getenv("PATIENT_PROMPT", ""))
+        self.llm_completion = str(config.get("llm_completion", os.getenv("LLM_COMPLETION", "false"))).lower() == "true"
+        self.extra_system_prompt = config.get("system_prompt", os.getenv("EXTRA_SYSTEM_PROMPT", ""))
+        self.patient_id = config.get("patient_id", os.getenv("PATIENT_ID", ""))
+        # Messages for server.js; a shared worker tags them with the session_id
+        self.emit = emit or emit_stdout
         # Cache system prompt and bedrock client
         self._cached_system_prompt = None
         self._bedrock_client = None
@@ -67,22 +234,20 @@ class NovaSonic:
         self._current_user_input = ""
         # Adding evaluation sequence tracking to prevent stale overwrites
         self._empathy_eval_sequence = 0
+        # Transcript fragments become whole turns before anything downstream sees them
+        self.turns = TurnAssembler()
+        self._last_user_message_id = None
+        # Transcript persistence happens off the event loop
+        self.journal = MessageJournal(self.session_id)
+        # Framed transport: audio output goes to its own pipe instead of JSON on stdout
+        self.audio_output = get_audio_output_channel()
+        self._audio_session_tag = config.get("route_id") if is_shared_worker() else None
 
     def _init_client(self):
         """Initialize the Bedrock Client for Nova"""
         try:
             print(f"🔧 Initializing Bedrock client for region: {self.region}", flush=True)
-            
-            # Use AWS recommended approach with updated import for EnvironmentCredentialsResolver
-            from smithy_aws_core.identity.environment import EnvironmentCredentialsResolver
-            
-            config = Config(
-                endpoint_uri=f"https://bedrock-runtime.{self.region}.amazonaws.com",
-                region=self.region,
-                aws_credentials_identity_resolver=EnvironmentCredentialsResolver(),
-            )
-            
-            self.client = BedrockRuntimeClient(config=config)
+            self.client = get_sonic_client(self.region)
             print(f"✅ Initialized Bedrock client for model {self.model_id} in region {self.region}", flush=True)
         except Exception as e:
             print(f"❌ Failed to initialize Bedrock client: {e}", flush=True)
@@ -204,15 +369,37 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
 
 
 
+    async def _load_session_prompt(self):
+        """
+        System prompt and earlier conversation, fetched on worker threads: they hit PostgreSQL, Secrets Manager,
+        Bedrock embeddings and DynamoDB, and a shared worker's event loop carries every other session's audio
+        """
+        loop = asyncio.get_running_loop()
+        if self._chat_context is None:
+            system_prompt, self._chat_context = await asyncio.gather(
+                loop.run_in_executor(None, self.get_system_prompt),
+                loop.run_in_executor(None, langchain_chat_history.format_chat_history, self.session_id),
+            )
+        else:
+            system_prompt = await loop.run_in_executor(None, self.get_system_prompt)
+        return system_prompt, self._chat_context
+
     async def start_session(self):
         """Start a new Nova Sonic session"""
         if not self.client:
             self._init_client()
 
+        # Fetch the prompt while the stream opens
+        prompt_task = asyncio.create_task(self._load_session_prompt())
+
         # Init stream
-        self.stream = await self.client.invoke_model_with_bidirectional_stream(
-            InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)
-        )
+        try:
+            self.stream = await self.client.invoke_model_with_bidirectional_stream(
+                InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)
+            )
+        except Exception:
+            prompt_task.cancel()
+            raise
         print("✅ Bidirectional stream initialized with Nova Sonic", flush=True)
         print(f"🗂️ Using session_id: {self.session_id}", flush=True)
         
@@ -277,13 +464,12 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
         }
         })
 
-        # Cache chat context to avoid repeated DB calls
-        if not self._chat_context:
-            self._chat_context = langchain_chat_history.format_chat_history(self.session_id)
+        # Chat context is cached on the session to avoid repeated DB calls
+        base_prompt, chat_context = await prompt_task
 
         system_prompt = f"""
-                        {self.get_system_prompt()}
-                        {self._chat_context}
+                        {base_prompt}
+                        {chat_context}
                         """
         
         # 4) textInput (your system prompt)
@@ -311,7 +497,7 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
         self.response = asyncio.create_task(self._process_responses())
 
         print(f"✅ Nova Sonic session started (Prompt ID: {self.prompt_name})", flush=True)
-        print(json.dumps({ "type": "text", "text": "Nova Sonic ready" }), flush=True)
+        self.emit({ "type": "text", "text": "Nova Sonic ready" })
 
     async def start_audio_input(self):
         self.audio_content_name = str(uuid.uuid4())
@@ -335,9 +521,25 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
             }
         }
         })
+        await self._stop_audio_input()
+        self.audio_input = AudioInputStage(self._send_audio_frame, sample_rate=INPUT_SAMPLE_RATE)
+        self.audio_input.start()
     
     async def send_audio_chunk(self, audio_bytes):
-        blob = base64.b64encode(audio_bytes).decode("utf-8")
+        if self.audio_input:
+            await self.audio_input.put(audio_bytes)
+        else:
+            await self._send_audio_frame(base64.b64encode(audio_bytes).decode("utf-8"))
+
+    async def send_audio_base64(self, blob):
+        """Queue base64 audio from the browser; it reaches Bedrock in coalesced frames"""
+        if self.audio_input:
+            await self.audio_input.put_base64(blob)
+        else:
+            # No open audio block: forward as is
+            await self._send_audio_frame(blob)
+
+    async def _send_audio_frame(self, blob):
         await self.send_event({
         "event": {
             "audioInput": {
@@ -348,7 +550,17 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
         }
         })
     
+    async def _stop_audio_input(self, flush=False):
+        audio_input, self.audio_input = self.audio_input, None
+        if audio_input:
+            if flush:
+                await audio_input.flush()
+            await audio_input.stop()
+            logger.info(f"🎙️ AUDIO_INPUT_STATS: {audio_input.snapshot()} ({self.session_id})")
+
     async def end_audio_input(self):
+        # Buffered audio must reach Bedrock before the contentEnd
+        await self._stop_audio_input(flush=True)
         await self.send_event({
         "event": {
             "contentEnd": {
@@ -358,8 +570,12 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
         }
         })
         
+        # A user turn still waiting for its contentEnd is complete now
+        for turn in self.turns.flush():
+            self._handle_turn(turn)
+
         # Trigger empathy evaluation for the completed user audio input if enabled
-        if hasattr(self, '_current_user_input') and self._current_user_input and self._current_user_input.strip():
+        if self._current_user_input and self._current_user_input.strip():
             print(f"🔍 DEBUG: Audio ended, user input: {self._current_user_input[:50]}...", flush=True)
             logger.info(f"🎤 AUDIO END - User input: {self._current_user_input[:30]}...")
             
@@ -370,9 +586,8 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
             # capturing the user input BEFORE creating async task to prevent race condition
             captured_user_input = self._current_user_input
             print(f"EVALUATION SEQUENCE: {current_sequence}: Starting for user input: {captured_user_input[:50]}...", flush=True)
-            # Save user message to DB (CRITICAL for empathy coach review)
-            print(f"💾 AUDIO END: Saving accumulated user input to DB", flush=True)
-            asyncio.create_task(self._save_user_message_async(self._current_user_input))
+            # The user's turns are already journaled; the evaluation is attached to the latest one
+            message_id = self._last_user_message_id
             
             # CRITICAL: Direct empathy evaluation for voice input
             print(f"🧠 AUDIO END: Starting DIRECT empathy evaluation for voice input", flush=True)
@@ -382,7 +597,7 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
             async def safe_empathy_eval():
                 try:
                     print(f"🧠 VOICE EMPATHY: Starting evaluation task", flush=True)
-                    result = await self._evaluate_empathy(captured_user_input, patient_context)
+                    result = await self._evaluate_empathy(captured_user_input, patient_context, message_id=message_id)
                     if result:
                         print(f"🧠 VOICE EMPATHY: Evaluation completed successfully", flush=True)
                     else:
@@ -401,17 +616,31 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
             print(f"🔍 DEBUG: No user input to save at audio end", flush=True)
 
     async def end_session(self):
-        # promptEnd
-        await self.send_event({
-        "event": {
-            "promptEnd": { "promptName": self.prompt_name }
-        }
-        })
-        # sessionEnd
-        await self.send_event({
-        "event": { "sessionEnd": {} }
-        })
-        await self.stream.input_stream.close()
+        try:
+            await self._stop_audio_input()
+            # promptEnd
+            await self.send_event({
+            "event": {
+                "promptEnd": { "promptName": self.prompt_name }
+            }
+            })
+            # sessionEnd
+            await self.send_event({
+            "event": { "sessionEnd": {} }
+            })
+            await self.stream.input_stream.close()
+        finally:
+            # The response loop would otherwise retry the closed stream for the life of a shared worker
+            self.is_active = False
+            response, self.response = self.response, None
+            if response and not response.done():
+                response.cancel()
+                await asyncio.gather(response, return_exceptions=True)
+            for turn in self.turns.flush():
+                self._handle_turn(turn)
+            # Bounded wait for the transcript still queued for the database
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.journal.close, JOURNAL_DRAIN_TIMEOUT_SECONDS)
     
     async def handle_manual_empathy_evaluation(self, text, session_id=None):
         """Handle manual empathy evaluation requests from server.js"""
@@ -422,14 +651,14 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
             # Use provided session_id or fall back to instance session_id
             eval_session_id = session_id or self.session_id
             
-            # Save the user message first
+            # Journal the user message first
             print(f"💾 MANUAL EMPATHY: Saving user message to DB", flush=True)
-            await self._save_user_message_async(text)
+            message_id = self.journal.record_message("user", text)
             
             # Run empathy evaluation
             print(f"🧠 MANUAL EMPATHY: Starting empathy evaluation", flush=True)
             patient_context = f"Patient: {self.patient_name}, Condition: {self.patient_prompt}"
-            empathy_result = await self._evaluate_empathy(text, patient_context)
+            empathy_result = await self._evaluate_empathy(text, patient_context, message_id=message_id)
             
             if empathy_result:
                 print(f"🧠 MANUAL EMPATHY: Evaluation successful", flush=True)
@@ -444,8 +673,8 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
 
     async def _process_responses(self):
         """Process responses from the stream, buffering partial JSON."""
-        decoder = json.JSONDecoder()
-        buffer = ""  # accumulate incoming text here
+        decoder = JsonEventDecoder()
+        record = open(RESPONSE_RECORD_PATH, "ab") if RESPONSE_RECORD_PATH else None
 
         try:
             while self.is_active:
@@ -456,19 +685,12 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
                     if not (result.value and result.value.bytes_):
                         continue
 
-                    chunk = result.value.bytes_.decode("utf-8")
-                    buffer += chunk
+                    chunk = result.value.bytes_
+                    if record:
+                        write_recorded_chunk(record, chunk)
 
-                    idx = 0
-                    while True:
-                        try:
-                            obj, offset = decoder.raw_decode(buffer[idx:])
-                        except json.JSONDecodeError:
-                            break
-                        idx += offset
+                    for obj in decoder.feed(chunk):
                         await self._handle_event(obj)
-
-                    buffer = buffer[idx:]
                 except Exception as inner_e:
                     print(f"🔥 Error in _process_responses() [inner loop]: {inner_e}", flush=True)
                     await asyncio.sleep(0.1)
@@ -477,6 +699,10 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
         except Exception as e:
             print(f"🔥 Error in _process_responses(): {e}", flush=True)
             self.is_active = False # signal for monitor task
+        finally:
+            if record:
+                record.close()
+            logger.info(f"📥 RESPONSE_DECODER: {decoder.stats} ({self.session_id})")
 
         
 
@@ -492,6 +718,7 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
             if "additionalModelFields" in content_start:
                 fields = json.loads(content_start["additionalModelFields"])
                 self.display_assistant_text = (fields.get("generationStage") == "SPECULATIVE")
+            self.turns.content_start(content_start)
 
         # textOutput
         elif "textOutput" in evt:
@@ -512,125 +739,56 @@ Never provide medical advice, diagnoses, or pharmaceutical recommendations. Alwa
             
             if self.role == "ASSISTANT":
                 print(f"Assistant: {text}", flush=True)
-                print(json.dumps({"type": "text", "text": text}), flush=True)
+                self.emit({"type": "text", "text": text})
                 
                 # If diagnosis achieved, signal completion
                 if diagnosis_achieved and self.llm_completion:
-                    print(json.dumps({"type": "diagnosis_complete", "text": "Session completed successfully"}), flush=True)
+                    self.emit({"type": "diagnosis_complete", "text": "Session completed successfully"})
 
             elif self.role == "USER":
                 print(f"User: {text}", flush=True)
                 # print(json.dumps({"type": "text", "text": text}), flush=True) <- we don't want to send this concatenated text to the frontend
                 
-                # CRITICAL FIX: Accumulate user input for empathy evaluation
-                if not hasattr(self, '_current_user_input'):
-                    self._current_user_input = ""
-                
-                # CRITICAL: Ensure we're accumulating the actual text
-                if text and text.strip():
-                    self._current_user_input += text
-                    print(f"🔍 DEBUG: Accumulated user input now: {len(self._current_user_input)} chars", flush=True)
-                
-                # no evaluation/DB save here, evaluation will be done ONCE in end_audio_input() with complete text
+                # no evaluation/DB save here, the finalized turn is handled in _handle_turn()
 
-            logger.info(f"💬 [add_message] {self.role.upper()} | {self.session_id} | {text[:30]}")
+            self.turns.text_output(evt["textOutput"], text)
 
-            # Mirror to PostgreSQL
-            try:
-                normalized_role = "ai" if self.role and self.role.upper() == "ASSISTANT" else "user"
-                langchain_chat_history.add_message(self.session_id, normalized_role, text)
-                
-                # Save ALL messages to messages table (both USER and ASSISTANT)
-                if self.role and self.role.upper() == "ASSISTANT":
-                    print(f"💾 SAVING ASSISTANT MESSAGE TO DB: {text[:50]}...", flush=True)
-                    self._save_message_to_db(self.session_id, False, text, None)
-                elif self.role and self.role.upper() == "USER":
-                    print(f"💾 SAVING USER MESSAGE TO DB (BACKUP): {text[:50]}...", flush=True)
-                    # Backup save in case async save fails
-                    self._save_message_to_db(self.session_id, True, text, None)
-                    
-                logger.info(f"💬 [PG INSERT] {normalized_role.upper()} | {self.session_id} | {text[:30]}")
-            except Exception as e:
-                print(f"❌ Failed to insert message into PostgreSQL: {e}", flush=True)
+        # contentEnd
+        elif "contentEnd" in evt:
+            for turn in self.turns.content_end(evt["contentEnd"]):
+                self._handle_turn(turn)
 
         # audioOutput
         elif "audioOutput" in evt:
             b64 = evt["audioOutput"]["content"]
-            audio_bytes = base64.b64decode(b64)
-            await self.audio_queue.put(audio_bytes)
-            print(json.dumps({
-                "type": "audio",
-                "data": b64,
-                "size": len(audio_bytes)
-            }), flush=True)
+            self.audio_tap.publish_base64(b64)
+            if self.audio_output:
+                self.audio_output.write(b64, self._audio_session_tag)
+            else:
+                self.emit({
+                    "type": "audio",
+                    "data": b64,
+                    "size": len(b64) * 3 // 4 - b64.count("=", -2)
+                })
+
+    def _handle_turn(self, turn):
+        """Persist one finalized turn and collect user speech for the evaluation done in end_audio_input()"""
+        turn.message_id = self.journal.record_message(turn.role, turn.text)
+        logger.info(f"💬 [turn] {turn.role.upper()} | {self.session_id} | {turn.stop_reason} | {turn.text[:30]}")
+        if turn.role == "user":
+            self._last_user_message_id = turn.message_id
+            self._current_user_input = f"{self._current_user_input} {turn.text}".strip()
+            print(f"🔍 DEBUG: Accumulated user input now: {len(self._current_user_input)} chars", flush=True)
 
     def _get_bedrock_client(self):
-        """Cached bedrock client"""
+        """Cached bedrock client, shared by every session in the process"""
         if not self._bedrock_client:
-            self._bedrock_client = boto3.client("bedrock-runtime", region_name="us-east-1")
+            self._bedrock_client = get_bedrock_runtime_client("us-east-1")
         return self._bedrock_client
     
     def _get_empathy_prompt(self):
-        """Retrieve the latest empathy prompt from the empathy_prompt_history table using centralized connection manager."""
-        try:
-            logger.info("🔍 VOICE: RETRIEVING EMPATHY PROMPT FROM DATABASE")
-            logger.info("🔗 VOICE_EMPATHY_PROMPT: Using centralized voice connection manager")
-            
-            # Log pool status for monitoring
-            pool_status = voice_db_manager.get_pool_status()
-            logger.info(f"🔗 VOICE_POOL_STATUS: {pool_status}")
-            
-            conn = get_pg_connection()
-            cursor = conn.cursor()
-
-            cursor.execute(
-                'SELECT prompt_content, created_at FROM empathy_prompt_history ORDER BY created_at DESC LIMIT 1'
-            )
-            
-            result = cursor.fetchone()
-            cursor.close()
-            return_pg_connection(conn)
-
-            if result and result[0]:
-                prompt_content = result[0]
-                created_at = result[1]
-                logger.info(f"🎯 VOICE: ADMIN EMPATHY PROMPT FOUND - Created: {created_at}")
-                logger.info(f"🎯 VOICE: ADMIN PROMPT LENGTH: {len(prompt_content)} characters")
-                
-                # Check if prompt has required placeholders
-                if '{patient_context}' not in prompt_content or '{user_text}' not in prompt_content:
-                    logger.error("❌ VOICE: ADMIN PROMPT MISSING REQUIRED PLACEHOLDERS")
-                    return self._get_default_empathy_prompt()
-                
-                # Fix JSON formatting issues - replace single braces with double braces in JSON template
-                if '"empathy_score":' in prompt_content and '{{' not in prompt_content:
-                    logger.info("🔧 VOICE: FIXING ADMIN PROMPT JSON FORMATTING")
-                    import re
-                    # More robust pattern to handle multiline JSON with whitespace
-                    json_pattern = r'(\{[^{}]*?"empathy_score"[^{}]*?\})'
-                    matches = re.findall(json_pattern, prompt_content, re.DOTALL)
-                    
-                    if matches:
-                        for match in matches:
-                            # Replace single braces with double braces for literal JSON
-                            fixed_match = match.replace('{', '{{').replace('}', '}}')
-                            prompt_content = prompt_content.replace(match, fixed_match)
-                        logger.info("✅ VOICE: ADMIN PROMPT JSON FORMATTING FIXED")
-                    else:
-                        # Fallback: simple replacement for any JSON-like structure
-                        logger.info("🔧 VOICE: APPLYING FALLBACK JSON FORMATTING")
-                        prompt_content = re.sub(r'\{(\s*"empathy_score"[^}]*?)\}', r'{{\1}}', prompt_content, flags=re.DOTALL)
-                        logger.info("✅ VOICE: FALLBACK JSON FORMATTING APPLIED")
-                
-                return prompt_content
-            else:
-                logger.info("🔧 VOICE: No admin prompt found, using default empathy prompt")
-                return self._get_default_empathy_prompt()
-
-        except Exception as e:
-            logger.error(f"VOICE: Error retrieving empathy prompt from DB: {e}")
-            logger.info("🔧 VOICE: Falling back to default empathy prompt")
-            return self._get_default_empathy_prompt()
+        """Get the active empathy prompt, already validated and compiled, from the process-wide registry."""
+        return empathy_prompt_registry.get()
     
     def _get_default_empathy_prompt(self):
         """Default empathy evaluation prompt."""
@@ -725,22 +883,8 @@ Provide structured evaluation with detailed justifications for each score.
 }}
 """
     
-    async def _save_user_message_async(self, user_text):
-        """Save user message to database asynchronously"""
-        try:
-            loop = asyncio.get_event_loop()
-            print(f"💾 ASYNC SAVE: Starting save for user text: {user_text[:50]}...", flush=True)
-            await loop.run_in_executor(None, self._save_message_to_db, self.session_id, True, user_text, None)
-            # Also add to chat history
-            await loop.run_in_executor(None, langchain_chat_history.add_message, self.session_id, "user", user_text)
-            print(f"✅ ASYNC SAVE COMPLETE: User message saved to DB", flush=True)
-            logger.info(f"💾 User audio message saved: {user_text[:30]}...")
-        except Exception as e:
-            print(f"❌ ASYNC SAVE FAILED: {e}", flush=True)
-            logger.error(f"Failed to save user audio message: {e}")
-    
-    async def _evaluate_empathy(self, student_response, patient_context, sequence=None):
-        """LLM-as-a-Judge empathy evaluation using admin-controlled prompt system"""
+    async def _evaluate_empathy(self, student_response, patient_context, sequence=None, message_id=None):
+        """LLM-as-a-Judge empathy evaluation using admin-controlled prompt system; the result is attached to message_id"""
 
         # first, checking if this evaluation is still relevant
         if sequence is not None and sequence < self._empathy_eval_sequence:
@@ -772,44 +916,13 @@ Provide structured evaluation with detailed justifications for each score.
             logger.warning(f"⚠️ VOICE: Using default patient context")
             
         try:
-            print(f"🧠 VOICE: Creating bedrock client for region: {self.deployment_region or 'us-east-1'}", flush=True)
-            bedrock_client = boto3.client("bedrock-runtime", region_name=self.deployment_region or 'us-east-1')
-            
-            # Get admin-controlled empathy prompt (same as chat.py)
-            empathy_prompt_template = self._get_empathy_prompt()
-            logger.info(f"🎯 VOICE: EMPATHY PROMPT LENGTH: {len(empathy_prompt_template)} characters")
-            
-            try:
-                evaluation_prompt = empathy_prompt_template.format(
-                    patient_context=patient_context,
-                    user_text=student_response
-                )
-                logger.info(f"✅ VOICE: PROMPT FORMATTING SUCCESSFUL - Final prompt length: {len(evaluation_prompt)}")
-                
-                # CRITICAL VALIDATION: Ensure the user text was actually substituted
-                if student_response not in evaluation_prompt:
-                    logger.error(f"❌ VOICE: USER TEXT NOT FOUND IN FORMATTED PROMPT - This will cause hallucination!")
-                    return None
-                    
-            except Exception as format_error:
-                logger.error(f"❌ VOICE: ADMIN PROMPT FORMATTING ERROR: {format_error}")
-                logger.error(f"❌ VOICE: FALLING BACK TO DEFAULT EMPATHY PROMPT")
-                try:
-                    default_prompt = self._get_default_empathy_prompt()
-                    evaluation_prompt = default_prompt.format(
-                        patient_context=patient_context,
-                        user_text=student_response
-                    )
-                    logger.info(f"✅ VOICE: DEFAULT PROMPT FORMATTING SUCCESSFUL")
-                    
-                    # CRITICAL VALIDATION: Ensure user text is in default prompt too
-                    if student_response not in evaluation_prompt:
-                        logger.error(f"❌ VOICE: USER TEXT NOT FOUND IN DEFAULT PROMPT EITHER")
-                        return None
-                        
-                except Exception as default_error:
-                    logger.error(f"❌ VOICE: DEFAULT PROMPT ALSO FAILED: {default_error}")
-                    return None
+            # Get admin-controlled empathy prompt (same as chat.py); a TTL refresh queries the DB
+            empathy_prompt = await run_blocking(self._get_empathy_prompt)
+            evaluation_prompt = empathy_prompt.format(
+                patient_context=patient_context,
+                user_text=student_response
+            )
+            logger.info(f"🎯 VOICE: EMPATHY PROMPT ({empathy_prompt.source}) - Final prompt length: {len(evaluation_prompt)}")
             
             print(f"🧠 VOICE: Sending evaluation prompt to Nova Pro", flush=True)
             
@@ -824,26 +937,9 @@ Provide structured evaluation with detailed justifications for each score.
                 }
             }
             
-            try:
-                response = bedrock_client.invoke_model(
-                    modelId="amazon.nova-pro-v1:0",
-                    contentType="application/json",
-                    accept="application/json",
-                    body=json.dumps(body)
-                )
-                logger.info("✅ VOICE: BEDROCK MODEL CALL SUCCESSFUL")
-            except Exception as model_error:
-                logger.warning(f"VOICE: Nova Pro failed in deployment region, trying us-east-1: {model_error}")
-                fallback_client = boto3.client("bedrock-runtime", region_name="us-east-1")
-                response = fallback_client.invoke_model(
-                    modelId="amazon.nova-pro-v1:0",
-                    contentType="application/json",
-                    accept="application/json",
-                    body=json.dumps(body)
-                )
-                logger.info("✅ VOICE: BEDROCK FALLBACK CALL SUCCESSFUL")
-            
-            result = json.loads(response["body"].read())
+            # Runs on the evaluation executor with a timeout; the audio loop keeps going meanwhile
+            result = await invoke_model("amazon.nova-pro-v1:0", body, region=self.deployment_region or 'us-east-1')
+            logger.info("✅ VOICE: BEDROCK MODEL CALL SUCCESSFUL")
             response_text = result["output"]["message"]["content"][0]["text"]
             logger.info(f"📝 VOICE: BEDROCK RESPONSE LENGTH: {len(response_text)} characters")
             
@@ -881,7 +977,10 @@ Provide structured evaluation with detailed justifications for each score.
                 empathy_result["judge_model"] = "amazon.nova-pro-v1:0"
                 
                 # Save to database
-                self._save_message_to_db(self.session_id, True, student_response, empathy_result)
+                if message_id:
+                    self.journal.attach_empathy(message_id, empathy_result)
+                else:
+                    self.journal.record_message("user", student_response, empathy_result)
                 
                 # before sending feedback, check if still latest
                 if sequence is not None and sequence < self._empathy_eval_sequence:
@@ -890,8 +989,8 @@ Provide structured evaluation with detailed justifications for each score.
                 # Send empathy feedback
                 empathy_feedback = self._build_empathy_feedback(empathy_result)
                 if empathy_feedback:
-                    print(json.dumps({"type": "empathy", "content": empathy_feedback}), flush=True)
-                    print(json.dumps({"type": "empathy_data", "content": json.dumps(empathy_result)}), flush=True)
+                    self.emit({"type": "empathy", "content": empathy_feedback})
+                    self.emit({"type": "empathy_data", "content": json.dumps(empathy_result)})
                     logger.info(f"🧠 VOICE: Empathy feedback sent to frontend")
                 
                 logger.info(f"✅ VOICE: EMPATHY EVALUATION COMPLETED SUCCESSFULLY")
@@ -903,14 +1002,11 @@ Provide structured evaluation with detailed justifications for each score.
         except json.JSONDecodeError as e:
             logger.error(f"❌ VOICE: JSON DECODE ERROR: {e}")
             return None
+        except asyncio.TimeoutError:
+            logger.error(f"❌ VOICE: EMPATHY EVALUATION TIMED OUT")
+            return None
         except Exception as e:
             logger.error(f"❌ VOICE: EMPATHY EVALUATION ERROR: {e}")
-            # Fallback: Save message without empathy data
-            try:
-                self._save_message_to_db(self.session_id, True, student_response, None)
-                logger.info(f"🧠 VOICE: Message saved without empathy data as fallback")
-            except Exception as save_error:
-                logger.error(f"🧠 VOICE: Failed to save message as fallback: {save_error}")
             return None
     
     def _get_medical_context(self):
@@ -976,6 +1072,43 @@ Provide structured evaluation with detailed justifications for each score.
             logger.info("📋 VOICE: Continuing without medical context")
             return None
     
+    def _search_diagnosis_documents(self, text):
+        """Blocking vectorstore lookup of the patient documents relevant to the student's diagnosis"""
+        # Get database connection details
+        db_secret_name = os.getenv("SM_DB_CREDENTIALS")
+        rds_endpoint = os.getenv("RDS_PROXY_ENDPOINT")
+        
+        if not db_secret_name or not rds_endpoint:
+            logger.warning("🩺 VOICE: Database credentials not available for diagnosis")
+            return None
+        
+        # Get database credentials
+        secrets_client = boto3.client('secretsmanager')
+        secret_response = secrets_client.get_secret_value(SecretId=db_secret_name)
+        secret = json.loads(secret_response['SecretString'])
+        
+        # Embeddings use the cached bedrock client
+        embeddings = BedrockEmbeddings(model_id="amazon.titan-embed-text-v1", client=get_bedrock_runtime_client(self.deployment_region or 'us-east-1'))
+        
+        # Connect to vectorstore using RDS proxy
+        connection_string = f"postgresql://{secret['username']}:{secret['password']}@{rds_endpoint}:{secret['port']}/{secret['dbname']}"
+        vectorstore = PGVector(embedding_function=embeddings, collection_name=self.patient_id, connection_string=connection_string)
+        
+        # Search for relevant medical documents
+        try:
+            docs = vectorstore.similarity_search(text, k=3)
+            
+            if docs and len(docs) > 0:
+                # Filter out empty documents
+                valid_docs = [doc for doc in docs if doc.page_content and doc.page_content.strip()]
+                logger.info(f"🩺 VOICE: Found {len(valid_docs)} valid documents for diagnosis")
+                return "\n".join([doc.page_content for doc in valid_docs]) if valid_docs else ""
+            logger.info("🩺 VOICE: No documents found for diagnosis evaluation")
+            return ""
+        except Exception as search_error:
+            logger.error(f"🩺 VOICE: Document search failed: {search_error}")
+            return ""
+
     async def _evaluate_diagnosis_async(self, text):
         """Evaluate diagnosis using medical documents from vectorstore"""
         try:
@@ -985,43 +1118,11 @@ Provide structured evaluation with detailed justifications for each score.
                 logger.warning("🩺 VOICE: No patient_id available for diagnosis evaluation")
                 return
             
-            # Get database connection details
-            db_secret_name = os.getenv("SM_DB_CREDENTIALS")
-            rds_endpoint = os.getenv("RDS_PROXY_ENDPOINT")
-            
-            if not db_secret_name or not rds_endpoint:
-                logger.warning("🩺 VOICE: Database credentials not available for diagnosis")
+            # Secret lookup, embedding and vector search all block, so they run on the evaluation executor
+            doc_content = await run_blocking(self._search_diagnosis_documents, text)
+            if doc_content is None:
                 return
             
-            # Get database credentials
-            secrets_client = boto3.client('secretsmanager')
-            secret_response = secrets_client.get_secret_value(SecretId=db_secret_name)
-            secret = json.loads(secret_response['SecretString'])
-            
-            # Create bedrock client and embeddings
-            bedrock_client = boto3.client("bedrock-runtime", region_name=self.deployment_region or 'us-east-1')
-            embeddings = BedrockEmbeddings(model_id="amazon.titan-embed-text-v1", client=bedrock_client)
-            
-            # Connect to vectorstore using RDS proxy
-            connection_string = f"postgresql://{secret['username']}:{secret['password']}@{rds_endpoint}:{secret['port']}/{secret['dbname']}"
-            vectorstore = PGVector(embedding_function=embeddings, collection_name=self.patient_id, connection_string=connection_string)
-            
-            # Search for relevant medical documents
-            try:
-                docs = vectorstore.similarity_search(text, k=3)
-                
-                if docs and len(docs) > 0:
-                    # Filter out empty documents
-                    valid_docs = [doc for doc in docs if doc.page_content and doc.page_content.strip()]
-                    doc_content = "\n".join([doc.page_content for doc in valid_docs]) if valid_docs else ""
-                    logger.info(f"🩺 VOICE: Found {len(valid_docs)} valid documents for diagnosis")
-                else:
-                    doc_content = ""
-                    logger.info("🩺 VOICE: No documents found for diagnosis evaluation")
-            except Exception as search_error:
-                logger.error(f"🩺 VOICE: Document search failed: {search_error}")
-                doc_content = ""
-            
             # Create diagnosis evaluation prompt
             if doc_content:
                 prompt = f"""You are to answer the following question, and you MUST answer only one word which is either 'True' or 'False' with that exact wording, no extra words, only one of those. INFORMATION FOR THE QUESTION TO ANSWER: Based on the medical documents provided, is the student's diagnosis correct? Student said: {text}. Medical documents: {doc_content}"""
@@ -1034,35 +1135,19 @@ Provide structured evaluation with detailed justifications for each score.
                 "inferenceConfig": {"temperature": 0.1}
             }
             
-            try:
-                response = bedrock_client.invoke_model(
-                    modelId="amazon.nova-lite-v1:0",
-                    contentType="application/json",
-                    accept="application/json",
-                    body=json.dumps(body)
-                )
-                logger.info("✅ VOICE: DIAGNOSIS MODEL CALL SUCCESSFUL")
-            except Exception as model_error:
-                logger.warning(f"🩺 VOICE: Nova Lite failed in deployment region, trying us-east-1: {model_error}")
-                fallback_client = boto3.client("bedrock-runtime", region_name="us-east-1")
-                response = fallback_client.invoke_model(
-                    modelId="amazon.nova-lite-v1:0",
-                    contentType="application/json",
-                    accept="application/json",
-                    body=json.dumps(body)
-                )
-                logger.info("✅ VOICE: DIAGNOSIS FALLBACK CALL SUCCESSFUL")
-            
-            result = json.loads(response["body"].read())
+            result = await invoke_model("amazon.nova-lite-v1:0", body, region=self.deployment_region or 'us-east-1')
+            logger.info("✅ VOICE: DIAGNOSIS MODEL CALL SUCCESSFUL")
             verdict_text = result["output"]["message"]["content"][0]["text"].strip()
             
             logger.info(f"🩺 VOICE: Diagnosis verdict: {verdict_text}")
             print(f"🩺 Diagnosis verdict: {verdict_text}", flush=True)
             
             if verdict_text.lower() == "true":
-                print(json.dumps({"type": "diagnosis_verdict", "verdict": True}), flush=True)
+                self.emit({"type": "diagnosis_verdict", "verdict": True})
                 logger.info("🩺 VOICE: Correct diagnosis detected - session completion triggered")
                 
+        except asyncio.TimeoutError:
+            logger.error("🩺 VOICE: Diagnosis evaluation timed out")
         except Exception as e:
             logger.error(f"🩺 VOICE: Diagnosis evaluation error: {e}")
             # Don't crash the voice session if diagnosis evaluation fails
@@ -1120,52 +1205,186 @@ Provide structured evaluation with detailed justifications for each score.
         except Exception as e:
             logger.error(f"Error building empathy feedback: {e}")
             return None
-    
-    def _save_message_to_db(self, session_id, is_student, content, empathy_data):
-        """Save message to database using centralized voice connection manager"""
-        try:
-            print(f"💾 DB SAVE: Starting save - Student: {is_student}, Content: {content[:50]}...", flush=True)
-            logger.info(f"💾 Starting DB save for {'student' if is_student else 'assistant'} message")
-            logger.info("🔗 VOICE_DB_SAVE: Using centralized voice connection manager")
-            
-            conn = get_pg_connection()
-            cursor = conn.cursor()
-            
-            # Insert into messages table
-            insert_query = """
-                INSERT INTO messages (session_id, student_sent, message_content, empathy_evaluation, time_sent) 
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            
-            empathy_json = json.dumps(empathy_data) if empathy_data else None
-            
-            cursor.execute(insert_query, (
-                session_id,
-                is_student,
-                content,
-                empathy_json,
-                datetime.now()
+
+
+async def run_session_command(nova, command):
+    """Commands for a running session (everything except start_session and end_session)"""
+    cmd_type = command.get("type", "unknown")
+
+    if cmd_type == "start_audio":
+        if nova:
+            print("starting audio input...", flush=True)
+            await nova.start_audio_input()
+        else:
+            print("cannot start audio, nova NOT initialised", flush=True)
+
+    elif cmd_type == "audio":
+        if nova:
+            # Already base64 from the browser; pass it straight through
+            await nova.send_audio_base64(command["data"])
+        else:
+            print("cannot send audio, nova NOT initialised", flush=True)
+
+    elif cmd_type == "end_audio":
+        if nova:
+            print("ending audio input...", flush=True)
+            await nova.end_audio_input()
+        else:
+            print("cannot end audio, nova NOT initialised", flush=True)
+
+    elif cmd_type == "evaluate_empathy":
+        if nova:
+            print(f"processing empathy evaluation request!!", flush=True)
+            asyncio.create_task(nova.handle_manual_empathy_evaluation(
+                command["text"],
+                command.get("session_id")
             ))
-            
-            conn.commit()
-            cursor.close()
-            return_pg_connection(conn)
-            
-            print(f"✅ DB SAVE COMPLETE: Message saved to database using voice connection manager", flush=True)
-            logger.info(f"💾 Message saved to DB using voice connection manager")
-            
-            # Also save to PostgreSQL chat history
-            try:
-                role = "user" if is_student else "assistant"
-                langchain_chat_history.add_message(session_id, role, content)
-                logger.info(f"💾 Saved message to PostgreSQL (session_id={session_id}, role={role})")
-            except Exception as pg_error:
-                logger.error(f"💾 Failed to save to PostgreSQL chat history: {pg_error}")
-            
+
+    elif cmd_type == "text":
+        print(f"TEXT INPUT: {command.get('data', '')[:50]}...", flush=True)
+
+
+def apply_session_credentials(credentials):
+    """Per-user AWS credentials sent with start_session to a warm worker, which was spawned before the user was known"""
+    if not credentials:
+        return
+    os.environ["AWS_ACCESS_KEY_ID"] = credentials["access_key_id"]
+    os.environ["AWS_SECRET_ACCESS_KEY"] = credentials["secret_access_key"]
+    os.environ["AWS_SESSION_TOKEN"] = credentials.get("session_token") or ""
+
+
+def warm_up():
+    """Per-process setup done before any session exists, so start_session only pays for the Bedrock stream handshake"""
+    start_time = time.time()
+    try:
+        from smithy_aws_core.identity.environment import EnvironmentCredentialsResolver  # noqa: F401
+    except Exception as e:
+        print(f"♨️ WARM UP: credentials resolver import failed: {e}", flush=True)
+    try:
+        # Creates the pool (secret lookup + min connections) with the task role
+        return_pg_connection(get_pg_connection())
+    except Exception as e:
+        print(f"♨️ WARM UP: DB pool not ready: {e}", flush=True)
+    try:
+        empathy_prompt_registry.get()
+    except Exception as e:
+        print(f"♨️ WARM UP: empathy prompt not loaded: {e}", flush=True)
+    print(f"♨️ WARM UP: done in {time.time() - start_time:.2f}s", flush=True)
+
+
+def restart_dead_response_task(nova):
+    """Restart the response processing task of an active session if it has died"""
+    if nova and nova.is_active:
+        if nova.response is None or nova.response.done():
+            if nova.response and nova.response.done():
+                # checking for failure
+                try:
+                    exc = nova.response.exception()
+                    if exc:
+                        print(f"RESPONSE TASK DIED WITH EXCEPTION: {exc}", flush=True)
+                except asyncio.CancelledError:
+                    print("RESPONSE TASK WAS CANCELLED", flush=True)
+                except asyncio.InvalidStateError:
+                    pass
+            print(f"RESTARTING RESPONSE TASK ({nova.session_id})", flush=True)
+            nova.response = asyncio.create_task(nova._process_responses())
+
+
+class VoiceSessionRouter:
+    """
+    Hosts many NovaSonic sessions in one process (NOVA_WORKER_MODE=shared), keyed by the route_id server.js
+    generates per voice start (never the client's session_id, which two sockets may share)
+    Each session has its own command queue: commands stay in order within a session, and a
+    slow start or end of one session never holds up another
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self._queues = {}
+        self._tasks = {}
+
+    @staticmethod
+    def _emitter(route_id):
+        def emit(message):
+            emit_stdout({**message, "route_id": route_id})
+        return emit
+
+    def dispatch(self, command):
+        """Queue one command for its session; start_session creates the session's queue"""
+        route_id = command.get("route_id")
+        if not route_id:
+            print(f"ROUTER: {command.get('type', 'unknown')} without route_id dropped", flush=True)
+            return
+
+        queue = self._queues.get(route_id)
+        if queue is None:
+            if command.get("type") != "start_session":
+                print(f"ROUTER: {command.get('type', 'unknown')} for unknown session {route_id} dropped", flush=True)
+                return
+            queue = self._queues[route_id] = asyncio.Queue()
+            self._tasks[route_id] = asyncio.create_task(self._run_session(route_id, queue))
+        queue.put_nowait(command)
+
+    async def _run_session(self, route_id, queue):
+        try:
+            while True:
+                command = await queue.get()
+                await self._handle(route_id, command)
+                # A start_session queued behind the end keeps this session's queue alive
+                if command.get("type") == "end_session" and queue.empty():
+                    break
+        finally:
+            self._queues.pop(route_id, None)
+            self._tasks.pop(route_id, None)
+            print(f"ROUTER: session {route_id} closed ({len(self.sessions)} active)", flush=True)
+
+    async def _handle(self, route_id, command):
+        cmd_type = command.get("type", "unknown")
+        if cmd_type != "audio":
+            print(f"ROUTER COMMAND: {cmd_type} ({route_id})", flush=True)
+
+        try:
+            if cmd_type == "start_session":
+                await self._end(route_id)
+                nova = NovaSonic(
+                    session_id=command.get("session_id") or "default",
+                    voice_id=command.get("voice_id"),
+                    config=command,
+                    emit=self._emitter(route_id)
+                )
+                self.sessions[route_id] = nova
+                await nova.start_session()
+                print(f"ROUTER: session {route_id} started ({len(self.sessions)} active)", flush=True)
+
+            elif cmd_type == "end_session":
+                await self._end(route_id)
+
+            else:
+                await run_session_command(self.sessions.get(route_id), command)
+
         except Exception as e:
-            print(f"❌ DB SAVE FAILED: {e}", flush=True)
-            logger.error(f"💾 Database save failed: {e}")
-            raise e
+            print(f"COMMAND PROCESSING ERROR ({cmd_type}, {route_id}): {e}", flush=True)
+
+    async def _end(self, route_id):
+        nova = self.sessions.pop(route_id, None)
+        if nova:
+            await nova.end_session()
+
+    async def monitor(self):
+        """Restart dead response tasks of every hosted session"""
+        while True:
+            await asyncio.sleep(5) # checking every 5 seconds
+            for nova in list(self.sessions.values()):
+                restart_dead_response_task(nova)
+
+    async def close(self):
+        """End every session, draining their transcripts"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        results = await asyncio.gather(*(self._end(route_id) for route_id in list(self.sessions)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"ERROR ENDING SESSION: {result}", flush=True)
 
 
 # Main execution loop
@@ -1176,6 +1395,7 @@ if __name__ == "__main__":
     import traceback
     
     nova = None
+    router = VoiceSessionRouter() if is_shared_worker() else None
     stdin_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
 
     def read_stdin_line():
@@ -1185,11 +1405,23 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"STDIN READ ERROR: {e}", flush=True)
             return None
+
+    def read_stdin_frame():
+        """Blocking read of one length-prefixed frame (framed transport) in seperate thread"""
+        try:
+            return read_frame(sys.stdin.buffer)
+        except Exception as e:
+            print(f"STDIN FRAME READ ERROR: {e}", flush=True)
+            return None
     
 
     async def process_stdin_command(command):
         """To process a single command from stdin"""
         global nova
+        if router:
+            router.dispatch(command)
+            return
+
         cmd_type = command.get("type", "unknown")
         print(f"STDIN COMMAND: {cmd_type}", flush=True)
 
@@ -1198,52 +1430,32 @@ if __name__ == "__main__":
                 if nova:
                     await nova.end_session()
                 
+                apply_session_credentials(command.get("credentials"))
                 nova = NovaSonic(
                     session_id = command.get("session_id", "default"),
-                    voice_id = command.get("voice_id")
+                    voice_id = command.get("voice_id"),
+                    config = command
                 )
 
                 await nova.start_session()
 
-            elif cmd_type == "start_audio":
-                if nova:
-                    print("starting audio input...", flush=True)
-                    await nova.start_audio_input()
-                else:
-                    print("cannot start audio, nova NOT initialised", flush=True)
-            
-            elif cmd_type == "audio":
-                if nova:
-                    audio_data = base64.b64decode(command["data"])
-                    await nova.send_audio_chunk(audio_data)
-                else:
-                    print("cannot send audio, nova NOT initialised", flush=True)
-
-            elif cmd_type == "end_audio":
-                if nova:
-                    print("ending audio input...", flush=True)
-                    await nova.end_audio_input()
-                else:
-                    print("cannot end audio, nova NOT initialised", flush=True)
-
-            elif cmd_type == "evaluate_empathy":
-                if nova:
-                    print(f"processing empathy evaluation request!!", flush=True)
-                    asyncio.create_task(nova.handle_manual_empathy_evaluation(
-                        command["text"],
-                        command.get("session_id")
-                    ))
-
-            elif cmd_type == "text":
-                print(f"TEXT INPUT: {command.get('data', '')[:50]}...", flush=True)
-            
             elif cmd_type == "end_session":
                 if nova:
                     await nova.end_session()
                     nova = None
+
+            else:
+                await run_session_command(nova, command)
         
         except Exception as e:
             print(f"COMMAND PROCESSING ERROR ({cmd_type}): {e}", flush=True)
+
+    async def process_stdin_audio(b64_audio, route_id=None):
+        """Audio frames from the framed transport"""
+        if router:
+            router.dispatch({"type": "audio", "route_id": route_id, "data": b64_audio})
+        elif nova:
+            await nova.send_audio_base64(b64_audio)
         
     async def stdin_reader():
         """Reads stdin commands without blocking the event loop"""
@@ -1252,13 +1464,18 @@ if __name__ == "__main__":
 
         print("STDIN READER STARTED", flush=True)
 
+        if is_framed():
+            await framed_stdin_reader(loop)
+            return
+
         while True:
             try:
                 # read a line in the thread pool with timeout capability
                 line = await loop.run_in_executor(stdin_executor, read_stdin_line)
 
-                if line is None:
-                    print("STDIN READER: received none. exiting", flush=True)
+                if line is None or line == "":
+                    # None on read error, "" on EOF (server.js closed stdin to stop this session)
+                    print("STDIN READER: stdin closed. exiting", flush=True)
                     break
         
                 line = line.strip()
@@ -1279,27 +1496,49 @@ if __name__ == "__main__":
                 print(f"STDIN READER ERROR: {e}", flush=True)
                 await asyncio.sleep(0.1) # try to continue reading instead of breaking outright
 
+    async def framed_stdin_reader(loop):
+        """Reads length-prefixed frames: JSON control messages and base64 audio"""
+        print("STDIN READER: framed transport", flush=True)
+        while True:
+            try:
+                frame = await loop.run_in_executor(stdin_executor, read_stdin_frame)
+                if frame is None:
+                    print("STDIN READER: stdin closed. exiting", flush=True)
+                    break
+
+                kind, payload = frame
+                if kind == FRAME_AUDIO:
+                    # Hot path: no JSON parsing and no base64 round trip
+                    await process_stdin_audio(payload.decode("ascii"))
+                elif kind == FRAME_SESSION_AUDIO:
+                    route_id, b64_audio = split_session_audio(payload)
+                    await process_stdin_audio(b64_audio, route_id)
+                elif kind == FRAME_JSON:
+                    try:
+                        await process_stdin_command(json.loads(payload))
+                    except json.JSONDecodeError as je:
+                        print(f"JSON DECODE ERROR: {je} - Frame: {payload[:100]}", flush=True)
+                else:
+                    print(f"STDIN READER: unknown frame kind {kind!r}", flush=True)
+
+            except asyncio.CancelledError:
+                print("STDIN READER: cancelled", flush=True)
+                break
+            except Exception as e:
+                print(f"STDIN READER ERROR: {e}", flush=True)
+                await asyncio.sleep(0.1)
+
     async def monitor_response_task():
         # to monitor the response processing task and restart if needed
         global nova
 
+        if router:
+            await router.monitor()
+            return
+
         while True:
             await asyncio.sleep(5) # checking every 5 seconds
-
-            if nova and nova.is_active:
-                if nova.response is None or nova.response.done():
-                    if nova.response and nova.response.done():
-                        # checking for failure
-                        try:
-                            exc = nova.response.exception()
-                            if exc:
-                                print("RESPONSE TASK DIED WITH EXCEPTION: {exc}", flush=True)
-                        except asyncio.CancelledError:
-                            print("RESPONSE TASK WAS CANCELLED", flush=True)
-                        except asyncio.InvalidStateError:
-                            pass
-                    print("RESTARTING RESPONSE TASK", flush=True)
-                    nova.response = asyncio.create_task(nova._process_responses())
+            restart_dead_response_task(nova)
     
     
     async def main():
@@ -1315,16 +1554,23 @@ if __name__ == "__main__":
             session_id = os.getenv("SESSION_ID", "default")
             voice_id = os.getenv("VOICE_ID")
 
-            print(f"SESSION_ID: {session_id}", flush=True)
-            print(f"VOICE_ID: {voice_id}", flush=True)
-
-            if session_id and session_id != "default":
-                print(f"🚀 Auto-starting Nova Sonic session: {session_id}", flush=True)
-                nova = NovaSonic(session_id=session_id, voice_id=voice_id)
-                await nova.start_session()
-                print(f"NOVA SONIC SESSION STARTED SUCCESSFULLY!!!", flush=True)
+            if router:
+                print(f"🧵 Shared voice worker: waiting for start_session commands...", flush=True)
             else:
-                print(f"waiting for start session command...", flush=True)
+                print(f"SESSION_ID: {session_id}", flush=True)
+                print(f"VOICE_ID: {voice_id}", flush=True)
+
+                if NOVA_WARM_START:
+                    await asyncio.get_running_loop().run_in_executor(None, warm_up)
+                    emit_stdout({"type": "worker_ready"})
+                    print(f"♨️ Warm worker ready, waiting for start session command...", flush=True)
+                elif session_id and session_id != "default":
+                    print(f"🚀 Auto-starting Nova Sonic session: {session_id}", flush=True)
+                    nova = NovaSonic(session_id=session_id, voice_id=voice_id)
+                    await nova.start_session()
+                    print(f"NOVA SONIC SESSION STARTED SUCCESSFULLY!!!", flush=True)
+                else:
+                    print(f"waiting for start session command...", flush=True)
             
             stdin_task = asyncio.create_task(stdin_reader())
             monitor_task = asyncio.create_task(monitor_response_task())
@@ -1349,6 +1595,8 @@ if __name__ == "__main__":
             traceback.print_exc()
             logger.error(f"Nova Sonic process error: {e}")
         finally:
+            if router:
+                await router.close()
             if nova:
                 try:
                     await nova.end_session()
@@ -1362,4 +1610,4 @@ if __name__ == "__main__":
             
     
     # Run the main async function
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+"""
+Incremental decoder for the Nova Sonic output stream
+Whole events in a chunk are parsed in place by the C decoder with an index cursor (no
+slicing); only an event split across chunks is buffered, in one bytearray that is scanned
+once from a saved cursor, jumping between structural characters and skipping string
+contents (base64 audio) with bytes.find
+"""
+
+import os
+import re
+import json
+import struct
+from typing import Iterator, List
+
+# Outside strings: anything that can change nesting depth or start a string
+_STRUCTURAL = re.compile(rb'[{}"]')
+_skip_whitespace = re.compile(r"[ \t\n\r]*").match
+
+# Compact consumed bytes once this many have piled up at the front of the buffer
+_COMPACT_BYTES = 64 * 1024
+
+# Raw output chunks are recorded here when set, for benchmarks/bench_response_decoder.py
+RESPONSE_RECORD_PATH = os.environ.get("NOVA_RECORD_RESPONSES")
+_RECORD_LENGTH = struct.Struct(">I")
+
+
+class JsonEventDecoder:
+    """Splits a byte stream of concatenated JSON objects into parsed events"""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buf = bytearray()
+        self._pos = 0        # next byte to scan
+        self._start = -1     # start of the object being scanned, -1 between objects
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.stats = {"chunks": 0, "events": 0, "fast_path": 0, "split_events": 0, "errors": 0}
+
+    def feed(self, data: bytes) -> List[dict]:
+        """Add one chunk and return every event it completes"""
+        self.stats["chunks"] += 1
+        if not self._buf:
+            return self._decode_complete(data)
+
+        # Finish the event left over from earlier chunks, then go back to direct decoding
+        self._buf += data
+        events = self._scan(first_only=True)
+        if events and self._pos < len(self._buf):
+            rest = bytes(self._buf[self._pos:])
+            self._reset()
+            events += self._decode_complete(rest)
+        return events
+
+    def _decode_complete(self, data: bytes) -> List[dict]:
+        """Parse whole events straight from the chunk with the C decoder; an incomplete tail goes to the scanner"""
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            # A multi-byte character split across chunks
+            self._buf += data
+            return self._scan()
+
+        events = []
+        # Nothing after the last closing brace can be a whole event; a failed raw_decode is costly on a long chunk
+        last_close = text.rfind("}")
+        idx = _skip_whitespace(text, 0).end()
+        while idx < len(text):
+            event = None
+            if idx < last_close:
+                try:
+                    event, idx = self._decoder.raw_decode(text, idx)
+                except ValueError:
+                    pass
+            if event is None:
+                self.stats["events"] += len(events)
+                self._buf += text[idx:].encode("utf-8")
+                return events + self._scan()
+            events.append(event)
+            idx = _skip_whitespace(text, idx).end()
+
+        self.stats["events"] += len(events)
+        if len(events) == 1:
+            self.stats["fast_path"] += 1
+        return events
+
+    def _reset(self) -> None:
+        self._buf.clear()
+        self._pos = 0
+        self._start = -1
+
+    def _scan(self, first_only: bool = False) -> List[dict]:
+        """Resume the boundary scan from the cursor; each byte is looked at once"""
+        events = []
+        buf = self._buf
+        end = len(buf)
+        pos = self._pos
+
+        if self._escape:
+            if pos >= end:
+                return events
+            pos += 1
+            self._escape = False
+
+        while pos < end:
+            if self._start < 0:
+                start = buf.find(b"{", pos)
+                if start < 0:
+                    # Only whitespace (or junk) between events
+                    pos = end
+                    break
+                self._start = start
+                self._depth = 0
+                pos = start
+
+            if self._in_string:
+                pos = self._skip_string(buf, pos, end)
+                continue
+
+            match = _STRUCTURAL.search(buf, pos)
+            if match is None:
+                pos = end
+                break
+            char = buf[match.start()]
+            pos = match.end()
+
+            if char == 0x22:
+                self._in_string = True
+            elif char == 0x7B:
+                self._depth += 1
+            elif char == 0x7D:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf, self._start, pos, events)
+                    self._start = -1
+                    if first_only:
+                        break
+
+        self._pos = pos
+        self._compact()
+        return events
+
+    def _skip_string(self, buf: bytearray, pos: int, end: int) -> int:
+        """Move past the closing quote of the current string (or to the end of the buffer) with memchr-speed finds"""
+        while True:
+            quote = buf.find(b'"', pos)
+            backslash = buf.find(b"\\", pos, quote if quote >= 0 else end)
+            if backslash >= 0:
+                pos = backslash + 2
+                if pos > end:
+                    # The escaped byte is in the next chunk
+                    self._escape = True
+                    return end
+                continue
+            if quote < 0:
+                return end
+            self._in_string = False
+            return quote + 1
+
+    def _emit(self, buf: bytearray, start: int, end: int, events: List[dict]) -> None:
+        try:
+            events.append(json.loads(buf[start:end]))
+            self.stats["events"] += 1
+            self.stats["split_events"] += 1
+        except ValueError:
+            self.stats["errors"] += 1
+
+    def _compact(self) -> None:
+        # Drop consumed bytes; while an event is incomplete only its prefix is dropped
+        consumed = self._start if self._start >= 0 else self._pos
+        if consumed == len(self._buf):
+            self._reset()
+        elif consumed >= _COMPACT_BYTES:
+            del self._buf[:consumed]
+            self._pos -= consumed
+            if self._start >= 0:
+                self._start = 0
+
+    def pending_bytes(self) -> int:
+        return len(self._buf)
+
+
+def write_recorded_chunk(stream, chunk: bytes) -> None:
+    stream.write(_RECORD_LENGTH.pack(len(chunk)))
+    stream.write(chunk)
+
+
+def read_recorded_chunks(path: str) -> Iterator[bytes]:
+    """Chunks recorded with NOVA_RECORD_RESPONSES, in arrival order"""
+    with open(path, "rb") as stream:
+        while True:
+            header = stream.read(_RECORD_LENGTH.size)
+            if len(header) < _RECORD_LENGTH.size:
+                return
+            (length,) = _RECORD_LENGTH.unpack(header)
+            yield stream.read(length)
@@ -12,6 +12,269 @@ const io = new Server(server, {
   cors: { origin: "*", methods: ["GET", "POST"] },
 });
 
+// "framed" sends stdin as length-prefixed frames and receives audio on its own pipe (see audio_transport.py);
+// "json" keeps one JSON message per line in both directions
+const FRAMED_TRANSPORT = (process.env.NOVA_AUDIO_TRANSPORT || "json").toLowerCase() === "framed";
+const NOVA_STDIO = FRAMED_TRANSPORT
+  ? ["pipe", "pipe", "pipe", "pipe"] // fd 3: audio output frames
+  : ["pipe", "pipe", "pipe"];
+const FRAME_JSON = 0x4a; // "J"
+const FRAME_AUDIO = 0x41; // "A"
+const FRAME_SESSION_AUDIO = 0x53; // "S": "<route_id> <base64 audio>" for the shared worker
+const FRAME_HEADER_BYTES = 5; // kind (1) + big-endian payload length (4)
+
+function writeFrame(stream, kind, payload) {
+  const header = Buffer.allocUnsafe(FRAME_HEADER_BYTES);
+  header.writeUInt8(kind, 0);
+  header.writeUInt32BE(payload.length, 1);
+  stream.cork();
+  stream.write(header);
+  stream.write(payload);
+  process.nextTick(() => stream.uncork());
+}
+
+// Send one control message to the Python process
+function sendNovaCommand(proc, command) {
+  const json = JSON.stringify(command);
+  if (FRAMED_TRANSPORT) {
+    writeFrame(proc.stdin, FRAME_JSON, Buffer.from(json, "utf8"));
+  } else {
+    proc.stdin.write(json + "\n");
+  }
+}
+
+// Send base64 audio from the browser; framed mode forwards the base64 bytes untouched
+function sendNovaAudio(proc, base64Audio, routeId = null) {
+  if (FRAMED_TRANSPORT) {
+    if (routeId) {
+      writeFrame(proc.stdin, FRAME_SESSION_AUDIO, Buffer.from(`${routeId} ${base64Audio}`, "latin1"));
+    } else {
+      writeFrame(proc.stdin, FRAME_AUDIO, Buffer.from(base64Audio, "latin1"));
+    }
+  } else {
+    const command = { type: "audio", data: base64Audio };
+    if (routeId) command.route_id = routeId;
+    proc.stdin.write(JSON.stringify(command) + "\n");
+  }
+}
+
+// Split the audio output pipe into frames and hand each base64 payload (and its session, if tagged) to onAudio
+function readAudioFrames(stream, onAudio) {
+  let pending = Buffer.alloc(0);
+  stream.on("data", (data) => {
+    pending = pending.length ? Buffer.concat([pending, data]) : data;
+    while (pending.length >= FRAME_HEADER_BYTES) {
+      const length = pending.readUInt32BE(1);
+      if (pending.length < FRAME_HEADER_BYTES + length) break;
+      const kind = pending[0];
+      const payload = pending.subarray(FRAME_HEADER_BYTES, FRAME_HEADER_BYTES + length);
+      pending = pending.subarray(FRAME_HEADER_BYTES + length);
+      if (kind === FRAME_AUDIO) {
+        onAudio(payload.toString("latin1"), null);
+      } else if (kind === FRAME_SESSION_AUDIO) {
+        const text = payload.toString("latin1");
+        const separator = text.indexOf(" ");
+        onAudio(text.slice(separator + 1), text.slice(0, separator));
+      }
+    }
+  });
+}
+
+// How long a stopped Nova process gets to drain its message journal before it is killed
+const NOVA_STOP_GRACE_MS = parseInt(process.env.NOVA_STOP_GRACE_MS || "6000", 10);
+
+// Ask the Python process to end its session (flushing queued transcript writes), then kill it after the grace period
+function stopNovaProcess(proc) {
+  if (!proc) return;
+  const killTimer = setTimeout(() => {
+    if (proc.exitCode === null && proc.signalCode === null) {
+      console.warn("⏱️ Nova process did not exit in time, killing PID:", proc.pid);
+      proc.kill();
+    }
+  }, NOVA_STOP_GRACE_MS);
+  proc.once("close", () => clearTimeout(killTimer));
+  try {
+    if (proc.stdin && proc.stdin.writable) {
+      sendNovaCommand(proc, { type: "end_session" });
+      proc.stdin.end();
+    } else {
+      proc.kill();
+    }
+  } catch (error) {
+    console.error("❌ Failed to stop Nova process gracefully:", error.message);
+    proc.kill();
+  }
+}
+
+// "process": one Python process per voice session; "shared": one long-lived worker hosts every session
+const SHARED_WORKER = (process.env.NOVA_WORKER_MODE || "process").toLowerCase() === "shared";
+let novaWorker = null;
+// route_id -> { onMessage, onAudio, onWorkerExit }; route ids are generated here per voice start, so a client
+// reusing another socket's session_id can never take over its route
+const workerRoutes = new Map();
+let workerRouteSeq = 0;
+
+// Return the shared worker, spawning it on first use or after it exited
+function getNovaWorker() {
+  if (novaWorker) return novaWorker;
+
+  const pythonCmd = process.env.PYTHON_CMD || "python3";
+  // The worker serves many users, so Bedrock calls use the task role rather than per-user credentials
+  const worker = spawn(pythonCmd, ["nova_sonic.py"], {
+    stdio: NOVA_STDIO,
+    env: { ...process.env, NOVA_WORKER_MODE: "shared" },
+  });
+  console.log("🧵 Shared Nova worker spawned with PID:", worker.pid);
+
+  // Lines from many sessions interleave; keep partial lines until their newline arrives
+  let pending = "";
+  worker.stdout.setEncoding("utf8");
+  worker.stdout.on("data", (data) => {
+    pending += data;
+    const lines = pending.split("\n");
+    pending = lines.pop();
+    lines.filter(Boolean).forEach((line) => {
+      let parsed;
+      try {
+        parsed = JSON.parse(line);
+      } catch {
+        console.log("[worker]", line);
+        return;
+      }
+      const route = workerRoutes.get(parsed.route_id);
+      if (route) {
+        route.onMessage(parsed);
+      } else {
+        console.log("🧵 Unrouted worker message:", parsed.type, parsed.route_id);
+      }
+    });
+  });
+  worker.stderr.on("data", (data) => {
+    console.warn("⚠️ Nova worker stderr:", data.toString().trim());
+  });
+  if (FRAMED_TRANSPORT) {
+    readAudioFrames(worker.stdio[3], (data, routeId) => {
+      const route = workerRoutes.get(routeId);
+      if (route) route.onAudio(data);
+    });
+  }
+
+  worker.on("error", (error) => {
+    console.error("❌ Shared Nova worker error:", error.message);
+  });
+  worker.on("close", (code) => {
+    console.log("🔚 Shared Nova worker closed with code:", code);
+    if (novaWorker === worker) {
+      novaWorker = null;
+      const routes = [...workerRoutes.values()];
+      workerRoutes.clear();
+      routes.forEach((route) => route.onWorkerExit());
+    }
+  });
+
+  novaWorker = worker;
+  return worker;
+}
+
+// End one session in the shared worker; its route stays up for the grace period so late results still arrive
+function stopWorkerSession(worker, routeId, route) {
+  if (worker.stdin.writable) {
+    sendNovaCommand(worker, { type: "end_session", route_id: routeId });
+  }
+  setTimeout(() => {
+    if (workerRoutes.get(routeId) === route) workerRoutes.delete(routeId);
+  }, NOVA_STOP_GRACE_MS);
+}
+
+// Per-session settings a worker receives with start_session instead of through its environment
+function novaSessionSettings(config, socket) {
+  return {
+    voice_id: config.voice_id || "",
+    user_id: socket.userId || "anonymous",
+    patient_name: config.patient_name || "",
+    patient_prompt: config.patient_prompt || "",
+    patient_id: config.patient_id || "",
+    llm_completion: !!config.llm_completion,
+    system_prompt: config.system_prompt || "",
+  };
+}
+
+// Pre-started Python processes (process mode) that have finished their imports and opened their DB pool
+const NOVA_WARM_POOL_SIZE = SHARED_WORKER ? 0 : parseInt(process.env.NOVA_WARM_POOL_SIZE || "0", 10);
+const NOVA_WARM_RESPAWN_DELAY_MS = 1000;
+const warmPool = [];
+let warmStarting = 0;
+
+function spawnWarmNovaProcess() {
+  const pythonCmd = process.env.PYTHON_CMD || "python3";
+  const proc = spawn(pythonCmd, ["nova_sonic.py"], {
+    stdio: NOVA_STDIO,
+    env: { ...process.env, NOVA_WARM_START: "true" },
+  });
+  warmStarting++;
+  let starting = true;
+  const settle = () => {
+    if (starting) {
+      starting = false;
+      warmStarting--;
+    }
+  };
+
+  // Until a socket takes it, read its output here so the pipes never fill up
+  proc.stdout.on("data", (data) => {
+    const text = data.toString();
+    if (starting && text.includes('"worker_ready"')) {
+      settle();
+      warmPool.push(proc);
+      console.log(`♨️ Warm Nova process ready PID: ${proc.pid} (${warmPool.length}/${NOVA_WARM_POOL_SIZE})`);
+    }
+  });
+  proc.stderr.on("data", (data) => {
+    console.warn("⚠️ Warm Nova stderr:", data.toString().trim());
+  });
+
+  proc.on("error", (error) => {
+    // Spawn failures are not retried, so a missing python does not respawn in a loop
+    console.error("❌ Warm Nova process error:", error.message);
+    settle();
+    proc.novaWarmFailed = true;
+  });
+  proc.on("close", (code) => {
+    settle();
+    const index = warmPool.indexOf(proc);
+    if (index !== -1) warmPool.splice(index, 1);
+    if (!proc.novaWarmTaken && !proc.novaWarmFailed) {
+      console.warn("♨️ Warm Nova process exited before use with code:", code);
+      setTimeout(fillWarmPool, NOVA_WARM_RESPAWN_DELAY_MS);
+    }
+  });
+}
+
+function fillWarmPool() {
+  while (warmPool.length + warmStarting < NOVA_WARM_POOL_SIZE) {
+    spawnWarmNovaProcess();
+  }
+}
+
+// Hand out a ready warm process (or null) and replenish the pool in the background
+function takeWarmNovaProcess() {
+  let proc = null;
+  while (!proc && warmPool.length) {
+    const candidate = warmPool.shift();
+    if (candidate.exitCode === null && candidate.signalCode === null && candidate.stdin.writable) {
+      proc = candidate;
+    }
+  }
+  if (proc) {
+    proc.novaWarmTaken = true;
+    // The socket attaches its own handlers right after this
+    proc.stdout.removeAllListeners("data");
+    proc.stderr.removeAllListeners("data");
+  }
+  setImmediate(fillWarmPool);
+  return proc;
+}
+
 // ─── Health Check ─────────────────────────────────────────────────────────────
 app.get("/health", (req, res) => {
   res.json({ status: "healthy" });
@@ -49,6 +312,26 @@ io.on("connection", (socket) => {
 
   let novaProcess = null;
   let novaReady = false;
+  // Shared-worker mode: novaProcess is the worker and these identify this socket's session in it
+  let novaRouteId = null;
+  let novaRoute = null;
+
+  // Commands for this socket's session; in shared-worker mode they carry its route_id
+  const sendToNova = (command) =>
+    sendNovaCommand(novaProcess, novaRouteId ? { ...command, route_id: novaRouteId } : command);
+
+  const stopNova = () => {
+    if (!novaProcess) return;
+    if (novaRouteId) {
+      stopWorkerSession(novaProcess, novaRouteId, novaRoute);
+    } else {
+      stopNovaProcess(novaProcess);
+    }
+    novaProcess = null;
+    novaRouteId = null;
+    novaRoute = null;
+    novaReady = false;
+  };
 
   // Small delay then log active client count
   setTimeout(() => {
@@ -65,12 +348,126 @@ io.on("connection", (socket) => {
     
     audioStarted = false;
 
-    // Kill any previous process
-    if (novaProcess) {
-      novaProcess.kill();
-      novaProcess = null;
+    // Stop any previous process
+    stopNova();
+
+    // ─ Messages from the Python session, from its own process or routed from the shared worker
+    const handleNovaMessage = (parsed) => {
+      console.log("📤 NOVA JSON:", parsed);
+
+      // ─ Audio chunks ───────────────────────────────────────────────
+      if (parsed.type === "audio") {
+        // Skip debug file saving for better performance
+        socket.emit("audio-chunk", { data: parsed.data });
+      }
+      // ─ Debug messages ───────────────────────────────────────────
+      else if (parsed.type === "debug") {
+        console.log("🐞 NOVA DEBUG:", parsed.text);
+      }
+      // ─ Voice empathy evaluation results ──────────────────────────
+      else if (parsed.type === "voice_empathy_result") {
+        console.log("🎤 VOICE EMPATHY RESULT:", parsed.content?.substring(0, 100));
+        socket.emit("voice-empathy-result", { content: parsed.content });
+      }
+      // ─ Text messages ─────────────────────────────────────────────
+      else if (parsed.type === "text") {
+        console.log("💬 NOVA TEXT:", parsed.text);
+        socket.emit("text-message", { text: parsed.text });
+        if (parsed.text.includes("Nova Sonic ready")) {
+          novaReady = true;
+          console.log("✅ NOVA SONIC READY - Voice empathy evaluation enabled");
+          socket.emit("nova-started", {
+            status: "Nova Sonic session started",
+          });
+        }
+      }
+      // ─ Empathy feedback ──────────────────────────────────────────
+      else if (parsed.type === "empathy") {
+        console.log("🧠 VOICE EMPATHY FEEDBACK:", parsed.content?.substring(0, 100));
+        socket.emit("empathy-feedback", { content: parsed.content });
+      }
+      // ─ Raw empathy data for frontend processing ──────────────────────────────────────────
+      else if (parsed.type === "empathy_data") {
+        console.log("🧠 RAW VOICE EMPATHY DATA RECEIVED:", parsed.content?.substring(0, 100));
+        try {
+          const empathyData = JSON.parse(parsed.content);
+          console.log("🧠 PARSED EMPATHY DATA:", {
+            empathy_score: empathyData.empathy_score,
+            perspective_taking: empathyData.perspective_taking,
+            emotional_resonance: empathyData.emotional_resonance
+          });
+
+          // Transform to match StudentChat format with voice indicator
+          const transformedData = {
+            overall_score: empathyData.empathy_score || 3,
+            avg_perspective_taking: empathyData.perspective_taking || 3,
+            avg_emotional_resonance: empathyData.emotional_resonance || 3,
+            avg_acknowledgment: empathyData.acknowledgment || 3,
+            avg_language_communication: empathyData.language_communication || 3,
+            avg_cognitive_empathy: empathyData.cognitive_empathy || 3,
+            avg_affective_empathy: empathyData.affective_empathy || 3,
+            realism_assessment: empathyData.realism_flag === "realistic" ? "Your voice responses are generally realistic" : "Your voice response is unrealistic",
+            realism_explanation: empathyData.judge_reasoning?.realism_justification || "",
+            coach_assessment: empathyData.judge_reasoning?.overall_assessment || "",
+            strengths: empathyData.feedback?.strengths || [],
+            areas_for_improvement: empathyData.feedback?.areas_for_improvement || [],
+            recommendations: empathyData.feedback?.improvement_suggestions || [],
+            recommended_approach: empathyData.feedback?.alternative_phrasing || "",
+            timestamp: Date.now(),
+            source: "voice", // Mark as voice-generated empathy data
+          };
+          console.log("🧠 SENDING VOICE EMPATHY DATA TO FRONTEND - Score:", transformedData.overall_score);
+          socket.emit("empathy-data", transformedData);
+        } catch (e) {
+          console.error("❌ Failed to parse voice empathy data:", e);
+          console.error("❌ Raw empathy content:", parsed.content);
+        }
+      }
+      // ─ Diagnosis completion ──────────────────────────────────────
+      else if (parsed.type === "diagnosis_complete") {
+        console.log("🎯 DIAGNOSIS COMPLETE:", parsed.text);
+        socket.emit("diagnosis-complete", { message: parsed.text });
+      }
+      else if (parsed.type === "diagnosis_verdict") {
+        console.log("🩺 DIAGNOSIS VERDICT:", parsed.verdict);
+        if (parsed.verdict) {
+          socket.emit("diagnosis-complete", { message: "Session completed successfully" });
+        }
+      }
+    };
+
+    if (SHARED_WORKER) {
+      try {
+        novaProcess = getNovaWorker();
+      } catch (error) {
+        console.error("❌ Failed to spawn shared Nova worker:", error.message);
+        socket.emit("nova-error", { error: "Failed to start voice system" });
+        return;
+      }
+      novaRouteId = `${socket.id}:${++workerRouteSeq}`;
+      const worker = novaProcess;
+      const route = {
+        onMessage: handleNovaMessage,
+        onAudio: (data) => socket.emit("audio-chunk", { data }),
+        onWorkerExit: () => {
+          if (novaProcess !== worker) return;
+          novaProcess = null;
+          novaRouteId = null;
+          novaRoute = null;
+          novaReady = false;
+          socket.emit("nova-error", { error: "Voice system stopped" });
+        },
+      };
+      novaRoute = route;
+      workerRoutes.set(novaRouteId, route);
+      sendToNova({
+        type: "start_session",
+        session_id: config.session_id || "default",
+        ...novaSessionSettings(config, socket),
+      });
+      console.log("🧵 Nova session", config.session_id, "started in shared worker PID:", worker.pid, "route:", novaRouteId);
+      return;
     }
-    novaReady = false;
 
     // Get Cognito Identity Pool credentials for user-specific access
     console.log("🔑 Getting Cognito Identity Pool credentials for user:", socket.userEmail);
@@ -92,29 +489,49 @@ io.on("connection", (socket) => {
     console.log(`🐍 Using command: ${pythonCmd}`);
     console.log(`🐍 Attempting to spawn: ${pythonCmd} nova_sonic.py`);
     
+    const warmProcess = takeWarmNovaProcess();
     try {
-      novaProcess = spawn(pythonCmd, ["nova_sonic.py"], {
-        stdio: ["pipe", "pipe", "pipe"],
-        env: {
-          ...process.env,
-          SESSION_ID: config.session_id || "default",
-          VOICE_ID: config.voice_id || "",
-          USER_ID: socket.userId || "anonymous",
-          AWS_ACCESS_KEY_ID: stsCredentials.AccessKeyId,
-          AWS_SECRET_ACCESS_KEY: stsCredentials.SecretKey,
-          AWS_SESSION_TOKEN: stsCredentials.SessionToken,
-          SM_DB_CREDENTIALS: process.env.SM_DB_CREDENTIALS || "",
-          RDS_PROXY_ENDPOINT: process.env.RDS_PROXY_ENDPOINT || "",
-          PATIENT_NAME: config.patient_name || "",
-          PATIENT_PROMPT: config.patient_prompt || "",
-          PATIENT_ID: config.patient_id || "",
-          LLM_COMPLETION: config.llm_completion ? "true" : "false",
-          EXTRA_SYSTEM_PROMPT: config.system_prompt || "",
-          APPSYNC_GRAPHQL_URL: process.env.APPSYNC_GRAPHQL_URL || "",
-          COGNITO_TOKEN: socket.handshake.auth.token || "",
-        },
-      });
-      console.log("📡 Nova process spawned with PID:", novaProcess.pid);
+      if (warmProcess) {
+        // Already imported and connected; only the session itself is left to start
+        novaProcess = warmProcess;
+        sendNovaCommand(novaProcess, {
+          type: "start_session",
+          session_id: config.session_id || "default",
+          ...novaSessionSettings(config, socket),
+          credentials: {
+            access_key_id: stsCredentials.AccessKeyId,
+            secret_access_key: stsCredentials.SecretKey,
+            session_token: stsCredentials.SessionToken,
+          },
+        });
+        console.log("♨️ Nova session started in warm process PID:", novaProcess.pid);
+      } else {
+        novaProcess = spawn(pythonCmd, ["nova_sonic.py"], {
+          stdio: NOVA_STDIO,
+          env: {
+            ...process.env,
+            SESSION_ID: config.session_id || "default",
+            VOICE_ID: config.voice_id || "",
+            USER_ID: socket.userId || "anonymous",
+            AWS_ACCESS_KEY_ID: stsCredentials.AccessKeyId,
+            AWS_SECRET_ACCESS_KEY: stsCredentials.SecretKey,
+            AWS_SESSION_TOKEN: stsCredentials.SessionToken,
+            SM_DB_CREDENTIALS: process.env.SM_DB_CREDENTIALS || "",
+            RDS_PROXY_ENDPOINT: process.env.RDS_PROXY_ENDPOINT || "",
+            PATIENT_NAME: config.patient_name || "",
+            PATIENT_PROMPT: config.patient_prompt || "",
+            PATIENT_ID: config.patient_id || "",
+            LLM_COMPLETION: config.llm_completion ? "true" : "false",
+            EXTRA_SYSTEM_PROMPT: config.system_prompt || "",
+            APPSYNC_GRAPHQL_URL: process.env.APPSYNC_GRAPHQL_URL || "",
+            COGNITO_TOKEN: socket.handshake.auth.token || "",
+          },
+        });
+        console.log("📡 Nova process spawned with PID:", novaProcess.pid);
+      }
+      if (FRAMED_TRANSPORT) {
+        readAudioFrames(novaProcess.stdio[3], (data) => socket.emit("audio-chunk", { data }));
+      }
     } catch (error) {
       console.error("❌ Failed to spawn Nova process:", error.message);
       socket.emit("nova-error", { error: "Failed to start voice system" });
@@ -130,87 +547,7 @@ io.on("connection", (socket) => {
         .forEach((line) => {
           try {
             const parsed = JSON.parse(line);
-            console.log("📤 NOVA JSON:", parsed);
-
-            // ─ Audio chunks ───────────────────────────────────────────────
-            if (parsed.type === "audio") {
-              // Skip debug file saving for better performance
-              socket.emit("audio-chunk", { data: parsed.data });
-            }
-            // ─ Debug messages ───────────────────────────────────────────
-            else if (parsed.type === "debug") {
-              console.log("🐞 NOVA DEBUG:", parsed.text);
-            }
-            // ─ Voice empathy evaluation results ──────────────────────────
-            else if (parsed.type === "voice_empathy_result") {
-              console.log("🎤 VOICE EMPATHY RESULT:", parsed.content?.substring(0, 100));
-              socket.emit("voice-empathy-result", { content: parsed.content });
-            }
-            // ─ Text messages ─────────────────────────────────────────────
-            else if (parsed.type === "text") {
-              console.log("💬 NOVA TEXT:", parsed.text);
-              socket.emit("text-message", { text: parsed.text });
-              if (parsed.text.includes("Nova Sonic ready")) {
-                novaReady = true;
-                console.log("✅ NOVA SONIC READY - Voice empathy evaluation enabled");
-                socket.emit("nova-started", {
-                  status: "Nova Sonic session started",
-                });
-              }
-            }
-            // ─ Empathy feedback ──────────────────────────────────────────
-            else if (parsed.type === "empathy") {
-              console.log("🧠 VOICE EMPATHY FEEDBACK:", parsed.content?.substring(0, 100));
-              socket.emit("empathy-feedback", { content: parsed.content });
-            }
-            // ─ Raw empathy data for frontend processing ──────────────────────────────────────────
-            else if (parsed.type === "empathy_data") {
-              console.log("🧠 RAW VOICE EMPATHY DATA RECEIVED:", parsed.content?.substring(0, 100));
-              try {
-                const empathyData = JSON.parse(parsed.content);
-                console.log("🧠 PARSED EMPATHY DATA:", {
-                  empathy_score: empathyData.empathy_score,
-                  perspective_taking: empathyData.perspective_taking,
-                  emotional_resonance: empathyData.emotional_resonance
-                });
-                
-                // Transform to match StudentChat format with voice indicator
-                const transformedData = {
-                  overall_score: empathyData.empathy_score || 3,
-                  avg_perspective_taking: empathyData.perspective_taking || 3,
-                  avg_emotional_resonance: empathyData.emotional_resonance || 3,
-                  avg_acknowledgment: empathyData.acknowledgment || 3,
-                  avg_language_communication: empathyData.language_communication || 3,
-                  avg_cognitive_empathy: empathyData.cognitive_empathy || 3,
-                  avg_affective_empathy: empathyData.affective_empathy || 3,
-                  realism_assessment: empathyData.realism_flag === "realistic" ? "Your voice responses are generally realistic" : "Your voice response is unrealistic",
-                  realism_explanation: empathyData.judge_reasoning?.realism_justification || "",
-                  coach_assessment: empathyData.judge_reasoning?.overall_assessment || "",
-                  strengths: empathyData.feedback?.strengths || [],
-                  areas_for_improvement: empathyData.feedback?.areas_for_improvement || [],
-                  recommendations: empathyData.feedback?.improvement_suggestions || [],
-                  recommended_approach: empathyData.feedback?.alternative_phrasing || "",
-                  timestamp: Date.now(),
-                  source: "voice", // Mark as voice-generated empathy data
-                };
-                console.log("🧠 SENDING VOICE EMPATHY DATA TO FRONTEND - Score:", transformedData.overall_score);
-                socket.emit("empathy-data", transformedData);
-              } catch (e) {
-                console.error("❌ Failed to parse voice empathy data:", e);
-                console.error("❌ Raw empathy content:", parsed.content);
-              }
-            }
-            // ─ Diagnosis completion ──────────────────────────────────────
-            else if (parsed.type === "diagnosis_complete") {
-              console.log("🎯 DIAGNOSIS COMPLETE:", parsed.text);
-              socket.emit("diagnosis-complete", { message: parsed.text });
-            }
-            else if (parsed.type === "diagnosis_verdict") {
-              console.log("🩺 DIAGNOSIS VERDICT:", parsed.verdict);
-              if (parsed.verdict) {
-                socket.emit("diagnosis-complete", { message: "Session completed successfully" });
-              }
-            }
+            handleNovaMessage(parsed);
           } catch {
             // Plain‑text fallback
             console.log("[python]", line);
@@ -273,7 +610,7 @@ io.on("connection", (socket) => {
         // Retry with 'python' command
         try {
           novaProcess = spawn("python", ["nova_sonic.py"], {
-            stdio: ["pipe", "pipe", "pipe"],
+            stdio: NOVA_STDIO,
             env: {
               ...process.env,
               SESSION_ID: config.session_id || "default",
@@ -294,6 +631,9 @@ io.on("connection", (socket) => {
             },
           });
           console.log("📡 Nova process spawned with 'python', PID:", novaProcess.pid);
+          if (FRAMED_TRANSPORT) {
+            readAudioFrames(novaProcess.stdio[3], (data) => socket.emit("audio-chunk", { data }));
+          }
         } catch (retryError) {
           console.error("❌ Failed to spawn with 'python' too:", retryError.message);
           socket.emit("nova-error", { error: "Python not found" });
@@ -303,10 +643,14 @@ io.on("connection", (socket) => {
       }
     });
 
+    const spawnedProcess = novaProcess;
     novaProcess.on("close", (code) => {
       console.log("🔚 Nova process closed with code:", code);
-      novaProcess = null;
-      novaReady = false;
+      // A process stopped earlier may close after its replacement started
+      if (novaProcess === spawnedProcess) {
+        novaProcess = null;
+        novaReady = false;
+      }
     });
   });
 
@@ -319,13 +663,11 @@ io.on("connection", (socket) => {
     );
     if (novaProcess && novaProcess.stdin.writable && novaReady) {
       if (!audioStarted) {
-        novaProcess.stdin.write(JSON.stringify({ type: "start_audio" }) + "\n");
+        sendToNova({ type: "start_audio" });
         audioStarted = true;
         console.log("🎬 Sent start_audio to Nova process");
       }
-      novaProcess.stdin.write(
-        JSON.stringify({ type: "audio", data: msg.data }) + "\n"
-      );
+      sendNovaAudio(novaProcess, msg.data, novaRouteId);
       console.log("📤 Sent audio to Nova process");
     } else {
       console.log("❌ Cannot send audio - not ready or stdin closed");
@@ -335,9 +677,7 @@ io.on("connection", (socket) => {
   // ─── Text‑input from client ───────────────────────────────────────────────
   socket.on("text-input", (msg) => {
     if (novaProcess && novaProcess.stdin.writable && novaReady) {
-      novaProcess.stdin.write(
-        JSON.stringify({ type: "text", data: msg.text }) + "\n"
-      );
+      sendToNova({ type: "text", data: msg.text });
       console.log("📝 Sent text to Nova process");
     }
   });
@@ -396,7 +736,7 @@ io.on("connection", (socket) => {
   // ─── End‑audio event ─────────────────────────────────────────────────────
   socket.on("end-audio", () => {
     if (novaProcess && novaProcess.stdin.writable && novaReady) {
-      novaProcess.stdin.write(JSON.stringify({ type: "end_audio" }) + "\n");
+      sendToNova({ type: "end_audio" });
       audioStarted = false;
       console.log("🛑 Sent end_audio to Nova process");
     }
@@ -420,7 +760,7 @@ io.on("connection", (socket) => {
         };
         
         console.log("🎤 VOICE TRANSCRIPTION: Sending message to Nova:", JSON.stringify(message).substring(0, 100));
-        novaProcess.stdin.write(JSON.stringify(message) + "\n");
+        sendToNova(message);
         console.log("✅ VOICE TRANSCRIPTION: Successfully sent to Nova for empathy evaluation");
         
         // Also emit confirmation to frontend
@@ -455,15 +795,17 @@ io.on("connection", (socket) => {
   // ─── Optional Stop event ────────────────────────────────────────────────
   socket.on("stop-nova-sonic", () => {
     console.log("🛑 Stop requested by client");
-    if (novaProcess) {
-      novaProcess.kill();
-      novaProcess = null;
-      novaReady = false;
-    }
+    stopNova();
   });
 
-  // ─── Do NOT kill on disconnect ──────────────────────────────────────────
+  // ─── Do NOT kill a per-socket process on disconnect ─────────────────────
+  // Routes belong to this socket.id, so in the shared worker nothing could end this session later
   socket.on("disconnect", () => {
+    if (novaRouteId) {
+      console.log("🔌 CLIENT DISCONNECTED:", socket.id, "- ending worker session", novaRouteId);
+      stopNova();
+      return;
+    }
     console.log("🔌 CLIENT DISCONNECTED:", socket.id, "- Nova still running");
   });
 });
@@ -472,4 +814,5 @@ io.on("connection", (socket) => {
 const PORT = process.env.PORT || 80;
 server.listen(PORT, "0.0.0.0", () => {
   console.log(`Socket server running on port ${PORT}`);
+  fillWarmPool();
 });
@@ -0,0 +1,83 @@
+"""
+Lifecycle of sessions hosted by the shared worker (NOVA_WORKER_MODE=shared)
+An ended session must not leave its response task behind in the long-lived worker
+
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import nova_sonic
+
+ROUTE_ID = "socket-1:1"
+
+
+class ClosedStreamError(Exception):
+    pass
+
+
+class FakeInputStream:
+    def __init__(self, closed):
+        self._closed = closed
+
+    async def send(self, chunk):
+        pass
+
+    async def close(self):
+        self._closed.set()
+
+
+class FakeStream:
+    """Bidirectional stream whose output fails once the input side is closed, like Bedrock's"""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+        self.input_stream = FakeInputStream(self.closed)
+        self.output_calls = 0
+
+    async def await_output(self):
+        self.output_calls += 1
+        await self.closed.wait()
+        raise ClosedStreamError("stream closed")
+
+
+class VoiceSessionRouterTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_end_session_leaves_no_pending_tasks(self):
+        started = []
+
+        async def start_session(nova):
+            nova.stream = FakeStream()
+            nova.is_active = True
+            nova.response = asyncio.create_task(nova._process_responses())
+            started.append(nova)
+
+        tasks_before = asyncio.all_tasks()
+        router = nova_sonic.VoiceSessionRouter()
+        with mock.patch.object(nova_sonic.NovaSonic, "start_session", start_session):
+            router.dispatch({"type": "start_session", "route_id": ROUTE_ID, "session_id": "session-1"})
+            session_task = router._tasks[ROUTE_ID]
+            router.dispatch({"type": "end_session", "route_id": ROUTE_ID})
+            await asyncio.wait_for(session_task, timeout=5)
+
+        nova = started[0]
+        self.assertFalse(nova.is_active)
+        self.assertIsNone(nova.response)
+        self.assertEqual(router.sessions, {})
+        self.assertEqual(router._tasks, {})
+
+        # Nothing keeps polling the closed stream
+        output_calls = nova.stream.output_calls
+        await asyncio.sleep(0.3)
+        self.assertEqual(nova.stream.output_calls, output_calls)
+        self.assertEqual(asyncio.all_tasks() - tasks_before - {asyncio.current_task()}, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -44,8 +44,9 @@ class VoiceConnectionManager:
         self._health_check_interval = 300  # 5 minutes
         
         # Optimized settings for voice workloads with RDS Proxy
-        self.min_connections = 2          # Higher minimum for voice
-        self.max_connections = 10         # Increased from 5 to handle voice bursts
+        # A shared voice worker (NOVA_WORKER_MODE=shared) serves many sessions from this one pool
+        self.min_connections = int(os.environ.get("VOICE_DB_POOL_MIN", "2"))    # Higher minimum for voice
+        self.max_connections = int(os.environ.get("VOICE_DB_POOL_MAX", "10"))   # Increased from 5 to handle voice bursts
         self.connection_timeout = 30      # Prevent hanging
         self.idle_timeout = 300          # 5 min cleanup
         
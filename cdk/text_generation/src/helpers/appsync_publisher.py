@@ -0,0 +1,180 @@
+"""
+Streaming publisher for AppSync text stream mutations
+Reuses one keep-alive HTTP session and coalesces LLM token chunks into frames
+sent in order from a background thread
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+STREAM_FLUSH_INTERVAL_SECONDS = float(os.environ.get("STREAM_FLUSH_INTERVAL_MS", "30")) / 1000
+STREAM_MAX_FRAME_CHARS = int(os.environ.get("STREAM_MAX_FRAME_CHARS", "200"))
+APPSYNC_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("APPSYNC_REQUEST_TIMEOUT_SECONDS", "5"))
+
+PUBLISH_MUTATION = """
+        mutation PublishTextStream($sessionId: String!, $data: AWSJSON!) {
+            publishTextStream(sessionId: $sessionId, data: $data) {
+                sessionId
+                data
+            }
+        }
+        """
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide keep-alive HTTP session for AppSync requests"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def post_to_appsync(session_id: str, data: dict, token: str, appsync_url: str = None) -> bool:
+    """Send one publishTextStream mutation; returns True on HTTP 200"""
+    appsync_url = appsync_url or os.environ.get("APPSYNC_GRAPHQL_URL")
+    if not appsync_url:
+        logger.error("AppSync GraphQL URL not available in environment")
+        return False
+    if not token:
+        logger.error("No Cognito token available for AppSync authentication")
+        return False
+
+    payload = {
+        "query": PUBLISH_MUTATION,
+        "variables": {
+            "sessionId": session_id,
+            "data": json.dumps(data)
+        }
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Authorization": token
+    }
+
+    try:
+        response = get_http_session().post(
+            appsync_url,
+            data=json.dumps(payload),
+            headers=headers,
+            timeout=APPSYNC_REQUEST_TIMEOUT_SECONDS
+        )
+        if response.status_code != 200:
+            logger.error(f"AppSync publish failed ({response.status_code}): {response.text[:200]}")
+            return False
+        logger.debug(f"📶 AppSync publish ok: {data.get('type')}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to publish to AppSync: {e}")
+        return False
+
+
+class AppSyncStreamPublisher:
+    """
+    Publishes one streamed answer to AppSync without blocking the LLM stream
+    Chunks are coalesced into frames (every STREAM_FLUSH_INTERVAL_MS or STREAM_MAX_FRAME_CHARS),
+    every frame carries an increasing "seq", and close() flushes everything still pending
+    """
+
+    _STOP = "stop"
+    _CHUNK = "chunk"
+    _EVENT = "event"
+
+    def __init__(
+        self,
+        session_id: str,
+        token: str,
+        appsync_url: str = None,
+        flush_interval: float = STREAM_FLUSH_INTERVAL_SECONDS,
+        max_frame_chars: int = STREAM_MAX_FRAME_CHARS
+    ):
+        self.session_id = session_id
+        self.token = token
+        self.appsync_url = appsync_url
+        self.flush_interval = flush_interval
+        self.max_frame_chars = max_frame_chars
+        self.sequence = 0
+        self.frames_sent = 0
+        self.chunks_received = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"appsync-publisher-{session_id}", daemon=True)
+        self._thread.start()
+
+    def publish(self, event_type: str, content: str = "") -> None:
+        """Queue an event; "chunk" events are coalesced, anything else is sent as its own frame"""
+        if event_type == "chunk":
+            if content:
+                self.chunks_received += 1
+                self._queue.put((self._CHUNK, content))
+        else:
+            self._queue.put((self._EVENT, {"type": event_type, "content": content}))
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush pending chunks and wait (up to timeout) for the sender thread to finish"""
+        self._queue.put((self._STOP, None))
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"AppSync publisher for {self.session_id} did not drain within {timeout}s")
+        else:
+            logger.info(f"📶 AppSync stream closed: {self.chunks_received} chunks in {self.frames_sent} frames")
+
+    def _send(self, data: dict) -> None:
+        self.sequence += 1
+        post_to_appsync(self.session_id, {**data, "seq": self.sequence}, self.token, self.appsync_url)
+        self.frames_sent += 1
+
+    def _run(self) -> None:
+        pending = []
+        pending_chars = 0
+        deadline = None
+
+        def flush():
+            nonlocal pending, pending_chars, deadline
+            if pending:
+                self._send({"type": "chunk", "content": "".join(pending)})
+            pending, pending_chars, deadline = [], 0, None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                flush()
+                continue
+
+            try:
+                if kind == self._CHUNK:
+                    if not pending:
+                        deadline = time.monotonic() + self.flush_interval
+                    pending.append(payload)
+                    pending_chars += len(payload)
+                    if pending_chars >= self.max_frame_chars:
+                        flush()
+                else:
+                    # Keep ordering: anything queued before this event goes out first
+                    flush()
+                    if kind == self._STOP:
+                        return
+                    self._send(payload)
+            except Exception as e:
+                logger.error(f"AppSync publisher error: {e}")
@@ -1,7 +1,14 @@
-import boto3, re, json, logging
+import boto3, re, json, logging, hashlib
 import psycopg2
 import os
+from botocore.config import Config as BotoConfig
 from .db_connection_manager import get_db_cursor, get_pool_status
+from .warm_cache import table_cache, chain_cache
+from .appsync_publisher import AppSyncStreamPublisher, post_to_appsync
+from .empathy_prompt_registry import EmpathyPromptRegistry, CompiledEmpathyPrompt
+from .message_store import MessageTurn
+from .chat_history import get_message_counts, take_latest_counts
+from .history_compaction import CHAT_HISTORY_STRATEGY, CompactedChatMessageHistory, refresh_summary
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,46 +20,169 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import create_retrieval_chain
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import DynamoDBChatMessageHistory
 from langchain_core.pydantic_v1 import BaseModel, Field
-from threading import Thread
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 class LLM_evaluation(BaseModel):
     response: str = Field(description="Assessment of the student's answer with a follow-up question.")
     verdict: str = Field(description="'True' if the student has properly diagnosed the patient, 'False' otherwise.")
 
 
+# "describe" checks the table once per process, "skip" trusts that it was provisioned at deploy time
+DYNAMODB_TABLE_CHECK = os.environ.get("DYNAMODB_TABLE_CHECK", "describe").lower()
+DYNAMODB_CHECK_TIMEOUT_SECONDS = float(os.environ.get("DYNAMODB_CHECK_TIMEOUT_SECONDS", "3"))
+
+_dynamodb_control_client = None
+
+def _get_dynamodb_control_client():
+    """Cached DynamoDB client with short timeouts and no retry storms for control-plane checks."""
+    global _dynamodb_control_client
+    if _dynamodb_control_client is None:
+        _dynamodb_control_client = boto3.client(
+            "dynamodb",
+            config=BotoConfig(
+                connect_timeout=DYNAMODB_CHECK_TIMEOUT_SECONDS,
+                read_timeout=DYNAMODB_CHECK_TIMEOUT_SECONDS,
+                retries={"max_attempts": 1, "mode": "standard"}
+            )
+        )
+    return _dynamodb_control_client
+
+# Shared, bounded executor for background empathy evaluations
+EVALUATION_MAX_WORKERS = int(os.environ.get("EVALUATION_MAX_WORKERS", "4"))
+# How long the handler waits for in-flight evaluations before returning
+EVALUATION_WAIT_SECONDS = float(os.environ.get("EVALUATION_WAIT_SECONDS", "25"))
+
+_evaluation_executor = ThreadPoolExecutor(max_workers=EVALUATION_MAX_WORKERS, thread_name_prefix="empathy-eval")
+_pending_evaluations = []
+_evaluation_lock = threading.Lock()
+_evaluation_metrics = {
+    "submitted": 0,
+    "started": 0,
+    "completed": 0,
+    "failed": 0,
+    "timed_out": 0,
+    "total_latency_seconds": 0.0,
+    "max_latency_seconds": 0.0,
+}
+
+_bedrock_runtime_clients = {}
+
+def get_bedrock_runtime_client(region_name: str):
+    """Cached bedrock-runtime client per region (boto3 clients are thread-safe)."""
+    client = _bedrock_runtime_clients.get(region_name)
+    if client is None:
+        with _evaluation_lock:
+            client = _bedrock_runtime_clients.get(region_name)
+            if client is None:
+                client = boto3.client("bedrock-runtime", region_name=region_name)
+                _bedrock_runtime_clients[region_name] = client
+    return client
+
+def submit_evaluation(fn, *args, **kwargs) -> Future:
+    """Run fn on the shared evaluation executor and track it until the handler waits on it."""
+    submitted_at = time.monotonic()
+
+    def run():
+        with _evaluation_lock:
+            _evaluation_metrics["started"] += 1
+        started_at = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+            outcome = "completed"
+            return result
+        except Exception:
+            outcome = "failed"
+            raise
+        finally:
+            latency = time.monotonic() - started_at
+            with _evaluation_lock:
+                _evaluation_metrics[outcome] += 1
+                _evaluation_metrics["total_latency_seconds"] += latency
+                _evaluation_metrics["max_latency_seconds"] = max(_evaluation_metrics["max_latency_seconds"], latency)
+            logger.info(f"🧠 EVALUATION FINISHED ({outcome}) in {latency:.2f}s, queued {started_at - submitted_at:.2f}s")
+
+    future = _evaluation_executor.submit(run)
+    with _evaluation_lock:
+        _evaluation_metrics["submitted"] += 1
+        _pending_evaluations.append(future)
+    return future
+
+def wait_for_pending_evaluations(timeout: float = None) -> int:
+    """
+    Block until every evaluation submitted so far finishes or the deadline passes.
+    Must be called before the Lambda handler returns, otherwise the environment is frozen mid-evaluation.
+    Returns the number of evaluations still running at the deadline.
+    """
+    with _evaluation_lock:
+        pending = list(_pending_evaluations)
+        _pending_evaluations.clear()
+    if not pending:
+        return 0
+
+    _, not_done = wait(pending, timeout=EVALUATION_WAIT_SECONDS if timeout is None else timeout)
+    if not_done:
+        logger.warning(f"⏱️ {len(not_done)} empathy evaluation(s) still running at handler deadline")
+        with _evaluation_lock:
+            _evaluation_metrics["timed_out"] += len(not_done)
+    return len(not_done)
+
+def get_evaluation_metrics() -> dict:
+    """Get queue depth and latency metrics for the evaluation executor."""
+    with _evaluation_lock:
+        metrics = dict(_evaluation_metrics)
+    finished = metrics["completed"] + metrics["failed"]
+    metrics["queue_depth"] = metrics["submitted"] - metrics["started"]
+    metrics["in_flight"] = metrics["started"] - finished
+    metrics["avg_latency_seconds"] = metrics["total_latency_seconds"] / finished if finished else 0.0
+    metrics["max_workers"] = EVALUATION_MAX_WORKERS
+    return metrics
+
 def create_dynamodb_history_table(table_name: str) -> bool:
     """
     Create a DynamoDB table to store the session history if it doesn't already exist.
+    Uses a single describe_table call and remembers the answer for the process lifetime.
+    Returns True when the table is known to exist, False if the check gave up.
     """
-    dynamodb_resource = boto3.resource("dynamodb")
-    dynamodb_client = boto3.client("dynamodb")
-    
-    existing_tables = []
-    exclusive_start_table_name = None
-    
-    while True:
-        if exclusive_start_table_name:
-            response = dynamodb_client.list_tables(ExclusiveStartTableName=exclusive_start_table_name)
-        else:
-            response = dynamodb_client.list_tables()
-        
-        existing_tables.extend(response.get('TableNames', []))
-        
-        if 'LastEvaluatedTableName' in response:
-            exclusive_start_table_name = response['LastEvaluatedTableName']
-        else:
-            break
-    
-    if table_name not in existing_tables:
-        table = dynamodb_resource.create_table(
-            TableName=table_name,
-            KeySchema=[{"AttributeName": "SessionId", "KeyType": "HASH"}],
-            AttributeDefinitions=[{"AttributeName": "SessionId", "AttributeType": "S"}],
-            BillingMode="PAY_PER_REQUEST",
-        )
-        table.meta.client.get_waiter("table_exists").wait(TableName=table_name)
+    if DYNAMODB_TABLE_CHECK == "skip":
+        return True
+
+    if table_cache.get(table_name):
+        return True
+
+    dynamodb_client = _get_dynamodb_control_client()
+
+    try:
+        dynamodb_client.describe_table(TableName=table_name)
+    except dynamodb_client.exceptions.ResourceNotFoundException:
+        logger.info(f"DynamoDB table {table_name} not found, creating it")
+        try:
+            dynamodb_client.create_table(
+                TableName=table_name,
+                KeySchema=[{"AttributeName": "SessionId", "KeyType": "HASH"}],
+                AttributeDefinitions=[{"AttributeName": "SessionId", "AttributeType": "S"}],
+                BillingMode="PAY_PER_REQUEST",
+            )
+        except dynamodb_client.exceptions.ResourceInUseException:
+            # Another container created it first
+            pass
+        try:
+            dynamodb_client.get_waiter("table_exists").wait(
+                TableName=table_name,
+                WaiterConfig={"Delay": 2, "MaxAttempts": 30}
+            )
+        except Exception as e:
+            logger.error(f"Gave up waiting for DynamoDB table {table_name}: {e}")
+            return False
+    except Exception as e:
+        # Don't block the chat turn on a slow control plane; try again next invocation
+        logger.warning(f"DynamoDB table check for {table_name} gave up: {e}")
+        return False
+
+    table_cache.set(table_name, True, ttl_seconds=None)
+    return True
 
 def get_bedrock_llm(
     bedrock_llm_id: str,
@@ -270,60 +400,21 @@ Provide structured evaluation with detailed justifications for each score.
 }}
 """
 
-def get_empathy_prompt() -> str:
-    """Retrieve the latest empathy prompt from the empathy_prompt_history table using centralized connection manager."""
-    try:
-        logger.info("🔍 RETRIEVING EMPATHY PROMPT FROM DATABASE")
-        logger.info("🔗 DB_EMPATHY_PROMPT: Using centralized connection manager")
-        
-        # Log pool status for monitoring
-        pool_status = get_pool_status()
-        logger.info(f"🔗 DB_POOL_STATUS: {pool_status}")
-        
-        with get_db_cursor() as cursor:
-            cursor.execute(
-                'SELECT prompt_content, created_at FROM empathy_prompt_history ORDER BY created_at DESC LIMIT 1'
-            )
-            
-            result = cursor.fetchone()
+def _query_empathy_prompt(sql: str):
+    with get_db_cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchone()
 
-        if result and result[0]:
-            prompt_content = result[0]
-            created_at = result[1]
-            logger.info(f"🎯 ADMIN EMPATHY PROMPT FOUND - Created: {created_at}")
-            logger.info(f"🎯 ADMIN PROMPT LENGTH: {len(prompt_content)} characters")
-            logger.info(f"🎯 ADMIN PROMPT PREVIEW: {prompt_content[:200]}...")
-            
-            # Check if prompt has required placeholders
-            if '{patient_context}' not in prompt_content or '{user_text}' not in prompt_content:
-                logger.error("❌ ADMIN PROMPT MISSING REQUIRED PLACEHOLDERS: {patient_context} or {user_text}")
-                logger.error(f"❌ FALLING BACK TO DEFAULT PROMPT")
-                return get_default_empathy_prompt()
-            
-            # Fix JSON formatting issues - replace single braces with double braces in JSON template
-            if '"empathy_score":' in prompt_content and '{{' not in prompt_content:
-                logger.info("🔧 FIXING ADMIN PROMPT JSON FORMATTING")
-                # Find JSON template section and fix braces
-                import re
-                json_pattern = r'(\\{[^{}]*"empathy_score"[^{}]*\\})'  
-                def fix_braces(match):
-                    json_str = match.group(1)
-                    # Replace single braces with double braces for literal JSON
-                    fixed = json_str.replace('{', '{{').replace('}', '}}')
-                    return fixed
-                prompt_content = re.sub(json_pattern, fix_braces, prompt_content, flags=re.DOTALL)
-                logger.info("✅ ADMIN PROMPT JSON FORMATTING FIXED")
-            
-            return prompt_content
-        else:
-            logger.info("🔧 No admin prompt found in database, using default empathy prompt")
-            return get_default_empathy_prompt()
+# Loaded and validated once per container; re-checked against MAX(created_at) after EMPATHY_PROMPT_TTL_SECONDS
+empathy_prompt_registry = EmpathyPromptRegistry(_query_empathy_prompt, get_default_empathy_prompt)
 
-    except Exception as e:
-        logger.error(f"Error retrieving empathy prompt from DB: {e}")
-        logger.exception("Full database error:")
-        logger.info("🔧 Falling back to default empathy prompt")
-        return get_default_empathy_prompt()
+def get_compiled_empathy_prompt() -> CompiledEmpathyPrompt:
+    """Get the active empathy prompt, already validated and compiled, from the process-wide registry."""
+    return empathy_prompt_registry.get()
+
+def get_empathy_prompt() -> str:
+    """Retrieve the active empathy prompt template (admin prompt from empathy_prompt_history, or the default)."""
+    return get_compiled_empathy_prompt().template
 
 def evaluate_empathy(student_response: str, patient_context: str, bedrock_client) -> dict:
     """
@@ -331,29 +422,12 @@ def evaluate_empathy(student_response: str, patient_context: str, bedrock_client
     """
     logger.info("🧠 EMPATHY EVALUATION STARTED")
 
-    empathy_prompt_template = get_empathy_prompt()
-    logger.info(f"🎯 EMPATHY PROMPT LENGTH: {len(empathy_prompt_template)} characters")
-    logger.info(f"🎯 EMPATHY PROMPT PREVIEW: {empathy_prompt_template[:200]}...")
-    
-    try:
-        evaluation_prompt = empathy_prompt_template.format(
-            patient_context=patient_context,
-            user_text=student_response
-        )
-        logger.info(f"✅ PROMPT FORMATTING SUCCESSFUL - Final prompt length: {len(evaluation_prompt)}")
-    except Exception as format_error:
-        logger.error(f"❌ ADMIN PROMPT FORMATTING ERROR: {format_error}")
-        logger.error(f"❌ FALLING BACK TO DEFAULT EMPATHY PROMPT")
-        try:
-            default_prompt = get_default_empathy_prompt()
-            evaluation_prompt = default_prompt.format(
-                patient_context=patient_context,
-                user_text=student_response
-            )
-            logger.info(f"✅ DEFAULT PROMPT FORMATTING SUCCESSFUL - Final prompt length: {len(evaluation_prompt)}")
-        except Exception as default_error:
-            logger.error(f"❌ DEFAULT PROMPT ALSO FAILED: {default_error}")
-            return None
+    empathy_prompt = get_compiled_empathy_prompt()
+    evaluation_prompt = empathy_prompt.format(
+        patient_context=patient_context,
+        user_text=student_response
+    )
+    logger.info(f"🎯 EMPATHY PROMPT ({empathy_prompt.source}) - Final prompt length: {len(evaluation_prompt)}")
 
     body = {
         "messages": [{
@@ -378,7 +452,7 @@ def evaluate_empathy(student_response: str, patient_context: str, bedrock_client
             logger.info("✅ BEDROCK MODEL CALL SUCCESSFUL")
         except Exception as model_error:
             logger.warning(f"Nova Pro failed in deployment region, trying us-east-1: {model_error}")
-            fallback_client = boto3.client("bedrock-runtime", region_name="us-east-1")
+            fallback_client = get_bedrock_runtime_client("us-east-1")
             response = fallback_client.invoke_model(
                 modelId=bedrock_client["model_id"],
                 contentType="application/json",
@@ -550,28 +624,8 @@ def build_empathy_feedback(evaluation):
     empathy_feedback += "---\\\\n\\\\n"
     return empathy_feedback
 
-def get_response(
-    query: str,
-    patient_name: str,
-    llm: ChatBedrock,
-    history_aware_retriever,
-    table_name: str,
-    session_id: str,
-    system_prompt: str,
-    patient_age: str,
-    patient_prompt: str,
-    llm_completion: bool,
-    stream: bool = False
-) -> dict:
-    """
-    Generates a response to a query using the LLM and a history-aware retriever for context.
-    """
-    logger.info(f"🔍 GET_RESPONSE CALLED - Stream: {stream}, Query: '{query[:50]}...'")
-    
-    # we want to save student message without blocking (empathy will be evaluated async during streaming)
-    save_message_to_db(session_id, True, query, None)
-    empathy_feedback = ""
-    
+def build_final_system_prompt(patient_name: str, system_prompt: str, patient_prompt: str, llm_completion: bool) -> str:
+    """Assemble the patient role system prompt used by the answer chain."""
     completion_string = """
                 Once I, the pharmacist, have give you a diagnosis, politely leave the conversation and wish me goodbye.
                 Regardless if I have given you the proper diagnosis or not for the patient you are pretending to be, stop talking to me.
@@ -586,7 +640,7 @@ def get_response(
         system_prompt = get_default_system_prompt(patient_name)
         logger.info("USING DEFAULT SYSTEM PROMPT, passed prompt was empty")
 
-    final_system_prompt = (
+    return (
         f"""
         <|begin_of_text|>
         <|start_header_id|>patient<|end_header_id|>
@@ -608,6 +662,13 @@ def get_response(
         """
     )
 
+def build_conversational_rag_chain(
+    llm: ChatBedrock,
+    history_aware_retriever,
+    table_name: str,
+    final_system_prompt: str
+) -> RunnableWithMessageHistory:
+    """Compile the prompt, document and retrieval chains into a session-aware RAG chain."""
     logger.info("====================================")
     logger.info("FINAL SYSTEM PROMPT BEING USED:")
     logger.info(f"    system prompt length: {len(final_system_prompt)} chars")
@@ -623,16 +684,77 @@ def get_response(
     question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
     rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
 
-    conversational_rag_chain = RunnableWithMessageHistory(
+    return RunnableWithMessageHistory(
         rag_chain,
-        lambda session_id: DynamoDBChatMessageHistory(
-            table_name=table_name, 
+        lambda session_id: CompactedChatMessageHistory(
+            table_name=table_name,
             session_id=session_id
         ),
         input_messages_key="input",
         history_messages_key="chat_history",
         output_messages_key="answer",
     )
+
+def get_conversational_rag_chain(
+    llm: ChatBedrock,
+    history_aware_retriever,
+    table_name: str,
+    final_system_prompt: str,
+    llm_completion: bool
+) -> RunnableWithMessageHistory:
+    """
+    Return a compiled RAG chain from the LRU chain cache, building it on a miss.
+    The chain is keyed by retriever (one per patient), prompt hash, completion mode, model and streaming flag,
+    so later turns only bind their session_id at invoke time.
+    """
+    prompt_hash = hashlib.sha256(final_system_prompt.encode("utf-8")).hexdigest()
+    key = (
+        id(history_aware_retriever),
+        prompt_hash,
+        bool(llm_completion),
+        getattr(llm, "model_id", None),
+        bool(getattr(llm, "streaming", False)),
+        table_name,
+    )
+    return chain_cache.get_or_load(
+        key,
+        lambda: build_conversational_rag_chain(llm, history_aware_retriever, table_name, final_system_prompt)
+    )
+
+def get_response(
+    query: str,
+    patient_name: str,
+    llm: ChatBedrock,
+    history_aware_retriever,
+    table_name: str,
+    session_id: str,
+    system_prompt: str,
+    patient_age: str,
+    patient_prompt: str,
+    llm_completion: bool,
+    stream: bool = False,
+    message_id: str = None
+) -> dict:
+    """
+    Generates a response to a query using the LLM and a history-aware retriever for context.
+    The student message (keyed by message_id when the client supplies one) and the reply are saved once, together.
+    """
+    logger.info(f"🔍 GET_RESPONSE CALLED - Stream: {stream}, Query: '{query[:50]}...'")
+    
+    # Counters left over from an earlier turn that never reached naming are stale now
+    take_latest_counts(session_id)
+    turn = MessageTurn(session_id, student_message_id=message_id)
+    turn.add_student_message(query)
+    empathy_feedback = ""
+    
+    final_system_prompt = build_final_system_prompt(patient_name, system_prompt, patient_prompt, llm_completion)
+    conversational_rag_chain = get_conversational_rag_chain(
+        llm=llm,
+        history_aware_retriever=history_aware_retriever,
+        table_name=table_name,
+        final_system_prompt=final_system_prompt,
+        llm_completion=llm_completion
+    )
     
     response = ""
     try:
@@ -643,7 +765,8 @@ def get_response(
                 session_id,
                 patient_name,
                 patient_age,
-                patient_prompt
+                patient_prompt,
+                turn=turn
             )
         else:
             response = generate_response(
@@ -658,8 +781,12 @@ def get_response(
         logger.error(f"Response generation error: {e}")
         response = "I'm sorry, I cannot provide a response to that query."
     
+    if CHAT_HISTORY_STRATEGY == "summary":
+        # Off the response path; the handler waits for it with the empathy evaluations
+        submit_evaluation(refresh_summary, table_name, session_id, llm)
+    
     if stream:
-        save_message_to_db(session_id, False, response, None)
+        turn.flush()
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         session_name = f"{patient_name}_{timestamp}"
@@ -672,7 +799,8 @@ def get_response(
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     result["session_name"] = f"{patient_name}_{timestamp}"
     
-    save_message_to_db(session_id, False, result["llm_output"], None)
+    turn.add_ai_message(result["llm_output"])
+    turn.flush()
     
     return result
 
@@ -692,14 +820,13 @@ def generate_streaming_response(
     session_id: str,
     patient_name: str,
     patient_age: str,
-    patient_prompt: str
+    patient_prompt: str,
+    turn: MessageTurn
 ) -> str:
     """
     Streams an answer via AppSync as fast as possible.
+    The reply and the empathy evaluation are recorded on the turn; the caller flushes it.
     """
-    import time
-    from threading import Thread
-    
     logger.info(f"🚀 STREAMING FUNCTION STARTED with query: '{query}' - DEPLOYMENT TEST v2")
 
     def empathy_async():
@@ -708,14 +835,14 @@ def generate_streaming_response(
             patient_context = f"Patient: {patient_name}, Age: {patient_age}, Condition: {patient_prompt}"
             deployment_region = os.environ.get('AWS_REGION', 'us-east-1')
             nova_client = {
-                "client": boto3.client("bedrock-runtime", region_name=deployment_region),
+                "client": get_bedrock_runtime_client(deployment_region),
                 "model_id": "amazon.nova-pro-v1:0"
             }
             logger.info(f"🧠 CALLING evaluate_empathy function...")
             evaluation = evaluate_empathy(query, patient_context, nova_client)
             logger.info(f"🧠 ASYNC EMPATHY EVALUATION RESULT: {evaluation is not None}")
             
-            save_message_to_db(session_id, True, query, evaluation)
+            turn.attach_empathy_evaluation(evaluation)
             
             if evaluation:
                 logger.info("🧠 Publishing empathy data to AppSync")
@@ -725,7 +852,6 @@ def generate_streaming_response(
                 logger.warning("🧠 No empathy evaluation to publish")
         except Exception as e:
             logger.exception("Async empathy publish failed")
-            save_message_to_db(session_id, True, query, None)
 
     try:
         logger.info(f"🔍 STREAMING QUERY CHECK: '{query}' (length: {len(query.strip())})")
@@ -735,60 +861,64 @@ def generate_streaming_response(
         
         if should_evaluate:
             logger.info("✅ EMPATHY EVALUATION WILL START")
-            empathy_thread = Thread(target=empathy_async)
-            empathy_thread.start()
-            logger.info("✅ EMPATHY THREAD STARTED")
+            submit_evaluation(empathy_async)
+            logger.info(f"✅ EMPATHY EVALUATION QUEUED - {get_evaluation_metrics()['queue_depth']} waiting")
         else:
             logger.info(f"❌ EMPATHY EVALUATION SKIPPED - Query: '{query}'")
-            save_message_to_db(session_id, True, query, None)
 
-        publish_to_appsync(session_id, {"type": "start", "content": ""})
+        publisher = AppSyncStreamPublisher(session_id, get_cognito_token())
+        publisher.publish("start")
 
         full_response = ""
 
         try:
-            for chunk in conversational_rag_chain.stream(
-                {"input": query},
-                config={"configurable": {"session_id": session_id}},
-            ):
-                content = ""
-                if isinstance(chunk, dict):
-                    if "answer" in chunk:
-                        content = chunk["answer"]
-                    elif "content" in chunk:
-                        content = chunk["content"]
-                    elif "text" in chunk:
-                        content = chunk["text"]
-                elif isinstance(chunk, str):
-                    content = chunk
-
-                if content:
-                    full_response += content
-                    publish_to_appsync(session_id, {"type": "chunk", "content": content})
-
-            if not full_response:
-                raise Exception("No content received from streaming")
-
-        except Exception as stream_error:
-            logger.warning(f"Streaming failed, falling back to invoke: {stream_error}")
-            result = conversational_rag_chain.invoke(
-                {"input": query},
-                config={"configurable": {"session_id": session_id}},
-            )
-            full_response = result.get("answer", str(result))
-            words = full_response.split(" ")
-            for i in range(0, len(words), 3):
-                chunk = " ".join(words[i : i + 3]) + " "
-                publish_to_appsync(session_id, {"type": "chunk", "content": chunk})
-                time.sleep(0.005)
-
-        publish_to_appsync(session_id, {"type": "end", "content": full_response})
-        save_message_to_db(session_id, False, full_response, None)
+            try:
+                for chunk in conversational_rag_chain.stream(
+                    {"input": query},
+                    config={"configurable": {"session_id": session_id}},
+                ):
+                    content = ""
+                    if isinstance(chunk, dict):
+                        if "answer" in chunk:
+                            content = chunk["answer"]
+                        elif "content" in chunk:
+                            content = chunk["content"]
+                        elif "text" in chunk:
+                            content = chunk["text"]
+                    elif isinstance(chunk, str):
+                        content = chunk
+
+                    if content:
+                        full_response += content
+                        publisher.publish("chunk", content)
+
+                if not full_response:
+                    raise Exception("No content received from streaming")
+
+            except Exception as stream_error:
+                logger.warning(f"Streaming failed, falling back to invoke: {stream_error}")
+                result = conversational_rag_chain.invoke(
+                    {"input": query},
+                    config={"configurable": {"session_id": session_id}},
+                )
+                full_response = result.get("answer", str(result))
+                words = full_response.split(" ")
+                for i in range(0, len(words), 3):
+                    chunk = " ".join(words[i : i + 3]) + " "
+                    publisher.publish("chunk", chunk)
+
+            publisher.publish("end", full_response)
+        finally:
+            # Final flush; the answer is not complete for the client until "end" is delivered
+            publisher.close()
+
+        turn.add_ai_message(full_response)
 
         return full_response
 
     except Exception as e:
         error_msg = "I am sorry, I cannot provide a response to that query."
+        turn.add_ai_message(error_msg)
         publish_to_appsync(session_id, {"type": "error", "content": error_msg})
         return error_msg
 
@@ -803,87 +933,8 @@ def get_cognito_token():
         return None
 
 def publish_to_appsync(session_id: str, data: dict):
-    """Publish streaming data to AppSync subscription using Cognito User Pool authentication."""
-    import requests
-    import json
-    import os
-    
-    try:        
-        appsync_url = os.environ.get('APPSYNC_GRAPHQL_URL')
-        if not appsync_url:
-            logger.error("AppSync GraphQL URL not available in environment")
-            return
-            
-        logger.info(f"🔗 Using AppSync URL: {appsync_url}")
-            
-        mutation = """
-        mutation PublishTextStream($sessionId: String!, $data: AWSJSON!) {
-            publishTextStream(sessionId: $sessionId, data: $data) {
-                sessionId
-                data
-            }
-        }
-        """
-        
-        payload = {
-            'query': mutation,
-            'variables': {
-                'sessionId': session_id,
-                'data': json.dumps(data)
-            }
-        }
-        
-        token = get_cognito_token()
-        if not token:
-            logger.error("No Cognito token available for AppSync authentication")
-            return
-            
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-            'Authorization': token
-        }
-        
-        logger.info("🔑 Using Cognito User Pool token for authentication")
-        
-        logger.info(f"📶 Making AppSync request to: {appsync_url}")
-        response = requests.post(appsync_url, data=json.dumps(payload), headers=headers)
-        
-        if response.status_code != 200:
-            logger.error(f"Request payload: {json.dumps(payload, indent=2)}")
-        else:
-            logger.info(f"📝 Response DEPLOYMENT TEST v3: {response.text[:200]}...")
-        
-    except Exception as e:
-        logger.error(f"Failed to publish to AppSync: {e}")
-        logger.exception("Full AppSync error:")
-
-def save_message_to_db(session_id: str, student_sent: bool, message_content: str, empathy_evaluation: dict = None):
-    """Save message with empathy evaluation to PostgreSQL messages table using centralized connection manager."""
-    try:
-        logger.info("🔗 DB_SAVE_MESSAGE: Using centralized connection manager")
-        
-        empathy_json = json.dumps(empathy_evaluation) if empathy_evaluation else None
-        if empathy_evaluation:
-            logger.info(f"💾 Empathy JSON being saved: {empathy_json[:500]}...")
-            logger.info(f"💾 Empathy evaluation keys: {list(empathy_evaluation.keys())}")
-            logger.info(f"💾 Perspective taking in DB save: {empathy_evaluation.get('perspective_taking')}")
-            logger.info(f"💾 Emotional resonance in DB save: {empathy_evaluation.get('emotional_resonance')}")
-        
-        with get_db_cursor() as cursor:
-            cursor.execute(
-                'INSERT INTO "messages" (session_id, student_sent, message_content, empathy_evaluation, time_sent) VALUES (%s, %s, %s, %s, NOW())',
-                (session_id, student_sent, message_content, empathy_json)
-            )
-        
-        if empathy_evaluation:
-            logger.info(f"🧠 Empathy data saved: {json.dumps(empathy_evaluation)[:100]}...")
-            logger.info(f"🧠 Saved empathy scores - PT: {empathy_evaluation.get('perspective_taking')}, ER: {empathy_evaluation.get('emotional_resonance')}")
-        
-        logger.info("🔗 DB_MESSAGE_SAVED: Message successfully saved using connection manager")
-        
-    except Exception as e:
-        logger.error(f"Error saving message to database: {e}")
+    """Publish a single event to the AppSync subscription over the shared keep-alive session."""
+    post_to_appsync(session_id, data, get_cognito_token())
 
 def get_llm_output(response: str, llm_completion: bool, empathy_feedback: str = "") -> dict:
     """
@@ -929,50 +980,35 @@ def split_into_sentences(paragraph: str) -> list[str]:
     sentences = re.split(sentence_endings, paragraph)
     return sentences
 
+# Naming happens once per session, right after its first real exchange (1 AI intro + 1 student message + 1 AI reply)
+NAMING_PENDING, NAMING_DUE, NAMING_PAST = "pending", "due", "past"
+
+def session_naming_state(counts: dict) -> str:
+    """Where a session stands relative to its naming moment, from its message counters"""
+    if counts["human"] > 1 or counts["ai"] > 2:
+        return NAMING_PAST
+    if counts["human"] == 1 and counts["ai"] == 2:
+        return NAMING_DUE
+    return NAMING_PENDING
+
 def update_session_name(table_name: str, session_id: str, bedrock_llm_id: str, patient_name: str = None) -> str:
     """
     Generate session name after first real medical exchange using patient_name_[timestamp] format.
-    Looks for: 1 AI intro + 1 student response + 1 AI response (1 human, 2 AI total).
+    Uses the counters this turn already read with the history (advanced by its own appends), so
+    there is no DynamoDB call per turn; they are read on their own only if the turn never loaded them.
     """
-    
-    dynamodb_client = boto3.client("dynamodb")
-    
-    try:
-        response = dynamodb_client.get_item(
-            TableName=table_name,
-            Key={
-                'SessionId': {
-                    'S': session_id
-                }
-            }
-        )
-    except Exception as e:
-        print(f"Error fetching conversation history from DynamoDB: {e}")
-        return None
-
-    history = response.get('Item', {}).get('History', {}).get('L', [])
+    counts = take_latest_counts(session_id)
+    if counts is None:
+        try:
+            counts = get_message_counts(table_name, session_id, remember=False)
+        except Exception as e:
+            print(f"Error fetching conversation history from DynamoDB: {e}")
+            return None
 
-    human_messages = []
-    ai_messages = []
-    
-    for item in history:
-        message_type = item.get('M', {}).get('data', {}).get('M', {}).get('type', {}).get('S')
-        
-        if message_type == 'human':
-            human_messages.append(item)
-            if len(human_messages) > 1:
-                print("More than one student message found; past naming window.")
-                return None
-        
-        elif message_type == 'ai':
-            ai_messages.append(item)
-            if len(ai_messages) > 2:
-                print("More than two AI messages found; past naming window.")
-                return None
-
-    # Check if this is the right moment: 1 human message, 2 AI messages
-    if len(human_messages) != 1 or len(ai_messages) != 2:
-        print(f"Not the naming moment - Human: {len(human_messages)}, AI: {len(ai_messages)}")
+    state = session_naming_state(counts)
+    if state != NAMING_DUE:
+        if state == NAMING_PENDING:
+            print(f"Not the naming moment - Human: {counts['human']}, AI: {counts['ai']}")
         return None
     
     # Generate timestamp-based session name
@@ -0,0 +1,208 @@
+"""
+DynamoDB conversation history, shared by the text generation Lambda and the socket server
+Items keep the DynamoDBChatMessageHistory layout ({"SessionId", "History"}) plus message
+counters updated in the same UpdateItem as each append, so the tail of a conversation
+and its message counts can be read without loading the whole History list
+"""
+
+import os
+import logging
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Messages loaded into the RAG prompt per turn; 0 loads the whole conversation
+CHAT_HISTORY_WINDOW = int(os.environ.get("CHAT_HISTORY_WINDOW", "0"))
+# Longer windows are read as the whole list instead of by index (ProjectionExpression is capped at 4 KB)
+MAX_INDEXED_WINDOW = 200
+
+MESSAGE_COUNT = "MessageCount"
+TYPE_COUNTS = {"human": "HumanMessageCount", "ai": "AIMessageCount"}
+
+_tables = {}
+_tables_lock = threading.Lock()
+# Counters read during the current turn, per session, until the turn pipeline picks them up
+_latest_counts = {}
+_latest_counts_lock = threading.Lock()
+
+
+def get_history_table(table_name: str):
+    """Cached DynamoDB Table resource for the history table"""
+    table = _tables.get(table_name)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(table_name)
+            if table is None:
+                table = _tables[table_name] = boto3.resource("dynamodb").Table(table_name)
+    return table
+
+
+def history_key(session_id: str) -> dict:
+    return {"SessionId": session_id}
+
+
+def _count_history(history: list) -> dict:
+    counts = {"messages": len(history), "human": 0, "ai": 0}
+    for message in history:
+        message_type = message.get("type")
+        if message_type in TYPE_COUNTS:
+            counts[message_type] += 1
+    return counts
+
+
+def _read_counts(table, session_id: str, remember: bool = True) -> Tuple[dict, Optional[list]]:
+    """
+    Counters of the session, plus the full History when it had to be read to compute them.
+    Items written before the counters existed are backfilled on first read. Only the turn's own
+    request path may remember them (remember=True); a background read could land between the
+    turn's append and update_session_name and replace its counts with stale ones.
+    """
+    response = table.get_item(
+        Key=history_key(session_id),
+        ProjectionExpression=", ".join([MESSAGE_COUNT, *TYPE_COUNTS.values()]),
+        # The previous turn's append must be visible, or naming and tail reads start from stale counts
+        ConsistentRead=True
+    )
+    item = response.get("Item")
+    if item and MESSAGE_COUNT in item:
+        counts = {
+            "messages": int(item[MESSAGE_COUNT]),
+            "human": int(item.get(TYPE_COUNTS["human"], 0)),
+            "ai": int(item.get(TYPE_COUNTS["ai"], 0)),
+        }
+        if remember:
+            remember_counts(session_id, counts)
+        return counts, None
+
+    history = table.get_item(Key=history_key(session_id), ProjectionExpression="History").get("Item", {}).get("History", [])
+    counts = _count_history(history)
+    if remember:
+        remember_counts(session_id, counts)
+    if history:
+        try:
+            # Only if nothing was appended since the read
+            table.update_item(
+                Key=history_key(session_id),
+                UpdateExpression="SET #n = :n, #h = :h, #a = :a",
+                ConditionExpression="attribute_not_exists(#n) AND size(History) = :n",
+                ExpressionAttributeNames={"#n": MESSAGE_COUNT, "#h": TYPE_COUNTS["human"], "#a": TYPE_COUNTS["ai"]},
+                ExpressionAttributeValues={":n": counts["messages"], ":h": counts["human"], ":a": counts["ai"]},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                logger.warning(f"Could not backfill message counters for session {session_id}: {e}")
+    return counts, history
+
+
+def get_message_counts(table_name: str, session_id: str, remember: bool = True) -> dict:
+    """{"messages", "human", "ai"} counts for the session, zero when it has no history"""
+    counts, _ = _read_counts(get_history_table(table_name), session_id, remember)
+    return counts
+
+
+def get_recent_messages(table_name: str, session_id: str, window: int = CHAT_HISTORY_WINDOW, remember: bool = True) -> List[BaseMessage]:
+    """
+    The last `window` messages of the session (all of them when window is 0), reading only those list elements.
+    remember=False for callers that never take_latest_counts() (the voice server).
+    """
+    table = get_history_table(table_name)
+    if window <= 0 or window > MAX_INDEXED_WINDOW:
+        history = table.get_item(Key=history_key(session_id), ProjectionExpression="History").get("Item", {}).get("History", [])
+        if remember:
+            remember_counts(session_id, _count_history(history))
+        return messages_from_dict(history[-window:] if window > 0 else history)
+
+    counts, history = _read_counts(table, session_id, remember)
+    total = counts["messages"]
+    if history is None:
+        history = read_history_range(table, session_id, max(0, total - window), total)
+    return messages_from_dict(history[-window:])
+
+
+def read_history_range(table, session_id: str, start: int, end: int) -> list:
+    """History[start:end] as message dicts, projecting only those elements when the range is short enough"""
+    if end <= start:
+        return []
+    if end - start > MAX_INDEXED_WINDOW:
+        history = table.get_item(Key=history_key(session_id), ProjectionExpression="History").get("Item", {}).get("History", [])
+        return history[start:end]
+    response = table.get_item(
+        Key=history_key(session_id),
+        ProjectionExpression=", ".join(f"#h[{index}]" for index in range(start, end)),
+        ExpressionAttributeNames={"#h": "History"}
+    )
+    return response.get("Item", {}).get("History", [])
+
+
+def append_messages(table_name: str, session_id: str, messages: Sequence[BaseMessage]) -> None:
+    """Append messages and bump the counters in one UpdateItem, without reading the item"""
+    if not messages:
+        return
+    table = get_history_table(table_name)
+    new_messages = messages_to_dict(messages)
+    counts = _count_history(new_messages)
+    update = dict(
+        Key=history_key(session_id),
+        UpdateExpression="SET History = list_append(if_not_exists(History, :empty), :new) ADD #n :n, #h :h, #a :a",
+        # A history written before the counters existed gets them backfilled first
+        ConditionExpression="attribute_exists(#n) OR attribute_not_exists(History)",
+        ExpressionAttributeNames={"#n": MESSAGE_COUNT, "#h": TYPE_COUNTS["human"], "#a": TYPE_COUNTS["ai"]},
+        ExpressionAttributeValues={
+            ":empty": [],
+            ":new": new_messages,
+            ":n": counts["messages"],
+            ":h": counts["human"],
+            ":a": counts["ai"],
+        },
+    )
+    try:
+        table.update_item(**update)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        _read_counts(table, session_id, remember=False)
+        table.update_item(**update)
+
+    # ReturnValues would send the whole History list back, so known counters are advanced locally instead
+    with _latest_counts_lock:
+        latest = _latest_counts.get(session_id)
+        if latest is not None:
+            _latest_counts[session_id] = {key: latest[key] + counts[key] for key in latest}
+
+
+def remember_counts(session_id: str, counts: dict) -> None:
+    """Keep counters read during this turn so later steps of the turn need not read them again"""
+    with _latest_counts_lock:
+        _latest_counts[session_id] = dict(counts)
+
+
+def take_latest_counts(session_id: str) -> Optional[dict]:
+    """Counters seen by this process during the current turn (including its appends), consumed on read"""
+    with _latest_counts_lock:
+        return _latest_counts.pop(session_id, None)
+
+
+class WindowedChatMessageHistory(BaseChatMessageHistory):
+    """Chat history for RunnableWithMessageHistory backed by the counted DynamoDB layout"""
+
+    def __init__(self, table_name: str, session_id: str, window: int = CHAT_HISTORY_WINDOW):
+        self.table_name = table_name
+        self.session_id = session_id
+        self.window = window
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return get_recent_messages(self.table_name, self.session_id, self.window)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        append_messages(self.table_name, self.session_id, messages)
+
+    def clear(self) -> None:
+        get_history_table(self.table_name).delete_item(Key=history_key(self.session_id))
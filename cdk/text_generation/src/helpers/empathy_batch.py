@@ -0,0 +1,238 @@
+"""
+Batch empathy evaluation
+Re-scores many stored student messages with a concurrency-limited fan-out, saving results
+in bulk UPDATEs as they complete; a run that is about to hit the Lambda deadline stops
+submitting work and returns a cursor to continue from
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from psycopg2.extras import execute_values
+
+from .db_connection_manager import get_db_cursor
+from .chat import evaluate_empathy, get_bedrock_runtime_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EMPATHY_BATCH_MAX_WORKERS = int(os.environ.get("EMPATHY_BATCH_MAX_WORKERS", "8"))
+EMPATHY_BATCH_MAX_MESSAGES = int(os.environ.get("EMPATHY_BATCH_MAX_MESSAGES", "500"))
+# Stop submitting judge calls once less than this much Lambda time is left (a call plus the final save)
+EMPATHY_BATCH_TIME_RESERVE_SECONDS = float(os.environ.get("EMPATHY_BATCH_TIME_RESERVE_SECONDS", "90"))
+EMPATHY_JUDGE_MODEL_ID = "amazon.nova-pro-v1:0"
+
+STUDENT_MESSAGES_QUERY = """
+    SELECT m.message_id, m.session_id, m.message_content, m.time_sent, p.patient_name, p.patient_age, p.patient_prompt
+    FROM messages m
+    JOIN sessions s ON s.session_id = m.session_id
+    JOIN student_interactions si ON si.student_interaction_id = s.student_interaction_id
+    JOIN patients p ON p.patient_id = si.patient_id
+    WHERE m.student_sent = true
+      AND coalesce(trim(m.message_content), '') <> ''
+"""
+
+
+def fetch_student_messages(session_ids: List[str] = None, message_ids: List[str] = None, only_missing: bool = False, limit: int = EMPATHY_BATCH_MAX_MESSAGES, cursor: dict = None) -> List[dict]:
+    """
+    Load student messages (with their patient context) to evaluate, oldest first.
+
+    Args:
+    session_ids (List[str], optional): Only messages from these sessions.
+    message_ids (List[str], optional): Only these messages.
+    only_missing (bool): Skip messages that already have an empathy evaluation.
+    limit (int): Maximum number of messages returned.
+    cursor (dict, optional): {"time_sent", "message_id"} of the last message already processed.
+
+    Returns:
+    List[dict]: One dict per message with message_id, session_id, message_content, time_sent and patient_context.
+    """
+    query = STUDENT_MESSAGES_QUERY
+    params = []
+    if session_ids:
+        query += " AND m.session_id = ANY(%s::uuid[])"
+        params.append(list(session_ids))
+    if message_ids:
+        query += " AND m.message_id = ANY(%s::uuid[])"
+        params.append(list(message_ids))
+    if only_missing:
+        query += " AND (m.empathy_evaluation IS NULL OR m.empathy_evaluation = '{}'::jsonb)"
+    if cursor:
+        query += " AND (m.time_sent, m.message_id) > (%s::timestamp, %s::uuid)"
+        params.extend([cursor["time_sent"], cursor["message_id"]])
+    query += " ORDER BY m.time_sent, m.message_id LIMIT %s"
+    params.append(limit)
+
+    with get_db_cursor() as db_cursor:
+        db_cursor.execute(query, params)
+        rows = db_cursor.fetchall()
+
+    return [
+        {
+            "message_id": str(message_id),
+            "session_id": str(session_id),
+            "message_content": message_content,
+            "time_sent": time_sent.isoformat(),
+            "patient_context": f"Patient: {patient_name}, Age: {patient_age}, Condition: {patient_prompt}",
+        }
+        for message_id, session_id, message_content, time_sent, patient_name, patient_age, patient_prompt in rows
+    ]
+
+
+def evaluate_empathy_batch(
+    messages: List[dict],
+    max_workers: int = EMPATHY_BATCH_MAX_WORKERS,
+    region_name: str = None,
+    on_results: Callable[[Dict[str, Optional[dict]]], None] = None,
+    remaining_ms: Callable[[], int] = None
+) -> Dict[str, Optional[dict]]:
+    """
+    Score student messages in order with at most max_workers judge requests in flight.
+
+    Args:
+    messages (List[dict]): Dicts with message_id, message_content and patient_context.
+    max_workers (int): Concurrency limit for judge model calls.
+    region_name (str, optional): Bedrock region. Defaults to AWS_REGION.
+    on_results (Callable, optional): Called with each chunk of finished evaluations as they complete.
+    remaining_ms (Callable, optional): Time left before the deadline; no new message is started once it
+        drops under EMPATHY_BATCH_TIME_RESERVE_SECONDS, so the evaluated messages are always a prefix.
+
+    Returns:
+    Dict[str, Optional[dict]]: Evaluation per evaluated message_id (None where the judge failed).
+    """
+    if not messages:
+        return {}
+
+    region_name = region_name or os.environ.get("AWS_REGION", "us-east-1")
+    judge = {
+        "client": get_bedrock_runtime_client(region_name),
+        "model_id": EMPATHY_JUDGE_MODEL_ID
+    }
+    max_workers = max(1, max_workers)
+
+    results: Dict[str, Optional[dict]] = {}
+    start_time = time.time()
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="empathy-batch") as executor:
+        in_flight = {}
+        while True:
+            while (next_index < len(messages) and len(in_flight) < max_workers
+                   and (remaining_ms is None or remaining_ms() > EMPATHY_BATCH_TIME_RESERVE_SECONDS * 1000)):
+                message = messages[next_index]
+                future = executor.submit(evaluate_empathy, message["message_content"], message["patient_context"], judge)
+                in_flight[future] = message["message_id"]
+                next_index += 1
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            chunk = {}
+            for future in done:
+                message_id = in_flight.pop(future)
+                try:
+                    chunk[message_id] = future.result()
+                except Exception as e:
+                    logger.error(f"❌ BATCH EMPATHY EVALUATION FAILED for {message_id}: {e}")
+                    chunk[message_id] = None
+            results.update(chunk)
+            if on_results:
+                on_results(chunk)
+
+    scored = sum(1 for evaluation in results.values() if evaluation)
+    logger.info(f"🧠 BATCH EMPATHY EVALUATION: {scored}/{len(results)} scored of {len(messages)} in {time.time() - start_time:.1f}s ({max_workers} workers)")
+    return results
+
+
+def save_empathy_evaluations(evaluations: Dict[str, Optional[dict]]) -> int:
+    """
+    Write evaluations back to messages.empathy_evaluation in one bulk UPDATE.
+
+    Args:
+    evaluations (Dict[str, Optional[dict]]): Evaluation per message_id; None entries are skipped.
+
+    Returns:
+    int: Number of message rows updated.
+    """
+    rows = [(message_id, json.dumps(evaluation)) for message_id, evaluation in evaluations.items() if evaluation]
+    if not rows:
+        return 0
+
+    with get_db_cursor() as cursor:
+        execute_values(
+            cursor,
+            """
+            UPDATE messages AS m
+            SET empathy_evaluation = v.empathy_evaluation::jsonb
+            FROM (VALUES %s) AS v(message_id, empathy_evaluation)
+            WHERE m.message_id = v.message_id::uuid
+            """,
+            rows,
+            page_size=len(rows)
+        )
+        updated = cursor.rowcount
+
+    logger.info(f"💾 BATCH EMPATHY SAVE: {updated} messages updated")
+    return updated
+
+
+def rescore_messages(
+    session_ids: List[str] = None,
+    message_ids: List[str] = None,
+    only_missing: bool = False,
+    max_workers: int = EMPATHY_BATCH_MAX_WORKERS,
+    cursor: dict = None,
+    remaining_ms: Callable[[], int] = None
+) -> dict:
+    """
+    Re-evaluate stored student messages, saving each finished chunk as it completes.
+
+    Returns:
+    dict: Counts, the evaluations keyed by message_id, and next_cursor (None when every matching
+    message has been processed) to pass back as cursor to continue.
+    """
+    max_workers = min(max(1, max_workers), EMPATHY_BATCH_MAX_WORKERS)
+    messages = fetch_student_messages(session_ids=session_ids, message_ids=message_ids, only_missing=only_missing, cursor=cursor)
+
+    # Finished evaluations are saved about max_workers at a time, so a cut-short run keeps what it scored
+    updated = 0
+    unsaved: Dict[str, Optional[dict]] = {}
+    def save_unsaved():
+        nonlocal updated
+        try:
+            updated += save_empathy_evaluations(unsaved)
+        except Exception as e:
+            logger.error(f"❌ BATCH EMPATHY SAVE FAILED for {len(unsaved)} messages: {e}")
+        unsaved.clear()
+
+    def collect(chunk):
+        unsaved.update(chunk)
+        if len(unsaved) >= max_workers:
+            save_unsaved()
+
+    evaluations = evaluate_empathy_batch(messages, max_workers=max_workers, on_results=collect, remaining_ms=remaining_ms)
+    save_unsaved()
+
+    # Messages are started in order, so the processed ones are a prefix of the list
+    processed = len(evaluations)
+    next_cursor = None
+    if processed < len(messages) or len(messages) == EMPATHY_BATCH_MAX_MESSAGES:
+        if processed:
+            last = messages[processed - 1]
+            next_cursor = {"time_sent": last["time_sent"], "message_id": last["message_id"]}
+        else:
+            next_cursor = cursor
+    if processed < len(messages):
+        logger.warning(f"⏱️ BATCH EMPATHY EVALUATION stopped near the deadline after {processed}/{len(messages)} messages")
+
+    return {
+        "requested": len(messages),
+        "processed": processed,
+        "scored": sum(1 for evaluation in evaluations.values() if evaluation),
+        "updated": updated,
+        "evaluations": evaluations,
+        "next_cursor": next_cursor,
+    }
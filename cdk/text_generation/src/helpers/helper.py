@@ -5,6 +5,8 @@ import psycopg2
 from langchain_aws import BedrockEmbeddings
 from langchain_postgres import PGVector
 
+from helpers.engine_registry import get_engine
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,7 +44,7 @@ def get_vectorstore(
         vectorstore = PGVector(
             embeddings=embeddings,
             collection_name=collection_name,
-            connection=connection_string,
+            connection=get_engine(connection_string),
             use_jsonb=True
         )
 
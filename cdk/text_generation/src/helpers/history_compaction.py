@@ -0,0 +1,194 @@
+"""
+Compaction of the conversation history fed to the RAG chain
+Both the question-rewrite prompt and the answer prompt get the compacted history, so with a
+bounded strategy their size stays constant however long the practice session runs:
+- "full": every message (as before)
+- "last_n": the last CHAT_HISTORY_TURNS exchanges
+- "token_budget": the most recent messages that fit in CHAT_HISTORY_TOKEN_BUDGET tokens
+- "summary": a rolling summary stored next to the history plus the recent exchanges;
+  the summary is refreshed in the background after a turn, never on the request path
+"""
+
+import os
+import logging
+from typing import List
+
+from botocore.exceptions import ClientError
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, messages_from_dict
+
+from .chat_history import (
+    CHAT_HISTORY_WINDOW,
+    MESSAGE_COUNT,
+    TYPE_COUNTS,
+    WindowedChatMessageHistory,
+    get_history_table,
+    get_message_counts,
+    get_recent_messages,
+    history_key,
+    read_history_range,
+    remember_counts,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CHAT_HISTORY_STRATEGY = os.environ.get("CHAT_HISTORY_STRATEGY", "last_n").lower()
+# Exchanges (student message + reply) kept verbatim by "last_n" and "summary"
+CHAT_HISTORY_TURNS = int(os.environ.get("CHAT_HISTORY_TURNS", "10"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+# Most messages "token_budget" looks at, so the read stays bounded too
+CHAT_HISTORY_MAX_MESSAGES = int(os.environ.get("CHAT_HISTORY_MAX_MESSAGES", "60"))
+# Messages that may pile up past the verbatim window before the summary is refreshed
+CHAT_HISTORY_SUMMARY_EVERY = int(os.environ.get("CHAT_HISTORY_SUMMARY_EVERY", "6"))
+
+SUMMARY = "ConversationSummary"
+SUMMARY_THROUGH = "SummaryThrough"
+
+SUMMARY_PROMPT = """You are maintaining notes on a practice conversation between a pharmacy student and a simulated patient.
+Update the summary below with the new messages. Keep every clinically relevant fact the patient has shared
+(symptoms, history, medications, concerns, emotions), what the student has asked, explained or recommended,
+and any open questions. Write at most 200 words of plain prose, no preamble.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    # Roughly four characters per token plus per-message overhead; only used to bound the prompt
+    return len(str(message.content)) // 4 + 4
+
+
+def _start_at_human(messages: List[BaseMessage]) -> List[BaseMessage]:
+    # A cut window must not open with a reply: the model expects the conversation to start with the user
+    for index, message in enumerate(messages):
+        if message.type == "human":
+            return messages[index:]
+    return []
+
+
+def _last_turns(table_name: str, session_id: str, turns: int) -> List[BaseMessage]:
+    return _start_at_human(get_recent_messages(table_name, session_id, turns * 2))
+
+
+def _within_token_budget(table_name: str, session_id: str, budget: int) -> List[BaseMessage]:
+    messages = get_recent_messages(table_name, session_id, CHAT_HISTORY_MAX_MESSAGES)
+    kept = []
+    for message in reversed(messages):
+        budget -= estimate_tokens(message)
+        if budget < 0:
+            break
+        kept.append(message)
+    kept.reverse()
+    return _start_at_human(kept)
+
+
+def _read_summary_state(table, session_id: str, remember: bool) -> dict:
+    response = table.get_item(
+        Key=history_key(session_id),
+        ProjectionExpression="#n, #h, #a, #s, #t",
+        ExpressionAttributeNames={
+            "#n": MESSAGE_COUNT,
+            "#h": TYPE_COUNTS["human"],
+            "#a": TYPE_COUNTS["ai"],
+            "#s": SUMMARY,
+            "#t": SUMMARY_THROUGH,
+        },
+        ConsistentRead=True,
+    )
+    item = response.get("Item", {})
+    if MESSAGE_COUNT not in item:
+        # History written before the counters existed; this backfills them
+        total = get_message_counts(table.name, session_id, remember)["messages"]
+    else:
+        total = int(item[MESSAGE_COUNT])
+    if remember and MESSAGE_COUNT in item:
+        remember_counts(session_id, {
+            "messages": total,
+            "human": int(item.get(TYPE_COUNTS["human"], 0)),
+            "ai": int(item.get(TYPE_COUNTS["ai"], 0)),
+        })
+    stored_through = int(item.get(SUMMARY_THROUGH, 0))
+    return {
+        "total": total,
+        "summary": item.get(SUMMARY, ""),
+        # Deleted messages can leave the summary past the end of History; it must not hide the remaining ones
+        "through": min(stored_through, total),
+        "stored_through": stored_through,
+    }
+
+
+def _with_summary(table_name: str, session_id: str) -> List[BaseMessage]:
+    table = get_history_table(table_name)
+    state = _read_summary_state(table, session_id, remember=True)
+    # Everything after the summary, capped so a lagging refresh cannot grow the prompt without bound
+    keep = CHAT_HISTORY_TURNS * 2 + CHAT_HISTORY_SUMMARY_EVERY
+    start = max(state["through"], state["total"] - keep)
+    recent = _start_at_human(messages_from_dict(read_history_range(table, session_id, start, state["total"])))
+    if not state["summary"]:
+        return recent
+    # Directly after the prompt's system message, so it joins it instead of adding a user turn before `recent`
+    return [SystemMessage(content=f"Summary of the conversation so far:\n{state['summary']}"), *recent]
+
+
+def compact_history(table_name: str, session_id: str, strategy: str = CHAT_HISTORY_STRATEGY) -> List[BaseMessage]:
+    """The history messages to put in the prompt for this session"""
+    if strategy == "last_n":
+        return _last_turns(table_name, session_id, CHAT_HISTORY_TURNS)
+    if strategy == "token_budget":
+        return _within_token_budget(table_name, session_id, CHAT_HISTORY_TOKEN_BUDGET)
+    if strategy == "summary":
+        return _with_summary(table_name, session_id)
+    return get_recent_messages(table_name, session_id, CHAT_HISTORY_WINDOW)
+
+
+def refresh_summary(table_name: str, session_id: str, llm) -> bool:
+    """
+    Fold the messages that have left the verbatim window into the stored summary.
+    Runs after a turn on the background executor; returns True if the summary was updated.
+    """
+    table = get_history_table(table_name)
+    # Background path: leaves the turn's counters alone
+    state = _read_summary_state(table, session_id, remember=False)
+    target = state["total"] - CHAT_HISTORY_TURNS * 2
+    if target - state["through"] < CHAT_HISTORY_SUMMARY_EVERY:
+        return False
+
+    messages = messages_from_dict(read_history_range(table, session_id, state["through"], target))
+    transcript = "\n".join(
+        f"{'Student' if message.type == 'human' else 'Patient'}: {message.content}" for message in messages
+    )
+    prompt = SUMMARY_PROMPT.format(summary=state["summary"] or "(none yet)", messages=transcript)
+    summary = str(llm.invoke([HumanMessage(content=prompt)]).content).strip()
+    if not summary:
+        return False
+
+    try:
+        # Another refresh of the same session may have won the race; keep whichever landed first
+        table.update_item(
+            Key=history_key(session_id),
+            UpdateExpression="SET #s = :summary, #t = :target",
+            ConditionExpression="attribute_not_exists(#t) OR #t = :through",
+            ExpressionAttributeNames={"#s": SUMMARY, "#t": SUMMARY_THROUGH},
+            ExpressionAttributeValues={":summary": summary, ":target": target, ":through": state["stored_through"]},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+    logger.info(f"📝 HISTORY_SUMMARY: session {session_id} summarized through message {target}")
+    return True
+
+
+class CompactedChatMessageHistory(WindowedChatMessageHistory):
+    """Chat history whose messages are the compacted view selected by CHAT_HISTORY_STRATEGY"""
+
+    def __init__(self, table_name: str, session_id: str, strategy: str = CHAT_HISTORY_STRATEGY):
+        super().__init__(table_name, session_id)
+        self.strategy = strategy
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return compact_history(self.table_name, self.session_id, self.strategy)
@@ -0,0 +1,138 @@
+"""
+Message persistence for the text chat path
+Each logical message is written once, keyed by its message_id, and a turn's
+messages are written together in one transaction
+"""
+
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+from psycopg2.extras import execute_values
+
+from .db_connection_manager import get_db_cursor
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Re-sending a message_id (e.g. one already created through /student/create_message) merges the evaluation into
+# that row instead of inserting a duplicate. The stored text is kept, an existing evaluation is only replaced by a
+# new one, and a row of another session is never touched (message_id comes from the client)
+UPSERT_MESSAGES_SQL = """
+    INSERT INTO "messages" (message_id, session_id, student_sent, message_content, empathy_evaluation, time_sent)
+    VALUES %s
+    ON CONFLICT (message_id) DO UPDATE
+    SET empathy_evaluation = COALESCE(EXCLUDED.empathy_evaluation, "messages".empathy_evaluation)
+    WHERE "messages".session_id = EXCLUDED.session_id
+    RETURNING message_id
+"""
+
+
+def new_message_id() -> str:
+    return str(uuid.uuid4())
+
+
+def upsert_messages(rows: List[tuple]) -> Set[str]:
+    """
+    Write several messages in one statement and one transaction.
+
+    Args:
+    rows (List[tuple]): (message_id, session_id, student_sent, message_content, empathy_json, time_sent) tuples.
+
+    Returns:
+    Set[str]: The message_ids inserted or updated; an id already owned by another session is left out.
+    """
+    if not rows:
+        return set()
+    with get_db_cursor() as cursor:
+        written = execute_values(
+            cursor, UPSERT_MESSAGES_SQL, rows,
+            template="(%s::uuid, %s::uuid, %s, %s, %s::jsonb, %s)", page_size=len(rows), fetch=True
+        )
+        return {str(row[0]) for row in written}
+
+
+def attach_empathy_evaluation(message_id: str, session_id: str, empathy_evaluation: dict) -> bool:
+    """Set the empathy evaluation on an already saved message of the session; returns True if the row existed"""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            'UPDATE "messages" SET empathy_evaluation = %s::jsonb WHERE message_id = %s::uuid AND session_id = %s::uuid',
+            (json.dumps(empathy_evaluation), message_id, session_id)
+        )
+        return cursor.rowcount > 0
+
+
+class MessageTurn:
+    """
+    The student message and AI reply of one chat turn
+    Messages are buffered and written together by flush(); an empathy evaluation that finishes
+    before the flush rides along with the student row, a later one is attached with an UPDATE
+    """
+
+    def __init__(self, session_id: str, student_message_id: str = None):
+        self.session_id = session_id
+        self.student_message_id = student_message_id or new_message_id()
+        self.ai_message_id = new_message_id()
+        self._student = None
+        self._ai = None
+        self._empathy_evaluation: Optional[dict] = None
+        self._flushed = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now():
+        # time_sent is a timestamp without time zone, stored in UTC like NOW() on RDS
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def add_student_message(self, message_content: str) -> None:
+        with self._lock:
+            self._student = (message_content, self._now())
+
+    def add_ai_message(self, message_content: str) -> None:
+        with self._lock:
+            self._ai = (message_content, self._now())
+
+    def attach_empathy_evaluation(self, empathy_evaluation: dict) -> None:
+        if not empathy_evaluation:
+            return
+        with self._lock:
+            if not self._flushed:
+                self._empathy_evaluation = empathy_evaluation
+                return
+        try:
+            if attach_empathy_evaluation(self.student_message_id, self.session_id, empathy_evaluation):
+                logger.info(f"🧠 Empathy evaluation attached to message {self.student_message_id}")
+            else:
+                logger.warning(f"🧠 Message {self.student_message_id} not found for empathy evaluation")
+        except Exception as e:
+            logger.error(f"Error attaching empathy evaluation: {e}")
+
+    def flush(self) -> None:
+        """Write the buffered messages of this turn in one transaction (idempotent)"""
+        with self._lock:
+            if self._flushed:
+                return
+            rows = []
+            if self._student is not None:
+                content, time_sent = self._student
+                empathy_json = json.dumps(self._empathy_evaluation) if self._empathy_evaluation else None
+                rows.append((self.student_message_id, self.session_id, True, content, empathy_json, time_sent))
+            if self._ai is not None:
+                content, time_sent = self._ai
+                rows.append((self.ai_message_id, self.session_id, False, content, None, time_sent))
+
+            try:
+                written = upsert_messages(rows)
+                if self._student is not None and self.student_message_id not in written:
+                    # The client sent the id of another session's message; save this one under a fresh id
+                    logger.warning(f"🔗 message_id {self.student_message_id} belongs to another session, saving under a new id")
+                    self.student_message_id = new_message_id()
+                    written |= upsert_messages([(self.student_message_id, *rows[0][1:])])
+                logger.info(f"🔗 DB_MESSAGES_SAVED: {len(written)} messages for session {self.session_id} in one transaction")
+            except Exception as e:
+                logger.error(f"Error saving messages to database: {e}")
+            # Even on failure: later evaluations go through UPDATE rather than being buffered forever
+            self._flushed = True
@@ -0,0 +1,196 @@
+"""
+Per-patient retrieval result cache with embedding memoization
+Level 1: normalized query text -> embedding vector
+Level 2: (collection, embedding bucket) -> retrieved documents
+"""
+
+import os
+import math
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from .db_connection_manager import get_db_cursor
+from .warm_cache import TTLCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.environ.get("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+RETRIEVAL_CACHE_TTL_SECONDS = int(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
+# How often to re-check whether data ingestion has reindexed a patient
+RETRIEVAL_INDEX_CHECK_SECONDS = int(os.environ.get("RETRIEVAL_INDEX_CHECK_SECONDS", "60"))
+# Cached documents are only reused for queries at least this similar to the cached one
+RETRIEVAL_CACHE_MIN_SIMILARITY = float(os.environ.get("RETRIEVAL_CACHE_MIN_SIMILARITY", "0.97"))
+
+_BUCKET_BITS = 16
+_HYPERPLANE_SEED = 1704110400
+
+
+def _normalize_query(text: str) -> str:
+    """Collapse whitespace and case so trivially different questions share an embedding"""
+    return " ".join(text.split()).casefold()
+
+
+def _cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if not norm_a or not norm_b:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that memoizes embed_query results
+    Document embedding is passed straight through to the wrapped instance
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: TTLCache = None):
+        self.embeddings = embeddings
+        self.cache = cache or TTLCache("query_embedding", ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = _normalize_query(text)
+        return self.cache.get_or_load(key, lambda: self.embeddings.embed_query(text))
+
+
+class RetrievalResultCache:
+    """
+    Caches similarity search results per patient collection
+    Query embeddings are bucketed with random-hyperplane hashing; a hit also has to clear a cosine similarity threshold
+    """
+
+    def __init__(self):
+        self._results = TTLCache("retrieval_results", ttl_seconds=RETRIEVAL_CACHE_TTL_SECONDS, max_entries=RETRIEVAL_CACHE_MAX_ENTRIES)
+        self._index_versions = TTLCache("retrieval_index_version", ttl_seconds=RETRIEVAL_INDEX_CHECK_SECONDS, max_entries=RETRIEVAL_CACHE_MAX_ENTRIES)
+        self._hyperplanes: Dict[int, List[List[float]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_hyperplanes(self, dimensions: int) -> List[List[float]]:
+        with self._lock:
+            if dimensions not in self._hyperplanes:
+                rng = random.Random(_HYPERPLANE_SEED + dimensions)
+                self._hyperplanes[dimensions] = [
+                    [rng.gauss(0.0, 1.0) for _ in range(dimensions)] for _ in range(_BUCKET_BITS)
+                ]
+            return self._hyperplanes[dimensions]
+
+    def bucket(self, vector: List[float]) -> int:
+        """Locality-sensitive bucket id for an embedding vector"""
+        bucket_id = 0
+        for plane in self._get_hyperplanes(len(vector)):
+            bucket_id = (bucket_id << 1) | (1 if sum(p * v for p, v in zip(plane, vector)) >= 0 else 0)
+        return bucket_id
+
+    def _index_version(self, collection_name: str) -> Optional[Tuple]:
+        """
+        Cheap signature of a patient's indexed documents, re-read at most every RETRIEVAL_INDEX_CHECK_SECONDS
+        Changes whenever data ingestion adds, re-uploads, finishes or deletes a document for the patient
+        """
+        def load():
+            try:
+                with get_db_cursor() as cursor:
+                    cursor.execute(
+                        """
+                        SELECT COUNT(*), MAX(time_uploaded), COUNT(*) FILTER (WHERE ingestion_status = 'completed')
+                        FROM patient_data
+                        WHERE patient_id = %s
+                        """,
+                        (collection_name,)
+                    )
+                    return tuple(str(value) for value in cursor.fetchone())
+            except Exception as e:
+                logger.warning(f"Retrieval cache index version check failed for {collection_name}: {e}")
+                return None
+
+        return self._index_versions.get_or_load(collection_name, load, cache_if=lambda version: version is not None)
+
+    def lookup(self, collection_name: str, vector: List[float]) -> Optional[List[Document]]:
+        version = self._index_version(collection_name)
+        if version is None:
+            return None
+
+        candidates = self._results.get((collection_name, version, self.bucket(vector))) or []
+        for cached_vector, documents in candidates:
+            if _cosine_similarity(cached_vector, vector) >= RETRIEVAL_CACHE_MIN_SIMILARITY:
+                self.hits += 1
+                return documents
+
+        self.misses += 1
+        return None
+
+    def store(self, collection_name: str, vector: List[float], documents: List[Document]) -> None:
+        version = self._index_version(collection_name)
+        if version is None:
+            return
+
+        key = (collection_name, version, self.bucket(vector))
+        candidates = list(self._results.get(key) or [])
+        candidates.append((vector, documents))
+        # Keep buckets small so lookups stay cheap
+        self._results.set(key, candidates[-8:])
+
+    def invalidate(self, collection_name: str = None) -> None:
+        """Drop cached results for one patient collection, or for every collection"""
+        if collection_name is None:
+            self._results.invalidate()
+            self._index_versions.invalidate()
+            return
+        self._results.invalidate(predicate=lambda key: key[0] == collection_name)
+        self._index_versions.invalidate(collection_name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "results": self._results.stats(),
+        }
+
+
+retrieval_result_cache = RetrievalResultCache()
+
+
+def invalidate_patient_retrieval(patient_id: str) -> None:
+    """Drop cached retrieval results for a patient after its documents are reindexed"""
+    retrieval_result_cache.invalidate(patient_id)
+    logger.info(f"🧊 RETRIEVAL_CACHE_INVALIDATE: patient {patient_id}")
+
+
+class CachedVectorStoreRetriever(BaseRetriever):
+    """
+    Vectorstore retriever that embeds the query once (memoized) and reuses
+    recent similarity search results for near-identical queries on the same patient
+    """
+
+    vectorstore: Any
+    embeddings: Any
+    collection_name: str
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vector = self.embeddings.embed_query(query)
+
+        documents = retrieval_result_cache.lookup(self.collection_name, vector)
+        if documents is not None:
+            logger.info(f"🧊 RETRIEVAL_CACHE_HIT: {self.collection_name}")
+            return documents
+
+        documents = self.vectorstore.similarity_search_by_vector(vector, k=self.k)
+        retrieval_result_cache.store(self.collection_name, vector, documents)
+        return documents
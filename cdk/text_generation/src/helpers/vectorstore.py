@@ -1,15 +1,80 @@
+import os
+import re
+import logging
+import threading
 from typing import Dict
 
 from langchain_core.vectorstores import VectorStoreRetriever
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 
 from helpers.helper import get_vectorstore
+from helpers.retrieval_cache import CachedVectorStoreRetriever
+
+logger = logging.getLogger(__name__)
+
+# "always" rewrites every follow-up question, "never" retrieves with the raw question,
+# "auto" only rewrites when the question leans on earlier turns
+REWRITE_MODES = ("always", "never", "auto")
+DEFAULT_REWRITE_MODE = os.environ.get("RETRIEVAL_REWRITE_MODE", "auto").lower()
+
+# Pronouns and back-references that usually can't be resolved without the chat history
+_REFERENCE_PATTERN = re.compile(
+    r"\b(it|its|they|them|their|theirs|this|that|these|those|he|him|his|she|her|hers|"
+    r"there|same|above|earlier|previous|previously|former|latter|mentioned|said)\b",
+    re.IGNORECASE
+)
+# Elliptical follow-ups like "why?" or "how long?" are too short to retrieve on their own
+_MIN_STANDALONE_WORDS = 4
+
+
+class RewriteMetrics:
+    """Thread-safe counters of question rewrites performed and skipped, per retrieval mode"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, mode: str, outcome: str) -> None:
+        with self._lock:
+            mode_counts = self._counts.setdefault(mode, {"rewritten": 0, "skipped_no_history": 0, "skipped_by_mode": 0, "skipped_by_heuristic": 0})
+            mode_counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {mode: dict(counts) for mode, counts in self._counts.items()}
+
+
+rewrite_metrics = RewriteMetrics()
+
+
+def get_rewrite_metrics() -> Dict[str, Dict[str, int]]:
+    """Get rewrite/skip counters for every retrieval mode used in this process"""
+    return rewrite_metrics.snapshot()
+
+
+def needs_rewrite(query: str) -> bool:
+    """
+    Cheap local check for whether a question depends on the chat history.
+
+    Args:
+    query (str): The student's latest question.
+
+    Returns:
+    bool: True if the question has unresolved pronouns/references or is too short to stand alone.
+    """
+    words = query.split()
+    if len(words) < _MIN_STANDALONE_WORDS:
+        return True
+    return bool(_REFERENCE_PATTERN.search(query))
+
 
 def get_vectorstore_retriever(
     llm,
     vectorstore_config_dict: Dict[str, str],
-    embeddings#: BedrockEmbeddings
+    embeddings,#: BedrockEmbeddings
+    rewrite_mode: str = None
 ) -> VectorStoreRetriever:
     """
     Retrieve the vectorstore and return the history-aware retriever object.
@@ -18,10 +83,16 @@ def get_vectorstore_retriever(
     llm: The language model instance used to generate the response.
     vectorstore_config_dict (Dict[str, str]): The configuration dictionary for the vectorstore, including parameters like collection name, database name, user, password, host, and port.
     embeddings (BedrockEmbeddings): The embeddings instance used to process the documents.
+    rewrite_mode (str, optional): "always", "never" or "auto". Defaults to the RETRIEVAL_REWRITE_MODE environment variable.
 
     Returns:
     VectorStoreRetriever: A history-aware retriever instance.
     """
+    mode = (rewrite_mode or DEFAULT_REWRITE_MODE).lower()
+    if mode not in REWRITE_MODES:
+        logger.warning(f"Unknown retrieval rewrite mode '{mode}', falling back to 'auto'")
+        mode = "auto"
+
     vectorstore, _ = get_vectorstore(
         collection_name=vectorstore_config_dict['collection_name'],
         embeddings=embeddings,
@@ -32,7 +103,12 @@ def get_vectorstore_retriever(
         port=int(vectorstore_config_dict['port'])
     )
 
-    retriever = vectorstore.as_retriever()
+    # Embeds each question once and reuses recent results for near-identical questions on this patient
+    retriever = CachedVectorStoreRetriever(
+        vectorstore=vectorstore,
+        embeddings=embeddings,
+        collection_name=vectorstore_config_dict['collection_name']
+    )
 
     # Contextualize question and create history-aware retriever
     contextualize_q_system_prompt = (
@@ -49,8 +125,24 @@ def get_vectorstore_retriever(
             ("human", "{input}"),
         ]
     )
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
-    )
+    rewrite_then_retrieve = contextualize_q_prompt | llm | StrOutputParser() | retriever
+    retrieve_directly = RunnableLambda(lambda inputs: inputs["input"]) | retriever
+
+    def route(inputs):
+        # Same contract as create_history_aware_retriever: {"input", "chat_history"} in, documents out
+        if not inputs.get("chat_history"):
+            rewrite_metrics.record(mode, "skipped_no_history")
+            return retrieve_directly
+        if mode == "never":
+            rewrite_metrics.record(mode, "skipped_by_mode")
+            return retrieve_directly
+        if mode == "auto" and not needs_rewrite(inputs["input"]):
+            rewrite_metrics.record(mode, "skipped_by_heuristic")
+            return retrieve_directly
+        rewrite_metrics.record(mode, "rewritten")
+        return rewrite_then_retrieve
+
+    logger.info(f"Retrieval question rewrite mode: {mode}")
+    history_aware_retriever = RunnableLambda(route).with_config(run_name="chat_retriever_chain")
 
-    return history_aware_retriever
\ No newline at end of file
+    return history_aware_retriever
@@ -0,0 +1,152 @@
+"""
+Warm-container cache for the text generation Lambda
+Keeps per-request setup (table checks, prompts, patient details, LLMs, retrievers)
+alive across invocations of the same execution environment
+Prompts and patients are edited by other Lambdas, which cannot reach these in-memory caches, so
+edits reach warm containers only when their entries expire (WARM_CACHE_TTL_SECONDS); the
+invalidate_* functions below only affect the container that calls them
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("WARM_CACHE_TTL_SECONDS", "300"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("WARM_CACHE_MAX_ENTRIES", "64"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded cache whose entries expire after a fixed TTL
+    Least recently used entries are evicted first once max_entries is reached
+    """
+
+    def __init__(self, name: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = _MISSING) -> None:
+        """Store value under key; ttl_seconds=None keeps it for the process lifetime"""
+        ttl = self.ttl_seconds if ttl_seconds is _MISSING else ttl_seconds
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                logger.debug(f"🧊 WARM_CACHE_EVICT: {self.name} evicted {evicted_key}")
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], cache_if: Callable[[Any], bool] = None) -> Any:
+        """
+        Return the cached value for key, calling loader on a miss
+        Results rejected by cache_if (e.g. failed lookups) are returned but not stored
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = loader()
+        if cache_if is None or cache_if(value):
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = None, predicate: Callable[[Hashable], bool] = None) -> int:
+        """Drop one key, every key matching predicate, or everything when neither is given"""
+        with self._lock:
+            if key is not None:
+                return 1 if self._entries.pop(key, None) is not None else 0
+            if predicate is not None:
+                doomed = [k for k in self._entries if predicate(k)]
+                for k in doomed:
+                    del self._entries[k]
+                return len(doomed)
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics for monitoring"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Global caches shared by every invocation in this container
+table_cache = TTLCache("dynamodb_table", ttl_seconds=None)
+system_prompt_cache = TTLCache("system_prompt")
+patient_details_cache = TTLCache("patient_details")
+llm_cache = TTLCache("bedrock_llm", ttl_seconds=None, max_entries=8)
+retriever_cache = TTLCache("retriever")
+chain_cache = TTLCache("rag_chain", ttl_seconds=None, max_entries=int(os.environ.get("CHAIN_CACHE_MAX_ENTRIES", "32")))
+
+_ALL_CACHES = (table_cache, system_prompt_cache, patient_details_cache, llm_cache, retriever_cache, chain_cache)
+
+
+def invalidate_simulation_group(simulation_group_id: str) -> None:
+    """Drop this container's cached system prompt for a simulation group"""
+    system_prompt_cache.invalidate(simulation_group_id)
+    logger.info(f"🧊 WARM_CACHE_INVALIDATE: system prompt for group {simulation_group_id}")
+
+
+def invalidate_patient(patient_id: str) -> None:
+    """Drop this container's cached details, retrievers and retrieval results for a patient"""
+    from .retrieval_cache import invalidate_patient_retrieval
+
+    patient_details_cache.invalidate(patient_id)
+    retriever_cache.invalidate(predicate=lambda key: key[0] == patient_id)
+    invalidate_patient_retrieval(patient_id)
+    logger.info(f"🧊 WARM_CACHE_INVALIDATE: patient {patient_id}")
+
+
+def invalidate_table(table_name: str) -> None:
+    """Forget that a DynamoDB table is known to exist"""
+    table_cache.invalidate(table_name)
+
+
+def clear_all() -> None:
+    """Drop every warm cache entry"""
+    for cache in _ALL_CACHES:
+        cache.invalidate()
+    logger.info("🧊 WARM_CACHE_CLEARED: All warm caches cleared")
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Get statistics for every warm cache"""
+    return {cache.name: cache.stats() for cache in _ALL_CACHES}
@@ -1,12 +1,16 @@
 import os
 import json
+import uuid
 import boto3
 import logging
 import psycopg2
 from langchain_aws import BedrockEmbeddings
 
 from helpers.vectorstore import get_vectorstore_retriever
-from helpers.chat import get_bedrock_llm, get_initial_student_query, get_student_query, create_dynamodb_history_table, get_response, update_session_name
+from helpers.chat import get_bedrock_llm, get_initial_student_query, get_student_query, create_dynamodb_history_table, get_response, update_session_name, wait_for_pending_evaluations
+from helpers.retrieval_cache import CachedEmbeddings
+from helpers.empathy_batch import rescore_messages, EMPATHY_BATCH_MAX_WORKERS
+from helpers.warm_cache import system_prompt_cache, patient_details_cache, llm_cache, retriever_cache
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO)
@@ -70,12 +74,13 @@ def initialize_constants():
     TABLE_NAME = get_parameter(TABLE_NAME_PARAM, TABLE_NAME)
 
     if embeddings is None:
-        embeddings = BedrockEmbeddings(
+        # Memoize query embeddings so repeated student questions skip the Bedrock call
+        embeddings = CachedEmbeddings(BedrockEmbeddings(
             model_id=EMBEDDING_MODEL_ID,
             client=bedrock_runtime,
             region_name=REGION,
-        )
-    
+        ))
+
     create_dynamodb_history_table(TABLE_NAME)
 
 def connect_to_db():
@@ -177,6 +182,59 @@ def get_patient_details(patient_id):
         return None, None, None
 
 
+def get_cached_system_prompt(simulation_group_id):
+    """System prompt lookup served from the warm cache; failed lookups are not cached."""
+    return system_prompt_cache.get_or_load(
+        simulation_group_id,
+        lambda: get_system_prompt(simulation_group_id),
+        cache_if=lambda prompt: isinstance(prompt, str)
+    )
+
+
+def get_cached_patient_details(patient_id):
+    """Patient details lookup served from the warm cache; failed lookups are not cached."""
+    return patient_details_cache.get_or_load(
+        patient_id,
+        lambda: get_patient_details(patient_id),
+        cache_if=lambda details: isinstance(details, tuple) and len(details) == 4 and None not in details
+    )
+
+
+def handle_batch_empathy_evaluation(event, context=None):
+    """
+    Re-score stored student messages:
+    {"action": "batch_empathy_evaluation", "session_ids"|"message_ids": [...], "only_missing": bool, "cursor": {...}}
+    A response with a non-null next_cursor was cut short by the deadline; invoke again with it as cursor.
+    """
+    session_ids = event.get("session_ids") or []
+    message_ids = event.get("message_ids") or []
+    if not session_ids and not message_ids:
+        return {
+            'statusCode': 400,
+            'body': json.dumps("Missing required parameters: session_ids or message_ids")
+        }
+
+    try:
+        result = rescore_messages(
+            session_ids=session_ids,
+            message_ids=message_ids,
+            only_missing=bool(event.get("only_missing", False)),
+            max_workers=min(max(1, int(event.get("max_workers", EMPATHY_BATCH_MAX_WORKERS))), EMPATHY_BATCH_MAX_WORKERS),
+            cursor=event.get("cursor"),
+            remaining_ms=context.get_remaining_time_in_millis if context else None
+        )
+    except Exception as e:
+        logger.error(f"Error in batch empathy evaluation: {e}")
+        logger.exception("Full error details:")
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Error in batch empathy evaluation: {str(e)}')
+        }
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
 
 
 def handler(event, context):
@@ -186,6 +244,10 @@ def handler(event, context):
     logger.info(f"📝 Event headers: {event.get('headers', {})}")
     logger.info(f"🔍 FULL EVENT: {json.dumps(event, default=str)}")
     initialize_constants()
+
+    # Direct invocation for instructor/admin re-scoring of stored messages
+    if event.get("action") == "batch_empathy_evaluation":
+        return handle_batch_empathy_evaluation(event, context)
     
     # Extract the user's Cognito token from the API Gateway event
     auth_token = None
@@ -227,7 +289,7 @@ def handler(event, context):
             'body': json.dumps("Missing required parameters: simulation_group_id, session_id, or patient_id")
         }
 
-    system_prompt = get_system_prompt(simulation_group_id)
+    system_prompt = get_cached_system_prompt(simulation_group_id)
     if system_prompt is None:
         logger.error(f"Error fetching system prompt for simulation_group_id: {simulation_group_id}")
         return {
@@ -241,7 +303,7 @@ def handler(event, context):
             'body': json.dumps('Error fetching system prompt')
         }
 
-    patient_name, patient_age, patient_prompt, llm_completion = get_patient_details(
+    patient_name, patient_age, patient_prompt, llm_completion = get_cached_patient_details(
         patient_id)
     if patient_name is None or patient_age is None or patient_prompt is None or llm_completion is None:
         return {
@@ -257,6 +319,13 @@ def handler(event, context):
 
     body = {} if event.get("body") is None else json.loads(event.get("body"))
     question = body.get("message_content", "")
+    # Id of the student message row the client already created, so this turn updates it instead of inserting a copy
+    message_id = body.get("message_id")
+    try:
+        message_id = str(uuid.UUID(message_id)) if message_id else None
+    except (ValueError, TypeError, AttributeError):
+        logger.warning(f"Ignoring invalid message_id: {message_id}")
+        message_id = None
     
     logger.info(f"🔍 RAW BODY: {event.get('body')}")
     logger.info(f"🔍 PARSED BODY: {body}")
@@ -279,7 +348,10 @@ def handler(event, context):
     
     try:
         logger.info("Creating Bedrock LLM instance.")
-        llm = get_bedrock_llm(bedrock_llm_id=BEDROCK_LLM_ID, streaming=stream)
+        llm = llm_cache.get_or_load(
+            (BEDROCK_LLM_ID, stream),
+            lambda: get_bedrock_llm(bedrock_llm_id=BEDROCK_LLM_ID, streaming=stream)
+        )
     except Exception as e:
         logger.error(f"Error getting LLM from Bedrock: {e}")
         return {
@@ -320,10 +392,13 @@ def handler(event, context):
     try:
         logger.info("Creating history-aware retriever.")
 
-        history_aware_retriever = get_vectorstore_retriever(
-            llm=llm,
-            vectorstore_config_dict=vectorstore_config_dict,
-            embeddings=embeddings
+        history_aware_retriever = retriever_cache.get_or_load(
+            (patient_id, BEDROCK_LLM_ID, stream),
+            lambda: get_vectorstore_retriever(
+                llm=llm,
+                vectorstore_config_dict=vectorstore_config_dict,
+                embeddings=embeddings
+            )
         )
     except Exception as e:
         logger.error(f"Error creating history-aware retriever: {e}")
@@ -353,11 +428,13 @@ def handler(event, context):
             patient_age=patient_age,
             patient_prompt=patient_prompt,
             llm_completion=llm_completion,
-            stream=stream
+            stream=stream,
+            message_id=message_id
         )
     except Exception as e:
         logger.error(f"Error getting response: {e}")
         logger.exception("Full error details:")
+        wait_for_pending_evaluations()
         return {
             'statusCode': 500,
             "headers": {
@@ -381,7 +458,9 @@ def handler(event, context):
     except Exception as e:
         logger.error(f"Error updating session name: {e}")
         session_name = "New Chat"
-    
+
+    # Don't let the Lambda freeze with empathy evaluations still in flight
+    wait_for_pending_evaluations()
 
 
     if stream:
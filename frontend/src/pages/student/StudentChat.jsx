@@ -730,7 +730,8 @@ const StudentChat = ({ group, patient, setPatient, setGroup }) => {
     url,
     authToken,
     message,
-    overrideSessionId = null
+    overrideSessionId = null,
+    messageId = null
   ) => {
     let fullResponse = "";
 
@@ -803,7 +804,12 @@ const StudentChat = ({ group, patient, setPatient, setGroup }) => {
           Authorization: authToken,
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ message_content: message }),
+        // message_id lets the backend update the row created by create_message instead of inserting a duplicate
+        body: JSON.stringify(
+          messageId
+            ? { message_content: message, message_id: messageId }
+            : { message_content: message }
+        ),
       });
 
       if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
@@ -906,7 +912,8 @@ const StudentChat = ({ group, patient, setPatient, setGroup }) => {
           textGenUrl,
           authToken,
           message,
-          newSession.session_id
+          newSession.session_id,
+          messageData[0].message_id
         );
       })
       .then((textGenData) => {